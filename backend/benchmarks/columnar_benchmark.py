@@ -0,0 +1,139 @@
+"""Columnar micro-benchmark: row dicts vs Arrow columns on one large result.
+
+Fetches a synthetic ``--rows``-row result of ``fact_meta_ad_performance_daily``
+from the fake BigQuery client (``benchmarks/fakes.py``) through
+``BigQueryService``'s fetch functions and hands it to a consumer:
+
+- ``rows``: ``dict(row)`` per row, then a ``Table`` component via ``json.dumps``
+  (the path before columnar results),
+- ``columnar``: Arrow columns, then ``serialize_component("Table", ...)``,
+- ``tool``: Arrow columns, then the ``run_query`` tool's sampled TSV.
+
+Each path runs in its own process, so peak RSS growth (sampled from
+``/proc``, Linux only) is not skewed by memory an earlier path left behind.
+The fake client builds its Arrow table from Python lists; BigQuery's Storage
+API delivers Arrow directly, so the columnar fetch is pessimistic here.
+
+    uv run python -m benchmarks.columnar_benchmark
+    uv run python -m benchmarks.columnar_benchmark --rows 200000 --repeats 5
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict
+
+from benchmarks import fakes
+
+fakes.configure_environment()
+
+PATHS = ["rows", "columnar", "tool"]
+
+
+def _consumer(service: Any, path: str) -> Callable[[Any], Any]:
+    """Fetch and consume one finished query job along ``path``."""
+    from src.config import settings
+    from src.services.bigquery_tools import format_rows
+    from src.services.component_serializer import serialize_component
+
+    if path == "rows":
+
+        def consume(job: Any) -> Any:
+            rows = service._fetch_rows(job)
+            return json.dumps(
+                {"type": "Table", "props": {"columns": list(rows[0]), "data": rows}},
+                ensure_ascii=False,
+                default=str,
+            )
+
+    elif path == "columnar":
+
+        def consume(job: Any) -> Any:
+            return serialize_component("Table", service._fetch_columns(job))
+
+    else:
+
+        def consume(job: Any) -> Any:
+            return format_rows(
+                service._fetch_columns(job),
+                settings.bigquery_tool_max_rows,
+                settings.bigquery_tool_max_chars,
+            )
+
+    return consume
+
+
+def measure(path: str, rows: int, repeats: int) -> Dict[str, Any]:
+    """Time one path in this process."""
+    from benchmarks.export_benchmark import peak_rss_growth
+    from src.services.bigquery_service import BigQueryService
+
+    _, client = fakes.install(job_latency=0.0)
+    service = BigQueryService()
+    sql = (
+        "SELECT * FROM `growth-force-project.semantic."
+        f"{fakes.DEFAULT_TABLE}` LIMIT {rows}"
+    )
+    # Generate the synthetic values up front; only fetch and consume count
+    client._table_data(fakes.DEFAULT_TABLE, rows)
+    consume = _consumer(service, path)
+
+    timings = []
+    with peak_rss_growth() as memory:
+        for _ in range(repeats):
+            job = client.query(sql)
+            started = time.perf_counter()
+            output = consume(job)
+            timings.append(time.perf_counter() - started)
+            del output
+            gc.collect()
+    service.close()
+    median = statistics.median(timings)
+    return {
+        "median_seconds": round(median, 3),
+        "rows_per_sec": round(rows / median),
+        **{key: round(value, 1) for key, value in memory.items()},
+    }
+
+
+def main() -> None:
+    """Run the columnar micro-benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--path", choices=PATHS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.path:
+        print(json.dumps(measure(args.path, args.rows, args.repeats)))
+        return
+
+    results: Dict[str, Any] = {"config": vars(args)}
+    for path in PATHS:
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.columnar_benchmark",
+                "--path",
+                path,
+                "--rows",
+                str(args.rows),
+                "--repeats",
+                str(args.repeats),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results[path] = json.loads(output.strip().splitlines()[-1])
+    del results["config"]["path"]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Streaming export benchmark: millions of rows at bounded memory.
+
+Exports ``--rows`` synthetic rows of ``fact_meta_ad_performance_daily``
+through ``GET /api/reports/jobs/{job_id}/export`` in each format, for a
+finished job recorded with that query, with the app running
+in-process on the stand-ins from ``benchmarks/fakes.py`` (whose paged reads
+generate each page on demand, like BigQuery serving pages). The app is
+called as a bare ASGI app that discards each chunk as it is sent, since
+httpx's ASGI transport would buffer the whole body. Reports wall time,
+rows per second, bytes sent and the peak RSS growth over the process's RSS
+before the export, sampled from ``/proc`` (Linux only).
+
+``--materialize-rows`` also measures the old path for comparison:
+``execute_query`` into row dicts, then one CSV body built in memory.
+
+    uv run python -m benchmarks.export_benchmark
+    uv run python -m benchmarks.export_benchmark --rows 1000000 --formats csv
+    uv run python -m benchmarks.export_benchmark --materialize-rows 500000
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from benchmarks import fakes
+
+fakes.configure_environment()
+
+SQL = (
+    "SELECT date, campaign_name, channel, impressions, clicks, cost, conversions "
+    f"FROM `growth-force-project.semantic.{fakes.DEFAULT_TABLE}` LIMIT {{rows}}"
+)
+
+
+def _rss() -> int:
+    """Resident memory of this process in bytes."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+@contextmanager
+def peak_rss_growth(interval: float = 0.01) -> Iterator[Dict[str, float]]:
+    """Sample RSS in a thread; yields a dict filled with the peak growth (MB)."""
+    result: Dict[str, float] = {}
+    baseline = _rss()
+    peak = baseline
+    done = threading.Event()
+
+    def sample() -> None:
+        nonlocal peak
+        while not done.wait(interval):
+            peak = max(peak, _rss())
+
+    thread = threading.Thread(target=sample, daemon=True)
+    thread.start()
+    try:
+        yield result
+    finally:
+        done.set()
+        thread.join()
+        peak = max(peak, _rss())
+        result["peak_rss_growth_mb"] = (peak - baseline) / 1024**2
+
+
+async def _finished_job(rows: int) -> str:
+    """Record a completed report job whose query reads ``rows`` rows."""
+    from src.container import container
+
+    job_id = f"export-benchmark-{rows}"
+    await container.report_jobs._update(
+        job_id,
+        status="completed",
+        result={"metadata": {"query_executed": SQL.format(rows=rows)}},
+    )
+    return job_id
+
+
+async def export(app: Any, rows: int, export_format: str) -> Dict[str, Any]:
+    """Stream one export through the ASGI app, discarding chunks as sent."""
+    path = f"/api/reports/jobs/{await _finished_job(rows)}/export"
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("ascii"),
+        "query_string": f"format={export_format}".encode("ascii"),
+        "root_path": "",
+        "headers": [
+            (b"host", b"benchmark"),
+            (b"accept-encoding", b"identity"),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    received = {"status": None, "bytes": 0, "chunks": 0, "first_byte": None}
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+    finished = asyncio.Event()
+    started = time.perf_counter()
+
+    async def receive() -> Dict[str, Any]:
+        if requests:
+            return requests.pop()
+        # Starlette listens for a disconnect while streaming
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            received["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            if message.get("body"):
+                if received["first_byte"] is None:
+                    received["first_byte"] = time.perf_counter() - started
+                received["bytes"] += len(message["body"])
+                received["chunks"] += 1
+            if not message.get("more_body", False):
+                finished.set()
+
+    with peak_rss_growth() as memory:
+        await app(scope, receive, send)
+    elapsed = time.perf_counter() - started
+    if received["status"] != 200:
+        raise RuntimeError(f"Export failed with status {received['status']}")
+    return {
+        "rows": rows,
+        "seconds": elapsed,
+        "first_byte_ms": (received["first_byte"] or elapsed) * 1000,
+        "rows_per_sec": rows / elapsed,
+        "bytes": received["bytes"],
+        "chunks": received["chunks"],
+        **memory,
+    }
+
+
+async def materialize(rows: int) -> Dict[str, Any]:
+    """Fetch every row as dicts and build the whole CSV, as before streaming."""
+    from src.container import container
+
+    started = time.perf_counter()
+    with peak_rss_growth() as memory:
+        result = await container.bigquery_service.execute_query(SQL.format(rows=rows))
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(result[0]))
+        writer.writeheader()
+        writer.writerows(result)
+        size = len(buffer.getvalue().encode("utf-8"))
+        del result, buffer, writer
+    return {
+        "rows": rows,
+        "seconds": time.perf_counter() - started,
+        "bytes": size,
+        **memory,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the exports against the in-process app."""
+    from src.config import settings
+
+    fakes.install(job_latency=0.0)
+    settings.query_cache_enabled = False
+    settings.export_page_size = args.page_size
+
+    from src.main import app
+
+    results: Dict[str, Any] = {"config": vars(args)}
+    async with app.router.lifespan_context(app):
+        for export_format in args.formats:
+            results[export_format] = await export(app, args.rows, export_format)
+        if args.materialize_rows:
+            results["materialized_csv"] = await materialize(args.materialize_rows)
+    return results
+
+
+def main() -> None:
+    """Run the export benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument(
+        "--formats",
+        type=lambda value: value.split(","),
+        default=["csv", "xlsx", "parquet"],
+    )
+    parser.add_argument("--page-size", type=int, default=10000)
+    parser.add_argument("--materialize-rows", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,856 @@
+"""Local stand-ins for Claude Code, BigQuery and Redis.
+
+``configure_environment()`` must run before anything under ``src`` is
+imported; ``install()`` then swaps the stand-ins into the app's services, so
+the FastAPI app runs in-process without network access or credentials.
+``SqliteRollupEngine`` computes rollup tables in SQLite instead of BigQuery.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import time
+import uuid
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+import fakeredis
+from claude_code_sdk import CLIConnectionError, Transport
+from claude_code_sdk._internal import client as sdk_client
+from claude_code_sdk._internal.transport import subprocess_cli
+from google.cloud import bigquery
+
+try:
+    import pyarrow
+except ImportError:  # Optional: pip install growth-force-backend[columnar]
+    pyarrow = None
+
+# Credentials the services check for, plus offline-friendly overrides
+_ENVIRONMENT = {
+    "CLAUDE_API_KEY": "benchmark",
+    "BQ_PRIVATE_KEY_ID": "benchmark",
+    "BQ_PRIVATE_KEY": "benchmark",
+    "BQ_CLIENT_EMAIL": "benchmark@growth-force-project.iam.gserviceaccount.com",
+    "BQ_CLIENT_ID": "benchmark",
+    "SCHEMA_CATALOG_ENABLED": "false",
+    "CLAUDE_POOL_ENABLED": "false",
+    "BIGQUERY_POLL_INTERVAL": "0.01",
+    "LOG_LEVEL": "WARNING",
+}
+
+# Column name, BigQuery type and generator kind for each semantic table
+_AD_PERFORMANCE = [
+    ("date", "DATE", "date"),
+    ("campaign_name", "STRING", "campaign"),
+    ("channel", "STRING", "channel"),
+    ("impressions", "INTEGER", "count"),
+    ("clicks", "INTEGER", "count"),
+    ("cost", "FLOAT", "amount"),
+    ("conversions", "INTEGER", "count"),
+]
+SEMANTIC_TABLES: Dict[str, List[Tuple[str, str, str]]] = {
+    "fact_meta_ad_performance_daily": _AD_PERFORMANCE,
+    "fact_google_ads_campaign_performance_daily": _AD_PERFORMANCE,
+    "dim_campaign": [
+        ("campaign_id", "STRING", "id"),
+        ("campaign_name", "STRING", "campaign"),
+        ("channel", "STRING", "channel"),
+    ],
+}
+DEFAULT_TABLE = "fact_meta_ad_performance_daily"
+
+_TABLE_REFERENCE = re.compile(r"\bFROM\s+`?(?:[\w-]+[.:])?(?:\w+\.)?(\w+)`?", re.I)
+_LIMIT = re.compile(r"\bLIMIT\s+(\d+)", re.I)
+_DATES = [datetime.date(2024, 1, 1) + datetime.timedelta(days=i) for i in range(366)]
+_CHANNELS = ["meta", "google", "yahoo", "line", "tiktok"]
+
+
+def configure_environment(**overrides: str) -> None:
+    """Set the environment for ``src.config``; explicit env vars win."""
+    for name, value in {**_ENVIRONMENT, **overrides}.items():
+        os.environ.setdefault(name, value)
+
+
+def _column_values(kind: str, count: int, start: int = 0) -> List[Any]:
+    """Deterministic synthetic values for rows ``start`` on of one column."""
+    indices = range(start, start + count)
+    if kind == "date":
+        return [_DATES[i % len(_DATES)] for i in indices]
+    if kind == "campaign":
+        return [f"campaign_{i % 40:02d}" for i in indices]
+    if kind == "channel":
+        return [_CHANNELS[i % len(_CHANNELS)] for i in indices]
+    if kind == "id":
+        return [f"c{i:06d}" for i in indices]
+    if kind == "amount":
+        return [float(i * 7919 % 100000) / 10 for i in indices]
+    return [i * 31 % 5000 for i in indices]
+
+
+# Reads ``count`` rows from ``start`` on, as column lists
+ColumnReader = Callable[[int, int], List[List[Any]]]
+
+
+def _static_reader(columns: List[List[Any]]) -> ColumnReader:
+    """Read from fixed column lists."""
+    return lambda start, count: [column[start : start + count] for column in columns]
+
+
+class FakeRowIterator:
+    """The parts of ``google.cloud.bigquery.table.RowIterator`` the app uses."""
+
+    def __init__(
+        self,
+        schema: List[bigquery.SchemaField],
+        rows: int,
+        read: ColumnReader,
+        page_size: Optional[int] = None,
+    ):
+        """Initialize iterator."""
+        self.schema = schema
+        self.total_rows = rows
+        self._read = read
+        self._page_size = page_size or rows or 1
+        self._field_to_index = {field.name: i for i, field in enumerate(schema)}
+
+    def __iter__(self):
+        """Yield real ``Row`` objects, built per row as the client does."""
+        for values in zip(*self._read(0, self.total_rows)):
+            yield bigquery.Row(values, self._field_to_index)
+
+    @property
+    def pages(self):
+        """Yield pages of ``Row`` objects, generated as they are fetched."""
+        for start in range(0, self.total_rows, self._page_size):
+            count = min(self._page_size, self.total_rows - start)
+            yield [
+                bigquery.Row(values, self._field_to_index)
+                for values in zip(*self._read(start, count))
+            ]
+
+    def to_arrow(self, create_bqstorage_client: bool = True) -> Any:
+        """Return the rows as an Arrow table."""
+        columns = self._read(0, self.total_rows)
+        return pyarrow.table(
+            {field.name: column for field, column in zip(self.schema, columns)}
+        )
+
+
+class FakeQueryJob:
+    """A query job that finishes after a fixed latency."""
+
+    def __init__(
+        self,
+        schema: List[bigquery.SchemaField],
+        rows: int,
+        read: ColumnReader,
+        latency: float,
+        bytes_processed: int,
+    ):
+        """Initialize job."""
+        self.job_id = f"benchmark_{uuid.uuid4().hex}"
+        self.total_bytes_processed = bytes_processed
+        self.total_bytes_billed = bytes_processed
+        self.slot_millis = int(latency * 1000)
+        self.cache_hit = False
+        self.cancelled = False
+        self._schema = schema
+        self._rows = rows
+        self._read = read
+        self._ready_at = time.monotonic() + latency
+
+    def done(self) -> bool:
+        """Check whether the job has finished."""
+        return time.monotonic() >= self._ready_at
+
+    def cancel(self) -> bool:
+        """Cancel the job."""
+        self.cancelled = True
+        self._ready_at = time.monotonic()
+        return True
+
+    def result(
+        self, timeout: Optional[float] = None, page_size: Optional[int] = None
+    ) -> FakeRowIterator:
+        """Wait for the job (blocking, like the real client) and return rows."""
+        remaining = self._ready_at - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        return FakeRowIterator(self._schema, self._rows, self._read, page_size)
+
+
+class FakeCredentials:
+    """Service account credentials whose token fetch just takes time."""
+
+    def __init__(self, token_latency: float = 0.1):
+        """Initialize credentials."""
+        self.token_latency = token_latency
+        self.valid = False
+
+    def refresh(self, request: Any) -> None:
+        """Pretend to fetch an access token (blocking, like the real one)."""
+        time.sleep(self.token_latency)
+        self.valid = True
+
+
+class FakeBigQueryClient:
+    """A BigQuery client serving synthetic rows for the semantic tables.
+
+    The table is taken from the query's FROM clause and the row count from
+    its LIMIT (``default_rows`` otherwise). Whole results are generated once
+    and memoized; paged reads generate each page on demand instead, so
+    exports of millions of rows stay small.
+    """
+
+    def __init__(
+        self,
+        job_latency: float = 0.2,
+        default_rows: int = 500,
+        token_latency: float = 0.1,
+    ):
+        """Initialize client."""
+        self.job_latency = job_latency
+        self._credentials = FakeCredentials(token_latency)
+        self.default_rows = default_rows
+        self.queries = 0
+        self._data: Dict[Tuple[str, int], List[List[Any]]] = {}
+        self._modified_ms = int(time.time() * 1000)
+
+    def _schema(self, table: str) -> List[bigquery.SchemaField]:
+        """Schema of a semantic table."""
+        return [
+            bigquery.SchemaField(name, field_type, description=f"{name} ({table})")
+            for name, field_type, _ in SEMANTIC_TABLES.get(table, _AD_PERFORMANCE)
+        ]
+
+    def _table_data(self, table: str, rows: int) -> List[List[Any]]:
+        """Synthetic columns of a table, memoized."""
+        key = (table, rows)
+        if key not in self._data:
+            self._data[key] = [
+                _column_values(kind, rows)
+                for _, _, kind in SEMANTIC_TABLES.get(table, _AD_PERFORMANCE)
+            ]
+        return self._data[key]
+
+    def _reader(self, table: str, rows: int) -> ColumnReader:
+        """Read a table's synthetic rows, memoizing only whole results."""
+        kinds = [kind for _, _, kind in SEMANTIC_TABLES.get(table, _AD_PERFORMANCE)]
+
+        def read(start: int, count: int) -> List[List[Any]]:
+            if start == 0 and count == rows:
+                return self._table_data(table, rows)
+            return [_column_values(kind, count, start) for kind in kinds]
+
+        return read
+
+    def query(self, sql: str, job_config: Any = None) -> FakeQueryJob:
+        """Start a query job (or a dry run)."""
+        if "__TABLES__" in sql:
+            schema = [
+                bigquery.SchemaField("table_id", "STRING"),
+                bigquery.SchemaField("last_modified_time", "INTEGER"),
+            ]
+            names = list(SEMANTIC_TABLES)
+            columns = [names, [self._modified_ms] * len(names)]
+            return FakeQueryJob(schema, len(names), _static_reader(columns), 0.0, 0)
+        if "INFORMATION_SCHEMA.PARTITIONS" in sql:
+            # One partition per date, all last modified at the same time
+            schema = [
+                bigquery.SchemaField("partition_id", "STRING"),
+                bigquery.SchemaField("last_modified", "INTEGER"),
+            ]
+            (table,) = [
+                parameter.value
+                for parameter in job_config.query_parameters
+                if parameter.name == "table_name"
+            ]
+            ids = [day.strftime("%Y%m%d") for day in _DATES]
+            if table not in SEMANTIC_TABLES:
+                ids = []
+            columns = [ids, [self._modified_ms] * len(ids)]
+            return FakeQueryJob(schema, len(ids), _static_reader(columns), 0.0, 0)
+
+        match = _TABLE_REFERENCE.search(sql)
+        table = match.group(1) if match else DEFAULT_TABLE
+        limit = _LIMIT.search(sql)
+        rows = int(limit.group(1)) if limit else self.default_rows
+        schema = self._schema(table)
+        bytes_processed = rows * len(schema) * 8
+
+        if job_config is not None and getattr(job_config, "dry_run", False):
+            return FakeQueryJob(
+                schema, 0, _static_reader([[] for _ in schema]), 0.0, bytes_processed
+            )
+
+        self.queries += 1
+        return FakeQueryJob(
+            schema, rows, self._reader(table, rows), self.job_latency, bytes_processed
+        )
+
+    def get_table(self, table_ref: str) -> Any:
+        """Get table metadata."""
+        table = table_ref.rsplit(".", 1)[-1]
+        return bigquery.Table(table_ref.replace(":", "."), schema=self._schema(table))
+
+    def list_tables(self, dataset_ref: str) -> List[Any]:
+        """List the semantic tables."""
+        return [
+            bigquery.Table(f"{dataset_ref.replace(':', '.')}.{name}")
+            for name in SEMANTIC_TABLES
+        ]
+
+    def list_datasets(self, max_results: Optional[int] = None) -> List[Any]:
+        """List datasets."""
+        return [bigquery.Dataset("growth-force-project.semantic")]
+
+
+class _FakeProcess:
+    """What the pool's health checks read from a CLI process."""
+
+    def __init__(self) -> None:
+        """Initialize process."""
+        # This process's own /proc entry serves the pool's memory checks
+        self.pid = os.getpid()
+        self.returncode: Optional[int] = None
+
+
+class FakeClaudeCLI(Transport):
+    """Stands in for the Claude Code CLI process behind ``claude_code_sdk``.
+
+    Speaks the stream-json protocol of ``SubprocessCLITransport``: a string
+    prompt starts one run with stdin closed, as the CLI's ``--print`` mode
+    does; a streamed prompt or ``ClaudeSDKClient`` gets the initialize
+    handshake and one run per user message until stdin closes. Tool calls
+    go to the in-process MCP server as control requests over stdin, so they
+    fail once stdin is closed, and a run stops after ``max_turns`` turns,
+    as with the real CLI.
+    """
+
+    def __init__(self, model: "FakeClaude", prompt: Any, options: Any):
+        """Initialize transport."""
+        self.model = model
+        self.prompt = prompt
+        self.options = options
+        self._process = _FakeProcess()
+        self._output: asyncio.Queue = asyncio.Queue()
+        self._stdin_open = False
+        self._ready = False
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._runs: set = set()
+
+    async def connect(self) -> None:
+        """Start the process."""
+        self._ready = True
+        if isinstance(self.prompt, str):
+            self._start_run(self.prompt, "default")
+        else:
+            self._stdin_open = True
+
+    def _emit(self, message: Dict[str, Any]) -> None:
+        """Write one message to stdout."""
+        self._output.put_nowait(message)
+
+    def _start_run(self, prompt: str, session_id: str) -> None:
+        """Run one prompt in the background, as the CLI does."""
+        task = asyncio.create_task(self._run(prompt, session_id))
+        self._runs.add(task)
+        task.add_done_callback(self._run_done)
+
+    def _run_done(self, task: asyncio.Task) -> None:
+        """Exit once the last run is over and stdin is closed."""
+        self._runs.discard(task)
+        if not self._runs and not self._stdin_open:
+            self._output.put_nowait(None)
+
+    async def write(self, data: str) -> None:
+        """Read one message from stdin."""
+        if not self._stdin_open:
+            raise CLIConnectionError("stdin is closed")
+        message = json.loads(data)
+        if message["type"] == "user":
+            self._start_run(
+                message["message"]["content"], message.get("session_id", "default")
+            )
+        elif message["type"] == "control_request":
+            # initialize, interrupt: nothing to set up
+            self._emit(
+                {
+                    "type": "control_response",
+                    "response": {
+                        "subtype": "success",
+                        "request_id": message["request_id"],
+                        "response": {},
+                    },
+                }
+            )
+        elif message["type"] == "control_response":
+            response = message["response"]
+            future = self._pending.pop(response["request_id"], None)
+            if future is not None and not future.done():
+                future.set_result(response)
+
+    async def end_input(self) -> None:
+        """Close stdin; unanswered tool calls can no longer be answered."""
+        self._stdin_open = False
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(CLIConnectionError("stdin closed"))
+        self._pending.clear()
+        if not self._runs:
+            self._output.put_nowait(None)
+
+    async def read_messages(self) -> AsyncIterator[Dict[str, Any]]:
+        """Read stdout until the process exits."""
+        while (message := await self._output.get()) is not None:
+            yield message
+
+    async def close(self) -> None:
+        """Kill the process."""
+        self._ready = False
+        self._stdin_open = False
+        self._process.returncode = 0
+        for task in list(self._runs):
+            task.cancel()
+        self._output.put_nowait(None)
+
+    def is_ready(self) -> bool:
+        """Whether the process is running."""
+        return self._ready
+
+    async def _call_tool(self, name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Call an in-process MCP tool through the SDK; returns its result."""
+        if not self._stdin_open:
+            raise CLIConnectionError("stdin closed")
+        request_id = f"cli_{uuid.uuid4().hex[:12]}"
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._emit(
+            {
+                "type": "control_request",
+                "request_id": request_id,
+                "request": {
+                    "subtype": "mcp_message",
+                    "server_name": name.split("__")[1],
+                    "message": {
+                        "jsonrpc": "2.0",
+                        "id": 1,
+                        "method": "tools/call",
+                        "params": {
+                            "name": name.split("__")[2],
+                            "arguments": arguments,
+                        },
+                    },
+                },
+            }
+        )
+        response = await future
+        if response["subtype"] != "success":
+            raise RuntimeError(response.get("error"))
+        mcp_response = response["response"]["mcp_response"]
+        if "error" in mcp_response:
+            raise RuntimeError(mcp_response["error"]["message"])
+        return mcp_response["result"]
+
+    def _result(self, started: float, turns: int, subtype: str = "success") -> None:
+        """Write the result message ending a run."""
+        self._emit(
+            {
+                "type": "result",
+                "subtype": subtype,
+                "duration_ms": int((time.perf_counter() - started) * 1000),
+                "duration_api_ms": 0,
+                "is_error": subtype != "success",
+                "num_turns": turns,
+                "session_id": "benchmark",
+                "total_cost_usd": 0.0,
+            }
+        )
+
+    async def _run(self, prompt: str, session_id: str) -> None:
+        """One run: a ``run_query`` tool call, then the report."""
+        started = time.perf_counter()
+        if prompt.startswith("/"):
+            self._result(started, 0)
+            return
+        self.model.runs += 1
+        model = self.model
+        sql = model._sql(prompt)
+        tool = "mcp__bigquery__run_query"
+        tool_use_id = f"toolu_{uuid.uuid4().hex[:12]}"
+
+        await asyncio.sleep(model.first_message_latency)
+        self._emit(
+            {
+                "type": "assistant",
+                "message": {
+                    "model": "benchmark",
+                    "content": [
+                        {"type": "text", "text": "データを確認します。"},
+                        {
+                            "type": "tool_use",
+                            "id": tool_use_id,
+                            "name": tool,
+                            "input": {"sql": sql},
+                        },
+                    ],
+                },
+            }
+        )
+        if tool not in (self.options.allowed_tools or []):
+            result: Dict[str, Any] = {
+                "content": [{"type": "text", "text": f"{tool} is not allowed"}],
+                "is_error": True,
+            }
+        else:
+            try:
+                result = await self._call_tool(tool, {"sql": sql})
+            except Exception as e:
+                result = {
+                    "content": [{"type": "text", "text": f"Tool call failed: {e}"}],
+                    "is_error": True,
+                }
+        model.tool_results.append(result)
+        self._emit(
+            {
+                "type": "user",
+                "message": {
+                    "content": [
+                        {
+                            "type": "tool_result",
+                            "tool_use_id": tool_use_id,
+                            "content": result["content"],
+                            "is_error": result.get("is_error", False),
+                        }
+                    ]
+                },
+            }
+        )
+        if result.get("is_error"):
+            self._result(started, 1, "error_during_execution")
+            return
+        if (self.options.max_turns or 0) < 2:
+            self._result(started, 1, "error_max_turns")
+            return
+
+        report = model._report(sql)
+        size = -(-len(report) // model.report_messages)
+        for offset in range(0, len(report), size):
+            await asyncio.sleep(model.message_latency)
+            self._emit(
+                {
+                    "type": "assistant",
+                    "message": {
+                        "model": "benchmark",
+                        "content": [
+                            {"type": "text", "text": report[offset : offset + size]}
+                        ],
+                    },
+                }
+            )
+        self._result(started, 2)
+
+
+class FakeClaude:
+    """The model behind ``FakeClaudeCLI``: a canned report run.
+
+    Each run mirrors a real report run: a ``run_query`` tool call answered
+    by the app's in-process MCP server (so through ``bigquery_service``),
+    then the report JSON written over ``report_messages`` assistant
+    messages, then the result message. ``first_message_latency`` and
+    ``message_latency`` model the model's response times. ``transport``
+    makes a CLI for ``claude_code_sdk``, for one-shot queries and pooled
+    clients alike.
+    """
+
+    def __init__(
+        self,
+        bigquery_client: "FakeBigQueryClient",
+        first_message_latency: float = 0.5,
+        message_latency: float = 0.05,
+        table_rows: int = 100,
+        report_messages: int = 4,
+    ):
+        """Initialize fake."""
+        self.bigquery_client = bigquery_client
+        self.first_message_latency = first_message_latency
+        self.message_latency = message_latency
+        self.table_rows = table_rows
+        self.report_messages = report_messages
+        self.runs = 0
+        self.tool_results: List[Dict[str, Any]] = []
+
+    def transport(self, prompt: Any, options: Any) -> FakeClaudeCLI:
+        """Start a CLI process (``SubprocessCLITransport``'s signature)."""
+        return FakeClaudeCLI(self, prompt, options)
+
+    def _sql(self, prompt: str) -> str:
+        """A query that differs per prompt, as the agent's would."""
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+        return (
+            "SELECT date, campaign_name, channel, impressions, clicks, cost, "
+            "conversions FROM `growth-force-project.semantic."
+            f"{DEFAULT_TABLE}` WHERE campaign_name != 'q{digest}' "
+            f"LIMIT {self.table_rows}"
+        )
+
+    def _report(self, sql: str, columns: Optional[Dict[str, List[Any]]] = None) -> str:
+        """The report document the agent writes.
+
+        Built from the full result (the tool output the model sees is
+        sampled), which is what the query above returns.
+        """
+        from src.services.component_serializer import serialize_component
+
+        if columns is None:
+            columns = {
+                name: values
+                for (name, _, _), values in zip(
+                    SEMANTIC_TABLES[DEFAULT_TABLE],
+                    self.bigquery_client._table_data(DEFAULT_TABLE, self.table_rows),
+                )
+            }
+        chart_columns = {key: columns[key][:60] for key in ("date", "cost", "clicks")}
+        components = [
+            '{"type":"Summary","props":{"title":"概要","content":'
+            '"直近の広告パフォーマンスを集計しました。"}}',
+            '{"type":"Metric","props":{"label":"総コスト","value":'
+            f'{sum(columns["cost"]):.0f}}}}}',
+            serialize_component("LineChart", chart_columns, title="日別コスト"),
+            serialize_component("Table", columns, title="キャンペーン別"),
+        ]
+        escaped_sql = sql.replace('"', '\\"')
+        return (
+            "分析結果は以下のとおりです。\n```json\n"
+            '{"components":[' + ",".join(components) + "],"
+            f'"metadata":{{"query_executed":"{escaped_sql}",'
+            '"data_range":"2024-01-01 to 2024-12-31",'
+            f'"row_count":"{len(columns["date"])}"}}}}\n```'
+        )
+
+
+class SqliteRollupEngine:
+    """A ``RollupEngine`` over an SQLite database, for local runs.
+
+    Source tables hold the ``SEMANTIC_TABLES`` columns, dates as ISO text,
+    with a daily partition per date whose last-modified time is kept in
+    ``__partitions__``. Rollup tables live in the same database; replacing
+    periods is a DELETE and INSERT in one transaction. Statements run on the
+    calling thread, as SQLite answers these in milliseconds.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """Initialize engine."""
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS __partitions__ ("
+            "table_name TEXT, partition_id TEXT, last_modified INTEGER, "
+            "PRIMARY KEY (table_name, partition_id))"
+        )
+        self.statements = 0
+        self._modified_ms = 0
+
+    def source_table(self, table: str) -> str:
+        """Reference to a source table in SQL."""
+        return table
+
+    def rollup_table(self, table: str) -> str:
+        """Reference to a rollup table in SQL."""
+        return table
+
+    def period(self, column: str, grain: str) -> str:
+        """First day of the period, weeks starting on Monday."""
+        if grain == "week":
+            return (
+                f"date({column}, '-' || "
+                f"((CAST(strftime('%w', {column}) AS INTEGER) + 6) % 7) || ' days')"
+            )
+        if grain == "month":
+            return f"date({column}, 'start of month')"
+        return column
+
+    def execute(self, sql: str, parameters: Iterable[Any] = ()) -> List[Tuple]:
+        """Run one statement and fetch its rows."""
+        self.statements += 1
+        return self.connection.execute(sql, tuple(parameters)).fetchall()
+
+    async def columns(self, table: str) -> List[Dict[str, Any]]:
+        """Columns of a source table, typed as in BigQuery."""
+        return [
+            {"name": name, "type": field_type, "mode": "NULLABLE"}
+            for name, field_type, _ in SEMANTIC_TABLES.get(table, _AD_PERFORMANCE)
+        ]
+
+    async def partitions(self, table: str) -> Dict[str, int]:
+        """Last-modified time of each partition of a source table."""
+        return dict(
+            self.execute(
+                "SELECT partition_id, last_modified FROM __partitions__ "
+                "WHERE table_name = ?",
+                (table,),
+            )
+        )
+
+    async def create(
+        self, table: str, select: str, dimensions: Tuple[str, ...]
+    ) -> None:
+        """Create an empty rollup table, indexed like BigQuery clusters it."""
+        from src.services.rollups import PERIOD_COLUMN
+
+        with self.connection:
+            self.execute(f"CREATE TABLE IF NOT EXISTS {table} AS {select}")
+            self.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_layout "
+                f"ON {table} ({PERIOD_COLUMN}, {', '.join(dimensions)})"
+            )
+
+    async def replace(
+        self,
+        table: str,
+        select: str,
+        start: Optional[datetime.date],
+        end: Optional[datetime.date],
+    ) -> None:
+        """Replace the periods from ``start`` to ``end`` (or all) atomically."""
+        from src.services.rollups import PERIOD_COLUMN
+
+        with self.connection:
+            if start is None or end is None:
+                self.execute(f"DELETE FROM {table}")
+            else:
+                self.execute(
+                    f"DELETE FROM {table} WHERE {PERIOD_COLUMN} BETWEEN ? AND ?",
+                    (start.isoformat(), end.isoformat()),
+                )
+            self.execute(f"INSERT INTO {table} {select}")
+
+    async def drop(self, table: str) -> None:
+        """Drop a rollup table."""
+        with self.connection:
+            self.execute(f"DROP TABLE IF EXISTS {table}")
+
+    def close(self) -> None:
+        """Close the database."""
+        self.connection.close()
+
+    def _ad_rows(
+        self, dates: List[datetime.date], ads_per_campaign: int, seed: int
+    ) -> Iterable[Tuple[Any, ...]]:
+        """Ad-level rows: 40 campaigns, each on one channel, per date."""
+        rng = random.Random(seed)
+        for date in dates:
+            for campaign in range(40):
+                for _ in range(ads_per_campaign):
+                    impressions = rng.randint(100, 20000)
+                    clicks = rng.randint(0, impressions // 20)
+                    yield (
+                        date.isoformat(),
+                        f"campaign_{campaign:02d}",
+                        _CHANNELS[campaign % len(_CHANNELS)],
+                        impressions,
+                        clicks,
+                        round(clicks * rng.uniform(20, 120), 2),
+                        rng.randint(0, clicks // 10 + 1),
+                    )
+
+    def load(
+        self,
+        table: str,
+        dates: List[datetime.date],
+        ads_per_campaign: int = 25,
+        seed: int = 0,
+    ) -> int:
+        """(Re)write a fact table's rows for ``dates``; returns rows written.
+
+        Each date's partition gets a new last-modified time, as a load job
+        overwriting that partition would.
+        """
+        columns = SEMANTIC_TABLES[table]
+        names = [name for name, _, _ in columns]
+        with self.connection:
+            self.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                + ", ".join(
+                    f"{name} {'REAL' if field_type == 'FLOAT' else field_type}"
+                    for name, field_type, _ in columns
+                )
+                + ")"
+            )
+            self.execute(f"CREATE INDEX IF NOT EXISTS {table}_date ON {table} (date)")
+            placeholders = ", ".join("?" for _ in dates)
+            self.execute(
+                f"DELETE FROM {table} WHERE date IN ({placeholders})",
+                [date.isoformat() for date in dates],
+            )
+            cursor = self.connection.executemany(
+                f"INSERT INTO {table} ({', '.join(names)}) "
+                f"VALUES ({', '.join('?' for _ in names)})",
+                self._ad_rows(dates, ads_per_campaign, seed),
+            )
+            # Strictly increasing, so quick reloads still look modified
+            self._modified_ms = max(int(time.time() * 1000), self._modified_ms + 1)
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO __partitions__ VALUES (?, ?, ?)",
+                [(table, date.strftime("%Y%m%d"), self._modified_ms) for date in dates],
+            )
+        return cursor.rowcount
+
+
+def install_redis() -> None:
+    """Point both Redis client modes at one in-memory fakeredis server."""
+    from src.services import redis_client
+
+    server = fakeredis.FakeServer()
+    redis_client._clients.clear()
+    for decode_responses in (True, False):
+        redis_client._clients[decode_responses] = fakeredis.FakeAsyncRedis(
+            server=server, decode_responses=decode_responses
+        )
+
+
+def install(
+    first_message_latency: float = 0.5,
+    message_latency: float = 0.05,
+    job_latency: float = 0.2,
+    table_rows: int = 100,
+    token_latency: float = 0.1,
+) -> Tuple[FakeClaude, FakeBigQueryClient]:
+    """Swap the stand-ins into the app's services.
+
+    Call before the app starts, since the container builds its services on
+    first use. Redis becomes an in-memory fakeredis server shared by both
+    client modes. Claude Code runs, one-shot or pooled, get a
+    ``FakeClaudeCLI`` in place of the CLI subprocess.
+    """
+    from src.services.bigquery_service import BigQueryService
+
+    install_redis()
+
+    client = FakeBigQueryClient(
+        job_latency=job_latency, default_rows=table_rows, token_latency=token_latency
+    )
+    BigQueryService._create_client = lambda self: client
+
+    fake = FakeClaude(
+        client,
+        first_message_latency=first_message_latency,
+        message_latency=message_latency,
+        table_rows=table_rows,
+    )
+    # query() and ClaudeSDKClient.connect() both start the CLI through these
+    sdk_client.SubprocessCLITransport = fake.transport
+    subprocess_cli.SubprocessCLITransport = fake.transport
+    return fake, client
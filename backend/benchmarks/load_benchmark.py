@@ -0,0 +1,385 @@
+"""Offline load test of the report API with local stand-ins.
+
+Runs the FastAPI app in-process with a fake ``claude_code_sdk.query``
+(canned transcripts with configurable latency), a fake BigQuery client
+(synthetic rows for the semantic tables) and fakeredis; see
+``benchmarks/fakes.py``. Scenarios:
+
+- ``single``: sequential ``/generate`` requests, one at a time
+- ``chat``: concurrent sessions asking follow-up questions
+- ``large``: ``/generate`` with a large Table result, compressed
+- ``columnar``: row dicts vs column lists + direct serialization, 1M rows
+- ``parser``: incremental component parsing vs parsing the whole transcript
+- ``cache``: report and BigQuery result cache round-trips
+
+Latency percentiles, throughput and peak RSS are written as JSON to
+``--output``; pass an earlier file as ``--baseline`` to print p95 ratios.
+
+    uv run python -m benchmarks.load_benchmark --output before.json
+    uv run python -m benchmarks.load_benchmark --baseline before.json
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import resource
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from benchmarks import fakes
+
+fakes.configure_environment()
+
+import httpx  # noqa: E402
+
+from src.config import settings  # noqa: E402
+
+ALL_SCENARIOS = ["single", "chat", "large", "columnar", "parser", "cache"]
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    index = max(0, int(round(fraction * len(ordered) + 0.5)) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def summarize(
+    latencies: List[float], elapsed: float, errors: int = 0
+) -> Dict[str, Any]:
+    """Latency percentiles (ms), throughput and the process's peak RSS so far."""
+    ordered = sorted(latencies)
+    stats: Dict[str, Any] = {"count": len(ordered), "errors": errors}
+    if ordered:
+        stats.update(
+            p50_ms=_percentile(ordered, 0.50) * 1000,
+            p95_ms=_percentile(ordered, 0.95) * 1000,
+            p99_ms=_percentile(ordered, 0.99) * 1000,
+            throughput_per_sec=len(ordered) / elapsed,
+        )
+    # ru_maxrss is in KiB on Linux
+    stats["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return stats
+
+
+async def _timed_calls(
+    call: Callable[[int], Awaitable[bool]], count: int, concurrency: int
+) -> Dict[str, Any]:
+    """Run ``count`` calls with ``concurrency`` workers; ``call`` returns success."""
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(count))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            if await call(i):
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def scenario_single(client: httpx.AsyncClient, args: argparse.Namespace) -> Dict:
+    """One request at a time, each a distinct question."""
+
+    async def call(i: int) -> bool:
+        response = await client.post(
+            "/api/reports/generate",
+            json={"query": f"直近30日のコスト推移を教えて #{i}"},
+        )
+        return response.status_code == 200
+
+    return await _timed_calls(call, args.requests, 1)
+
+
+async def scenario_chat(client: httpx.AsyncClient, args: argparse.Namespace) -> Dict:
+    """Concurrent sessions, each asking ``--turns`` follow-up questions."""
+
+    async def call(i: int) -> bool:
+        session, turn = divmod(i, args.turns)
+        response = await client.post(
+            "/api/reports/generate",
+            json={
+                "query": f"キャンペーン別に分解して（{turn}回目）",
+                "session_id": f"benchmark-session-{session}",
+            },
+        )
+        return response.status_code == 200
+
+    # One worker per session, so a session's turns run in order
+    return await _timed_calls(call, args.sessions * args.turns, args.sessions)
+
+
+async def scenario_large(
+    client: httpx.AsyncClient, args: argparse.Namespace, fake: fakes.FakeClaude
+) -> Dict:
+    """Reports whose Table holds ``--large-rows`` rows."""
+    wire_bytes: List[int] = []
+    fake.table_rows = args.large_rows
+
+    async def call(i: int) -> bool:
+        size = 0
+        async with client.stream(
+            "POST",
+            "/api/reports/generate",
+            json={"query": f"全キャンペーンの日別明細を表示して #{i}"},
+            headers={"Accept-Encoding": "br, gzip"},
+        ) as response:
+            async for chunk in response.aiter_raw():
+                size += len(chunk)
+        wire_bytes.append(size)
+        return response.status_code == 200
+
+    try:
+        stats = await _timed_calls(call, args.large_requests, args.concurrency)
+    finally:
+        fake.table_rows = args.table_rows
+    stats["rows"] = args.large_rows
+    stats["bytes_per_response"] = sum(wire_bytes) / max(len(wire_bytes), 1)
+    return stats
+
+
+async def scenario_columnar(args: argparse.Namespace) -> Dict:
+    """Row dicts + json.dumps vs column lists + direct serialization."""
+    from src.container import container
+    from src.services.component_serializer import serialize_component
+
+    service = container.bigquery_service
+    client = service.client
+    sql = (
+        "SELECT * FROM `growth-force-project.semantic.fact_meta_ad_performance_daily`"
+        f" LIMIT {args.columnar_rows}"
+    )
+    # Measure fetch and serialization only
+    saved = (
+        client.job_latency,
+        settings.query_cache_enabled,
+        settings.single_flight_enabled,
+    )
+    client.job_latency = 0.0
+    settings.query_cache_enabled = False
+    settings.single_flight_enabled = False
+    client._table_data(fakes.DEFAULT_TABLE, args.columnar_rows)
+
+    async def rows_path() -> None:
+        rows = await service.execute_query(sql)
+        json.dumps(
+            {"type": "Table", "props": {"columns": list(rows[0]), "data": rows}},
+            ensure_ascii=False,
+            default=str,
+        )
+
+    async def columnar_path() -> None:
+        columns = await service.execute_query_columnar(sql)
+        serialize_component("Table", columns)
+
+    results: Dict[str, Any] = {"rows": args.columnar_rows}
+    try:
+        for name, path in (("rows", rows_path), ("columnar", columnar_path)):
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(args.columnar_repeats):
+                call_started = time.perf_counter()
+                await path()
+                latencies.append(time.perf_counter() - call_started)
+            results[name] = summarize(latencies, time.perf_counter() - started)
+    finally:
+        (
+            client.job_latency,
+            settings.query_cache_enabled,
+            settings.single_flight_enabled,
+        ) = saved
+    return results
+
+
+def scenario_parser(args: argparse.Namespace, fake: fakes.FakeClaude) -> Dict:
+    """Incremental parsing of a streamed report vs one parse at the end."""
+    from src.services.component_parser import ComponentStreamParser
+
+    columns = {
+        name: values
+        for (name, _, _), values in zip(
+            fakes.SEMANTIC_TABLES[fakes.DEFAULT_TABLE],
+            fake.bigquery_client._table_data(fakes.DEFAULT_TABLE, args.parser_rows),
+        )
+    }
+    transcript = fake._report("SELECT 1", columns)
+    chunks = [
+        transcript[offset : offset + args.chunk_size]
+        for offset in range(0, len(transcript), args.chunk_size)
+    ]
+    fence = re.compile(r"```json\s*(.*?)\s*```", re.DOTALL)
+
+    def incremental() -> None:
+        parser = ComponentStreamParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+        parser.close()
+
+    def whole() -> None:
+        text = ""
+        for chunk in chunks:
+            text += chunk
+        json.loads(fence.search(text).group(1))
+
+    results: Dict[str, Any] = {"transcript_bytes": len(transcript.encode("utf-8"))}
+    for name, parse in (("incremental", incremental), ("whole", whole)):
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(args.parser_repeats):
+            call_started = time.perf_counter()
+            parse()
+            latencies.append(time.perf_counter() - call_started)
+        stats = summarize(latencies, time.perf_counter() - started)
+        stats["mb_per_sec"] = (
+            results["transcript_bytes"]
+            * len(latencies)
+            / 1024**2
+            / (time.perf_counter() - started)
+        )
+        results[name] = stats
+    return results
+
+
+async def scenario_cache(args: argparse.Namespace) -> Dict:
+    """Round-trips of the report cache and the BigQuery result cache."""
+    from src.container import container
+
+    service = container.bigquery_service
+    columns = {
+        name: values
+        for (name, _, _), values in zip(
+            fakes.SEMANTIC_TABLES[fakes.DEFAULT_TABLE],
+            service.client._table_data(fakes.DEFAULT_TABLE, args.table_rows),
+        )
+    }
+    report = {
+        "components": [
+            {"type": "Table", "props": {"columns": list(columns), "data": []}}
+        ],
+        "metadata": {"query_executed": "SELECT 1"},
+    }
+    sql = f"SELECT * FROM `semantic.{fakes.DEFAULT_TABLE}` LIMIT {args.table_rows}"
+
+    # Stay within the LRU bound so every get is a hit
+    keys = min(args.cache_requests, settings.report_cache_max_entries)
+
+    async def report_set(i: int) -> bool:
+        key = await container.report_cache.make_key(f"キャッシュ #{i % keys}", {})
+        await container.report_cache.set(key, report)
+        return True
+
+    async def report_get(i: int) -> bool:
+        key = await container.report_cache.make_key(f"キャッシュ #{i % keys}", {})
+        return await container.report_cache.get(key) is not None
+
+    lookup = await service.query_cache.lookup(sql)
+
+    async def query_get(i: int) -> bool:
+        return await service.query_cache.get(lookup) is not None
+
+    await service.query_cache.set(lookup, columns)
+    count = args.cache_requests
+    return {
+        "report_cache_set": await _timed_calls(report_set, count, args.concurrency),
+        "report_cache_get": await _timed_calls(report_get, count, args.concurrency),
+        "query_cache_get": await _timed_calls(query_get, count, args.concurrency),
+    }
+
+
+def _compare(results: Dict[str, Any], baseline: Dict[str, Any], path: str = "") -> None:
+    """Print p95 ratios against a baseline run (>1 is slower)."""
+    for key, value in results.items():
+        if not isinstance(value, dict):
+            continue
+        before = baseline.get(key)
+        if not isinstance(before, dict):
+            continue
+        name = f"{path}.{key}" if path else key
+        if "p95_ms" in value and before.get("p95_ms"):
+            ratio = value["p95_ms"] / before["p95_ms"]
+            print(
+                f"{name}: p95 {before['p95_ms']:.1f} -> "
+                f"{value['p95_ms']:.1f} ms ({ratio:.2f}x)"
+            )
+        _compare(value, before, name)
+
+
+async def main() -> None:
+    """Run the selected scenarios and write results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenarios", default=",".join(ALL_SCENARIOS))
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--first-message-latency", type=float, default=0.5)
+    parser.add_argument("--message-latency", type=float, default=0.05)
+    parser.add_argument("--job-latency", type=float, default=0.2)
+    parser.add_argument("--report-messages", type=int, default=4)
+    parser.add_argument("--chunk-size", type=int, default=4096, help="parser scenario")
+    parser.add_argument("--table-rows", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--large-rows", type=int, default=20000)
+    parser.add_argument("--large-requests", type=int, default=20)
+    parser.add_argument("--columnar-rows", type=int, default=1_000_000)
+    parser.add_argument("--columnar-repeats", type=int, default=3)
+    parser.add_argument("--parser-rows", type=int, default=20000)
+    parser.add_argument("--parser-repeats", type=int, default=20)
+    parser.add_argument("--cache-requests", type=int, default=2000)
+    args = parser.parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+
+    fake, _ = fakes.install(
+        first_message_latency=args.first_message_latency,
+        message_latency=args.message_latency,
+        job_latency=args.job_latency,
+        table_rows=args.table_rows,
+    )
+    fake.report_messages = args.report_messages
+    from src.main import app
+
+    results: Dict[str, Any] = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "baseline")
+        },
+    }
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", timeout=None
+        ) as client:
+            # API scenarios first, before the micro-benchmarks inflate peak RSS
+            if "single" in scenarios:
+                results["single"] = await scenario_single(client, args)
+            if "chat" in scenarios:
+                results["chat"] = await scenario_chat(client, args)
+            if "large" in scenarios:
+                results["large"] = await scenario_large(client, args, fake)
+        if "cache" in scenarios:
+            results["cache"] = await scenario_cache(args)
+        if "parser" in scenarios:
+            results["parser"] = scenario_parser(args, fake)
+        if "columnar" in scenarios:
+            results["columnar"] = await scenario_columnar(args)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            _compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+"""Benchmark the middleware stack in-process: requests/sec and bytes on the wire.
+
+Compares the previous ``@app.middleware("http")`` security header hook with
+the pure ASGI security and compression middleware, on ``/health`` and on a
+large report payload shaped like a ``/api/reports/generate`` response.
+
+    uv run python -m benchmarks.middleware_benchmark
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict
+
+import httpx
+from fastapi import FastAPI, Request
+
+from src.middleware.compression import CompressionMiddleware
+from src.middleware.security import SecurityHeadersMiddleware
+
+
+def _report_payload(rows: int) -> Dict[str, Any]:
+    """Build a report response with a large table."""
+    return {
+        "session_id": "benchmark",
+        "components": [
+            {
+                "type": "Table",
+                "props": {
+                    "columns": ["date", "campaign", "cost", "clicks", "conversions"],
+                    "data": [
+                        {
+                            "date": f"2024-01-{i % 28 + 1:02d}",
+                            "campaign": f"campaign_{i % 40}",
+                            "cost": i * 13 % 100000,
+                            "clicks": i * 7 % 5000,
+                            "conversions": i % 50,
+                        }
+                        for i in range(rows)
+                    ],
+                },
+            }
+        ],
+        "metadata": {"query_executed": "SELECT ...", "row_count": rows},
+    }
+
+
+def _add_routes(app: FastAPI, payload: Dict[str, Any]) -> FastAPI:
+    """Add the benchmarked endpoints."""
+
+    @app.get("/health")
+    async def health() -> Dict[str, str]:
+        return {"status": "healthy"}
+
+    @app.get("/api/reports/large")
+    async def large() -> Dict[str, Any]:
+        return payload
+
+    return app
+
+
+def legacy_app(payload: Dict[str, Any]) -> FastAPI:
+    """The previous stack: BaseHTTPMiddleware header hook, no compression."""
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def add_security_headers(request: Request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Strict-Transport-Security"] = (
+            "max-age=31536000; includeSubDomains"
+        )
+        return response
+
+    return _add_routes(app, payload)
+
+
+def current_app(payload: Dict[str, Any]) -> FastAPI:
+    """The pure ASGI stack."""
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(SecurityHeadersMiddleware)
+    return _add_routes(app, payload)
+
+
+async def _run(
+    app: FastAPI, path: str, requests: int, concurrency: int
+) -> Dict[str, float]:
+    """Send ``requests`` GETs with ``concurrency`` workers; return stats."""
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Accept-Encoding": "br, gzip"}
+    wire_bytes = 0
+    counter = iter(range(requests))
+
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def worker() -> None:
+            nonlocal wire_bytes
+            for _ in counter:
+                async with client.stream("GET", path, headers=headers) as response:
+                    async for chunk in response.aiter_raw():
+                        wire_bytes += len(chunk)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests_per_sec": requests / elapsed,
+        "bytes_per_response": wire_bytes / requests,
+    }
+
+
+async def main() -> None:
+    """Run the benchmark and print results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--large-requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    payload = _report_payload(args.rows)
+    results: Dict[str, Any] = {}
+    for name, factory in (("legacy", legacy_app), ("current", current_app)):
+        app = factory(payload)
+        results[name] = {
+            "health": await _run(app, "/health", args.requests, args.concurrency),
+            "large_report": await _run(
+                app, "/api/reports/large", args.large_requests, args.concurrency
+            ),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
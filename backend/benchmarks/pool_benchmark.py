@@ -0,0 +1,114 @@
+"""Time-to-first-message with and without the Claude Code process pool.
+
+Runs ``ClaudeService.stream_analysis`` against ``benchmarks/stub_claude.py``
+put on ``PATH`` as ``claude``, so each run starts a real subprocess with a
+modelled runtime startup (``--startup``) and model latency (``--latency``).
+Requests rotate over ``--sessions`` sessions, so later requests are
+follow-ups that can reuse their session's process. Reports latency to the
+first text from the agent, total run time and the pool's counters.
+
+    uv run python -m benchmarks.pool_benchmark
+    uv run python -m benchmarks.pool_benchmark --startup 2.0 --requests 40
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import stat
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks import fakes
+from benchmarks.load_benchmark import summarize
+
+STUB = Path(__file__).with_name("stub_claude.py")
+
+
+def install_stub_cli(directory: str) -> None:
+    """Put an executable ``claude`` running the stub first on ``PATH``."""
+    path = Path(directory) / "claude"
+    path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{STUB}" "$@"\n')
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = f"{directory}{os.pathsep}{os.environ['PATH']}"
+
+
+async def run_mode(pooled: bool, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the requests with the pool enabled or disabled."""
+    from src.config import settings
+    from src.services.claude_service import ClaudeService
+
+    settings.claude_pool_enabled = pooled
+    settings.claude_pool_size = args.pool_size
+    settings.single_flight_enabled = False
+    service = ClaudeService()
+    await service.start()
+    if pooled:
+        # Measure steady state, not the initial fill
+        while service.pool.stats()["fresh"] < args.pool_size:
+            await asyncio.sleep(0.05)
+
+    first_text: List[float] = []
+    totals: List[float] = []
+    errors = 0
+    started = time.perf_counter()
+    try:
+        for i in range(args.requests):
+            session_id = f"session-{i % args.sessions}"
+            run_started = time.perf_counter()
+            seen_text = False
+            try:
+                async for event in service.stream_analysis(f"質問 {i}", session_id, {}):
+                    data = event["data"]
+                    if not seen_text and data.get("stage") == "text":
+                        seen_text = True
+                        first_text.append(time.perf_counter() - run_started)
+                totals.append(time.perf_counter() - run_started)
+            except Exception:
+                errors += 1
+            await asyncio.sleep(args.interval)
+        elapsed = time.perf_counter() - started
+        stats = summarize(first_text, elapsed, errors)
+        stats["total_p50_ms"] = summarize(totals, elapsed)["p50_ms"]
+        if pooled:
+            stats["pool"] = service.pool.stats()
+        return stats
+    finally:
+        await service.close()
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run both modes with fake Redis."""
+    fakes.install_redis()
+    return {
+        "config": vars(args),
+        "spawn_per_request": await run_mode(False, args),
+        "pool": await run_mode(True, args),
+    }
+
+
+def main() -> None:
+    """Run the pool benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--interval", type=float, default=0.2)
+    parser.add_argument("--startup", type=float, default=1.0)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    fakes.configure_environment()
+    os.environ["STUB_CLAUDE_STARTUP"] = str(args.startup)
+    os.environ["STUB_CLAUDE_LATENCY"] = str(args.latency)
+    with tempfile.TemporaryDirectory() as directory:
+        install_stub_cli(directory)
+        results = asyncio.run(run(args))
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Rollup benchmark: refresh cost and per-question savings, on SQLite.
+
+Loads a year of synthetic ad-level rows (40 campaigns × ``--ads`` ads per
+day) into both daily fact tables of an SQLite database, then:
+
+1. refreshes every configured rollup from scratch,
+2. reloads ``--touched-days`` recent days plus one older day (a late
+   correction) and refreshes again, counting the period ranges recomputed,
+3. checks every rollup equals its aggregate recomputed from scratch,
+4. answers typical questions from the raw table and from a rollup,
+   comparing latency, rows scanned and estimated bytes scanned (rows ×
+   referenced columns × 8, as BigQuery bills referenced columns of the
+   pruned partitions), and checks both give the same answer,
+5. prints the schema digest section the agent sees.
+
+Redis is fakeredis; ``SqliteRollupEngine`` in ``benchmarks/fakes.py`` stands
+in for BigQuery.
+
+    uv run python -m benchmarks.rollup_benchmark
+    uv run python -m benchmarks.rollup_benchmark --ads 50 --repeats 10
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import statistics
+import time
+from typing import Any, Dict, List, Tuple
+
+from benchmarks import fakes
+
+fakes.configure_environment()
+
+SOURCE = "fact_meta_ad_performance_daily"
+DATES = [datetime.date(2024, 1, 1) + datetime.timedelta(days=i) for i in range(366)]
+
+
+def _normalize(rows: List[Tuple]) -> List[Tuple]:
+    """Sort rows and round floats, so sums in any order compare equal."""
+    return sorted(
+        tuple(round(value, 4) if isinstance(value, float) else value for value in row)
+        for row in rows
+    )
+
+
+def _questions(engine: Any) -> List[Dict[str, Any]]:
+    """Typical questions as raw and rollup SQL over the same date range."""
+    from src.services.rollups import RollupDefinition, bucket_start
+
+    last = DATES[-1]
+
+    def rollup(grain: str, *dimensions: str) -> str:
+        return RollupDefinition(SOURCE, grain, dimensions).name
+
+    week_start = bucket_start(last - datetime.timedelta(weeks=11), "week")
+    day_30 = last - datetime.timedelta(days=29)
+    day_90 = last - datetime.timedelta(days=89)
+    return [
+        {
+            "question": "月別・チャネル別の費用（通年）",
+            "raw": (
+                f"SELECT {engine.period('date', 'month')} AS month, channel, "
+                f"SUM(cost) FROM {SOURCE} GROUP BY month, channel",
+                "TRUE",
+                3,
+            ),
+            "rollup": (
+                "SELECT period_start, channel, SUM(cost) "
+                f"FROM {rollup('month', 'channel')} GROUP BY period_start, channel",
+                "TRUE",
+                3,
+            ),
+            "tables": (SOURCE, rollup("month", "channel")),
+        },
+        {
+            "question": "直近12週のキャンペーン別コンバージョン（週次）",
+            "raw": (
+                f"SELECT {engine.period('date', 'week')} AS week, campaign_name, "
+                f"SUM(conversions) FROM {SOURCE} WHERE date >= '{week_start}' "
+                "GROUP BY week, campaign_name",
+                f"date >= '{week_start}'",
+                3,
+            ),
+            "rollup": (
+                "SELECT period_start, campaign_name, SUM(conversions) "
+                f"FROM {rollup('week', 'campaign_name', 'channel')} "
+                f"WHERE period_start >= '{week_start}' "
+                "GROUP BY period_start, campaign_name",
+                f"period_start >= '{week_start}'",
+                3,
+            ),
+            "tables": (SOURCE, rollup("week", "campaign_name", "channel")),
+        },
+        {
+            "question": "直近30日のチャネル別クリック推移（日次）",
+            "raw": (
+                f"SELECT date, channel, SUM(clicks) FROM {SOURCE} "
+                f"WHERE date >= '{day_30}' GROUP BY date, channel",
+                f"date >= '{day_30}'",
+                3,
+            ),
+            "rollup": (
+                "SELECT period_start, channel, SUM(clicks) "
+                f"FROM {rollup('day', 'channel')} "
+                f"WHERE period_start >= '{day_30}' GROUP BY period_start, channel",
+                f"period_start >= '{day_30}'",
+                3,
+            ),
+            "tables": (SOURCE, rollup("day", "channel")),
+        },
+        {
+            "question": "直近90日のキャンペーン別CPAランキング",
+            "raw": (
+                "SELECT campaign_name, SUM(cost) / NULLIF(SUM(conversions), 0) "
+                f"AS cpa FROM {SOURCE} WHERE date >= '{day_90}' "
+                "GROUP BY campaign_name ORDER BY cpa LIMIT 10",
+                f"date >= '{day_90}'",
+                4,
+            ),
+            "rollup": (
+                "SELECT campaign_name, SUM(cost) / NULLIF(SUM(conversions), 0) "
+                f"AS cpa FROM {rollup('day', 'campaign_name', 'channel')} "
+                f"WHERE period_start >= '{day_90}' "
+                "GROUP BY campaign_name ORDER BY cpa LIMIT 10",
+                f"period_start >= '{day_90}'",
+                4,
+            ),
+            "tables": (SOURCE, rollup("day", "campaign_name", "channel")),
+        },
+    ]
+
+
+def _measure(
+    engine: Any, table: str, query: Tuple[str, str, int], repeats: int
+) -> Tuple[Dict[str, Any], List[Tuple]]:
+    """Median latency, rows and estimated bytes scanned of one query."""
+    sql, condition, columns = query
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        rows = engine.execute(sql)
+        timings.append(time.perf_counter() - started)
+    scanned = engine.execute(f"SELECT COUNT(*) FROM {table} WHERE {condition}")[0][0]
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "rows_scanned": scanned,
+        "estimated_bytes": scanned * columns * 8,
+    }, rows
+
+
+async def _refresh(manager: Any, engine: Any) -> Dict[str, Any]:
+    """One timed refresh."""
+    statements = engine.statements
+    started = time.perf_counter()
+    refreshed = await manager.refresh()
+    return {
+        "seconds": round(time.perf_counter() - started, 3),
+        "ranges_recomputed": sum(refreshed.values()),
+        "statements": engine.statements - statements,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Load, refresh, verify and compare."""
+    from src.services.rollups import RollupManager
+    from src.services.schema_catalog import SchemaCatalog
+
+    fakes.install_redis()
+    engine = fakes.SqliteRollupEngine(args.database)
+    manager = RollupManager(engine_factory=lambda: engine)
+    sources = sorted({definition.source for definition in manager.definitions})
+
+    started = time.perf_counter()
+    loaded = sum(engine.load(source, DATES, args.ads) for source in sources)
+    results: Dict[str, Any] = {
+        "config": vars(args),
+        "source_rows": loaded,
+        "load_seconds": round(time.perf_counter() - started, 3),
+        "rollups": len(manager.definitions),
+    }
+
+    results["full_refresh"] = await _refresh(manager, engine)
+    results["unchanged_refresh"] = await _refresh(manager, engine)
+    touched = DATES[-args.touched_days :] + [DATES[60]]
+    for source in sources:
+        engine.load(source, touched, args.ads, seed=1)
+    results["incremental_refresh"] = {
+        "touched_partitions": len(touched) * len(sources),
+        **await _refresh(manager, engine),
+    }
+
+    mismatched = []
+    for rollup in await manager.describe():
+        definition = next(d for d in manager.definitions if d.name == rollup["name"])
+        expected = engine.execute(
+            manager.select(definition, rollup["measures"], "TRUE")
+        )
+        if _normalize(engine.execute(f"SELECT * FROM {rollup['name']}")) != _normalize(
+            expected
+        ):
+            mismatched.append(rollup["name"])
+    results["rollups_match_recompute"] = not mismatched
+    if mismatched:
+        results["mismatched"] = mismatched
+
+    results["questions"] = []
+    for question in _questions(engine):
+        raw_table, rollup_table = question["tables"]
+        raw, raw_rows = _measure(engine, raw_table, question["raw"], args.repeats)
+        rollup, rollup_rows = _measure(
+            engine, rollup_table, question["rollup"], args.repeats
+        )
+        results["questions"].append(
+            {
+                "question": question["question"],
+                "rollup_table": rollup_table,
+                "raw": raw,
+                "rollup": rollup,
+                "bytes_ratio": round(
+                    raw["estimated_bytes"] / max(rollup["estimated_bytes"], 1), 1
+                ),
+                "speedup": round(raw["median_ms"] / max(rollup["median_ms"], 0.01), 1),
+                "same_answer": _normalize(raw_rows) == _normalize(rollup_rows),
+            }
+        )
+
+    catalog = SchemaCatalog(bigquery_service=None)
+    catalog.tables = {
+        name: {
+            "columns": [
+                {"name": column, "type": field_type}
+                for column, field_type, _ in fakes.SEMANTIC_TABLES[name]
+            ]
+        }
+        for name in fakes.SEMANTIC_TABLES
+    }
+    catalog.rollups = await manager.describe()
+    results["schema_digest"] = catalog.render_digest(
+        "Metaの直近3か月のチャネル別CPA推移"
+    ).split("\n")
+    manager.close()
+    return results
+
+
+def main() -> None:
+    """Run the rollup benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--ads", type=int, default=25, help="Ads per campaign")
+    parser.add_argument("--touched-days", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--database", default=":memory:")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
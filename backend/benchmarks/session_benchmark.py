@@ -0,0 +1,125 @@
+"""Benchmark SessionService throughput and latency against a Redis server.
+
+Each simulated request does what ``/generate`` does: read the session, then
+save it. Compares the legacy JSON/no-cache path with the current service.
+
+    uv run python -m benchmarks.session_benchmark --redis-url redis://localhost:6379
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List
+
+import redis.asyncio as redis
+
+from src.config import settings
+from src.services import redis_client
+from src.services.session_service import SessionService
+
+SAMPLE_METADATA: Dict[str, Any] = {
+    "query_executed": "SELECT date, SUM(cost) AS cost FROM fact_meta_ad_performance_daily "
+    "WHERE date >= DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY) GROUP BY date ORDER BY date",
+    "data_range": "2024-01-01 to 2024-01-31",
+    "duration_ms": 12345,
+    "num_turns": 3,
+    "bigquery": {"queries": 2, "bytes_processed": 123456789, "cache_hits": 1},
+    "cache": {"hit": False},
+}
+
+
+class LegacySessionService:
+    """The original service: own client, plain JSON, no local cache."""
+
+    def __init__(self, url: str):
+        """Initialize legacy service."""
+        self.client = redis.from_url(url, decode_responses=True)
+
+    async def get_session(self, session_id: str) -> Any:
+        """Get session data."""
+        data = await self.client.get(f"session:{session_id}")
+        return json.loads(data) if data else None
+
+    async def save_session(self, session_id: str, data: Dict[str, Any]) -> None:
+        """Save session data."""
+        await self.client.setex(
+            f"session:{session_id}", 3600, json.dumps(data, ensure_ascii=False)
+        )
+
+
+async def _run(
+    request: Callable[[str], Awaitable[None]],
+    session_ids: List[str],
+    requests: int,
+    concurrency: int,
+) -> Dict[str, float]:
+    """Run ``requests`` calls with ``concurrency`` workers; return stats."""
+    latencies: List[float] = []
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        for i in counter:
+            started = time.perf_counter()
+            await request(session_ids[i % len(session_ids)])
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "sessions_per_sec": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main() -> None:
+    """Run the benchmark and print results as JSON."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--redis-url", default=settings.redis_url)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--sessions", type=int, default=500)
+    args = parser.parse_args()
+
+    settings.redis_url = args.redis_url
+    session_ids = [str(uuid.uuid4()) for _ in range(args.sessions)]
+    legacy = LegacySessionService(args.redis_url)
+    current = SessionService()
+
+    def cycle(service: Any) -> Callable[[str], Awaitable[None]]:
+        async def request(session_id: str) -> None:
+            context = await service.get_session(session_id)
+            await service.save_session(
+                session_id, {**(context or {}), **SAMPLE_METADATA}
+            )
+
+        return request
+
+    results = {
+        "legacy": await _run(
+            cycle(legacy), session_ids, args.requests, args.concurrency
+        ),
+        "current": await _run(
+            cycle(current), session_ids, args.requests, args.concurrency
+        ),
+    }
+    results["payload_bytes"] = {
+        "json": len(json.dumps(SAMPLE_METADATA, ensure_ascii=False).encode()),
+        "packed": len(
+            await redis_client.get_redis(False).get(f"session:{session_ids[0]}")
+        ),
+    }
+    print(json.dumps(results, indent=2))
+
+    await legacy.client.aclose()
+    await redis_client.close_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+"""Startup benchmark: import time and time-to-ready.
+
+- ``import``: wall time of ``import src.main`` in fresh interpreters, with no
+  Claude or BigQuery credentials in the environment, plus the services the
+  container had built by the end of the import (expected: none) and whether
+  the settings had been read (expected: false)
+- ``ready``: in-process with the stand-ins from ``benchmarks/fakes.py``, the
+  time until the lifespan has started (the app accepts requests) and until
+  ``/ready`` first returns 200 (warm-up finished)
+
+    uv run python -m benchmarks.startup_benchmark
+    uv run python -m benchmarks.startup_benchmark --no-warm-up
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict
+
+from benchmarks import fakes
+
+_IMPORT_PROBE = """
+import json, time
+from functools import cached_property
+started = time.perf_counter()
+import src.main
+elapsed = time.perf_counter() - started
+from src.config import get_settings
+from src.container import ServiceContainer, container
+built = [
+    name
+    for name, value in vars(ServiceContainer).items()
+    if isinstance(value, cached_property) and name in container.__dict__
+]
+settings_read = get_settings.cache_info().currsize > 0
+print(
+    json.dumps({"seconds": elapsed, "built": built, "settings_read": settings_read})
+)
+"""
+
+
+def measure_import(repeats: int) -> Dict[str, Any]:
+    """Import ``src.main`` in fresh interpreters without credentials."""
+    env = {
+        name: value
+        for name, value in os.environ.items()
+        if name != "CLAUDE_API_KEY" and not name.startswith("BQ_")
+    }
+    timings = []
+    built = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        timings.append(probe["seconds"])
+        built = probe["built"]
+        settings_read = probe["settings_read"]
+    return {
+        "repeats": repeats,
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "services_built_at_import": built,
+        "settings_read_at_import": settings_read,
+    }
+
+
+async def measure_ready(args: argparse.Namespace) -> Dict[str, Any]:
+    """Time from lifespan start to accepting requests and to ``/ready``."""
+    import httpx
+
+    fakes.install(job_latency=args.job_latency, token_latency=args.token_latency)
+    from src.config import settings
+    from src.main import app
+
+    settings.schema_catalog_enabled = True
+    settings.warm_up_enabled = args.warm_up
+
+    started = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        accepting = time.perf_counter() - started
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            while True:
+                response = await client.get("/ready")
+                if response.status_code == 200:
+                    break
+                await asyncio.sleep(0.005)
+            ready = time.perf_counter() - started
+    return {
+        "warm_up": args.warm_up,
+        "accepting_ms": accepting * 1000,
+        "ready_ms": ready * 1000,
+        "checks": response.json()["checks"],
+    }
+
+
+def main() -> None:
+    """Run the startup benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--import-repeats", type=int, default=5)
+    parser.add_argument("--job-latency", type=float, default=0.2)
+    parser.add_argument("--token-latency", type=float, default=0.1)
+    parser.add_argument(
+        "--no-warm-up", dest="warm_up", action="store_false", default=True
+    )
+    args = parser.parse_args()
+
+    fakes.configure_environment()
+    results = {
+        "import": measure_import(args.import_repeats),
+        "ready": asyncio.run(measure_ready(args)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Stand-in for the Claude Code CLI, speaking its stream-json protocol.
+
+Supports the two modes ``claude_code_sdk`` uses: ``--print -- <prompt>``
+(one prompt, then exit) and ``--input-format stream-json`` (initialize
+handshake, then one run per user message until stdin closes; ``/clear``
+answers with a bare result). ``STUB_CLAUDE_STARTUP`` models the runtime's
+startup (seconds before the process reads input) and ``STUB_CLAUDE_LATENCY``
+the model's time to first message.
+"""
+
+import json
+import os
+import sys
+import time
+import uuid
+
+STARTUP = float(os.environ.get("STUB_CLAUDE_STARTUP", "1.0"))
+LATENCY = float(os.environ.get("STUB_CLAUDE_LATENCY", "0.2"))
+
+REPORT = (
+    '```json\n{"components":[{"type":"Summary","props":{"title":"概要",'
+    '"content":"スタブの応答です。"}}],"metadata":{"row_count":"0"}}\n```'
+)
+
+
+def emit(message: dict) -> None:
+    """Write one stream-json line."""
+    sys.stdout.write(json.dumps(message, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def result(session_id: str, started: float) -> None:
+    """Write the result message ending a run."""
+    emit(
+        {
+            "type": "result",
+            "subtype": "success",
+            "duration_ms": int((time.perf_counter() - started) * 1000),
+            "duration_api_ms": 0,
+            "is_error": False,
+            "num_turns": 1,
+            "session_id": session_id,
+            "total_cost_usd": 0.0,
+            "usage": {},
+            "result": "",
+        }
+    )
+
+
+def run(prompt: str, session_id: str) -> None:
+    """Answer one prompt."""
+    started = time.perf_counter()
+    if prompt.strip() == "/clear":
+        result(session_id, started)
+        return
+    emit({"type": "system", "subtype": "init", "session_id": session_id})
+    time.sleep(LATENCY)
+    emit(
+        {
+            "type": "assistant",
+            "message": {
+                "model": "stub",
+                "content": [{"type": "text", "text": REPORT}],
+            },
+            "parent_tool_use_id": None,
+        }
+    )
+    result(session_id, started)
+
+
+def main() -> None:
+    """Run in print or streaming-input mode."""
+    time.sleep(STARTUP)
+    session_id = str(uuid.uuid4())
+
+    if "--print" in sys.argv:
+        run(sys.argv[-1], session_id)
+        return
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        message = json.loads(line)
+        if message.get("type") == "control_request":
+            emit(
+                {
+                    "type": "control_response",
+                    "response": {
+                        "subtype": "success",
+                        "request_id": message["request_id"],
+                        "response": {},
+                    },
+                }
+            )
+        elif message.get("type") == "user":
+            content = message["message"]["content"]
+            if isinstance(content, list):
+                content = "".join(block.get("text", "") for block in content)
+            run(content, session_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,13 +6,11 @@ from typing import Any, Dict
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
 
-from src.services.claude_service import ClaudeService
+from src.container import container
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-claude_service = ClaudeService()
-
 
 class AuthTokenRequest(BaseModel):
     """Request model for setting auth tokens."""
@@ -33,7 +31,7 @@ class AuthTokenResponse(BaseModel):
 async def set_auth_tokens(request: AuthTokenRequest) -> AuthTokenResponse:
     """Set authentication tokens for Claude Code."""
     try:
-        success = await claude_service.set_auth_tokens(
+        success = await container.claude_service.set_auth_tokens(
             access_token=request.access_token,
             refresh_token=request.refresh_token,
             expires_at=request.expires_at
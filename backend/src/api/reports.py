@@ -1,21 +1,26 @@
 """Reports API endpoints."""
 
+import asyncio
+import json
 import logging
 import uuid
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional
 
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from src.services.claude_service import ClaudeService
-from src.services.session_service import SessionService
+from src.config import settings
+from src.container import container
+from src.services import metrics, table_export
+from src.services.bigquery_tools import ensure_read_only
+from src.services.report_cache import answer_context
+from src.services.run_scheduler import SchedulerBusyError
+from src.services.schema_catalog import estimate_tokens
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-claude_service = ClaudeService()
-session_service = SessionService()
-
 
 class ReportGenerateRequest(BaseModel):
     """Request model for report generation."""
@@ -23,6 +28,20 @@ class ReportGenerateRequest(BaseModel):
     query: str = Field(..., description="Natural language query")
     session_id: Optional[str] = Field(None, description="Session ID for context")
     context: Optional[Dict[str, Any]] = Field(None, description="Additional context")
+    priority: Literal["interactive", "scheduled"] = Field(
+        "interactive", description="Scheduling priority class"
+    )
+
+
+class ReportJobRequest(ReportGenerateRequest):
+    """Request model for an asynchronous report job."""
+
+    priority: Literal["interactive", "scheduled"] = Field(
+        "scheduled", description="Scheduling priority class"
+    )
+    callback_url: Optional[str] = Field(
+        None, description="Webhook to POST the finished job to"
+    )
 
 
 class ComponentConfig(BaseModel):
@@ -40,36 +59,212 @@ class ReportGenerateResponse(BaseModel):
     metadata: Optional[Dict[str, Any]] = Field(None, description="Response metadata")
 
 
-@router.post("/generate", response_model=ReportGenerateResponse)
-async def generate_report(request: ReportGenerateRequest) -> ReportGenerateResponse:
-    """Generate a report based on natural language query."""
-    try:
-        # Generate session ID if not provided
-        session_id = request.session_id or str(uuid.uuid4())
+class ReportJobResponse(BaseModel):
+    """Response model for an asynchronous report job."""
+
+    job_id: str = Field(..., description="Job ID")
+    status: Literal["queued", "running", "retrying", "succeeded", "failed"] = Field(
+        ..., description="Job status"
+    )
+    attempts: int = Field(0, description="Attempts started so far")
+    result: Optional[ReportGenerateResponse] = Field(
+        None, description="Report, once the job succeeded"
+    )
+    error: Optional[str] = Field(None, description="Last error, if any")
+    created_at: Optional[float] = Field(None, description="Creation time (epoch)")
+    updated_at: Optional[float] = Field(None, description="Last update (epoch)")
+
+
+class SavedReportRequest(BaseModel):
+    """Request model for a saved report definition."""
+
+    name: str = Field(..., description="Display name")
+    query: str = Field(..., description="Natural language query")
+    context: Optional[Dict[str, Any]] = Field(None, description="Additional context")
+    schedule: str = Field(
+        "0 6 * * *", description="Cron schedule (saved_report_timezone wall clock)"
+    )
+    tables: List[str] = Field(
+        default_factory=list,
+        description="Tables the report reads (all tables if empty)",
+    )
+    refresh_on_update: bool = Field(
+        True, description="Recompute soon after one of the tables is refreshed"
+    )
+
+
+class SavedReportDefinition(SavedReportRequest):
+    """Response model for a saved report definition."""
+
+    report_id: str = Field(..., description="Saved report ID")
+    next_run_at: Optional[float] = Field(None, description="Next run (epoch)")
+
+
+class SavedReportResponse(BaseModel):
+    """Response model for a saved report's latest result."""
+
+    report_id: str = Field(..., description="Saved report ID")
+    components: List[ComponentConfig] = Field(..., description="UI components")
+    metadata: Optional[Dict[str, Any]] = Field(
+        None, description="Response metadata, with staleness under saved_report"
+    )
+
 
+ExportFormat = Literal["csv", "xlsx", "parquet"]
+
+
+async def _load_context(
+    session_id: str, request: ReportGenerateRequest
+) -> Dict[str, Any]:
+    """Build the analysis context from the conversation so far and the request."""
+    if not settings.conversation_memory_enabled:
         # Get session context
-        session_context = await session_service.get_session(session_id)
+        session_context = await container.session_service.get_session(session_id)
+        return {**answer_context(session_context or {}), **(request.context or {})}
+
+    context = dict(request.context or {})
+    history = await container.conversation_memory.render(session_id)
+    if history:
+        context["conversation_history"] = history
+    return context
+
+
+async def _record_turn(
+    session_id: str,
+    request: ReportGenerateRequest,
+    context: Dict[str, Any],
+    components: List[Dict[str, Any]],
+    metadata: Dict[str, Any],
+) -> None:
+    """Save session context and append the turn to the conversation."""
+    if not settings.conversation_memory_enabled:
+        await container.session_service.save_session(session_id, metadata)
+        return
+
+    await asyncio.gather(
+        container.session_service.save_session(session_id, metadata),
+        container.conversation_memory.append_turn(
+            session_id,
+            request.query,
+            components,
+            metadata,
+            history_tokens=estimate_tokens(context.get("conversation_history", "")),
+        ),
+    )
+
+
+async def _apply_budgets(
+    result: Dict[str, Any], table_ttl: Optional[int] = None
+) -> Dict[str, Any]:
+    """Fit oversized components to their budgets, noting original row counts."""
+    components, reduced = await container.component_budget.apply_all(
+        result["components"], table_ttl
+    )
+    metadata = dict(result.get("metadata") or {})
+    if reduced:
+        metadata["payload_budget"] = reduced
+    return {"components": components, "metadata": metadata}
+
+
+async def analyze_report(
+    query_text: str,
+    session_id: str,
+    context: Dict[str, Any],
+    priority: str,
+    table_ttl: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Run the analysis and fit its components to their budgets.
+
+    ``table_ttl`` keeps further table pages as long as a result stored for
+    longer than ``component_table_ttl`` is served.
+    """
+    result = await container.claude_service.analyze_query(
+        query_text=query_text,
+        session_id=session_id,
+        context=context,
+        priority=priority,
+    )
+    if settings.component_budget_enabled:
+        with metrics.timed("report.budget"):
+            result = await _apply_budgets(result, table_ttl)
+    return result
 
+
+async def _find_saved_report(
+    query_text: str, context: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """Get a fresh precomputed result for a saved report's query."""
+    if not settings.saved_reports_enabled:
+        return None
+    with metrics.timed("report.saved_lookup"):
+        return await container.saved_reports.find_result(query_text, context)
+
+
+async def run_report(request: ReportGenerateRequest) -> Dict[str, Any]:
+    """Run a report request end to end, from session context to saved session."""
+    # Generate session ID if not provided
+    session_id = request.session_id or str(uuid.uuid4())
+
+    with metrics.timed("report.load_context"):
+        context = await _load_context(session_id, request)
+
+    # Serve repeated questions from the report cache
+    cache_key = None
+    result = None
+    if settings.report_cache_enabled:
+        with metrics.timed("report.cache_lookup"):
+            cache_key = await container.report_cache.make_key(request.query, context)
+            result = await container.report_cache.get(cache_key)
+    if result is None:
+        result = await _find_saved_report(request.query, context)
+
+    if result is None:
         # Execute Claude analysis
         logger.info(f"Processing query: {request.query}")
-        result = await claude_service.analyze_query(
-            query=request.query,
-            session_id=session_id,
-            context={
-                **(session_context or {}),
-                **(request.context or {}),
-            },
+        result = await analyze_report(
+            request.query, session_id, context, request.priority
         )
+        if cache_key and not result.get("metadata", {}).get("error"):
+            await container.report_cache.set(cache_key, result)
+            result.setdefault("metadata", {})["cache"] = {"hit": False}
 
-        # Save session context
-        await session_service.save_session(session_id, result.get("metadata", {}))
-
-        return ReportGenerateResponse(
-            session_id=session_id,
-            components=result["components"],
-            metadata=result.get("metadata"),
+    metadata = result.get("metadata") or {}
+    with metrics.timed("report.record_turn"):
+        await _record_turn(
+            session_id, request, context, result["components"], metadata
         )
 
+    return {
+        "session_id": session_id,
+        "components": result["components"],
+        "metadata": result.get("metadata"),
+    }
+
+
+@router.post("/generate", response_model=ReportGenerateResponse)
+async def generate_report(request: ReportGenerateRequest) -> ReportGenerateResponse:
+    """Generate a report based on natural language query."""
+    try:
+        with metrics.timed("generate_report"):
+            async with asyncio.timeout(settings.claude_timeout):
+                result = await run_report(request)
+            return ReportGenerateResponse(**result)
+
+    except SchedulerBusyError as e:
+        logger.warning(f"Rejected report request: {str(e)}")
+        raise HTTPException(
+            status_code=(
+                status.HTTP_429_TOO_MANY_REQUESTS
+                if e.reason == "queue_full"
+                else status.HTTP_503_SERVICE_UNAVAILABLE
+            ),
+            detail={
+                "code": "BUSY",
+                "userMessage": "現在混み合っています。しばらくしてから再度お試しください。",
+                "queuePosition": e.queue_position,
+            },
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except TimeoutError:
         logger.error("Request timed out")
         raise HTTPException(
@@ -90,10 +285,427 @@ async def generate_report(request: ReportGenerateRequest) -> ReportGenerateRespo
         )
 
 
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_report(request: ReportGenerateRequest) -> AsyncIterator[str]:
+    """Run the analysis and yield it as Server-Sent Events."""
+    # Generate session ID if not provided
+    session_id = request.session_id or str(uuid.uuid4())
+    yield _sse_event("session", {"session_id": session_id})
+
+    try:
+        context = await _load_context(session_id, request)
+
+        # Serve repeated and saved questions from the report cache
+        cache_key = None
+        cached = None
+        if settings.report_cache_enabled:
+            cache_key = await container.report_cache.make_key(request.query, context)
+            cached = await container.report_cache.get(cache_key)
+        if cached is None:
+            cached = await _find_saved_report(request.query, context)
+        if cached is not None:
+            for component in cached["components"]:
+                yield _sse_event("component", component)
+            await _record_turn(
+                session_id,
+                request,
+                context,
+                cached["components"],
+                cached["metadata"],
+            )
+            yield _sse_event("metadata", cached["metadata"])
+            return
+
+        logger.info(f"Streaming query: {request.query}")
+        components: List[Dict[str, Any]] = []
+        reduced: List[Dict[str, Any]] = []
+        async with asyncio.timeout(settings.claude_timeout):
+            async for event in container.claude_service.stream_analysis(
+                query_text=request.query,
+                session_id=session_id,
+                context=context,
+                priority=request.priority,
+            ):
+                if event["event"] == "component":
+                    component = event["data"]
+                    if settings.component_budget_enabled:
+                        component, info = await container.component_budget.apply(
+                            component
+                        )
+                        if info is not None:
+                            reduced.append({"index": len(components), **info})
+                    components.append(component)
+                    event = {"event": "component", "data": component}
+                elif event["event"] == "metadata":
+                    metadata = event["data"]
+                    if reduced:
+                        metadata = {**metadata, "payload_budget": reduced}
+                    if cache_key and not metadata.get("error"):
+                        await container.report_cache.set(
+                            cache_key,
+                            {"components": components, "metadata": metadata},
+                        )
+                        metadata = {**metadata, "cache": {"hit": False}}
+                    await _record_turn(
+                        session_id, request, context, components, metadata
+                    )
+                    event = {"event": "metadata", "data": metadata}
+                yield _sse_event(event["event"], event["data"])
+
+    except SchedulerBusyError as e:
+        logger.warning(f"Rejected streaming request: {str(e)}")
+        yield _sse_event(
+            "error",
+            {
+                "code": "BUSY",
+                "userMessage": "現在混み合っています。しばらくしてから再度お試しください。",
+                "queuePosition": e.queue_position,
+                "retryAfter": e.retry_after,
+            },
+        )
+    except TimeoutError:
+        logger.error("Streaming request timed out")
+        yield _sse_event(
+            "error",
+            {
+                "code": "TIMEOUT",
+                "userMessage": "分析に時間がかかりすぎました。クエリを簡略化してお試しください。",
+            },
+        )
+    except Exception as e:
+        logger.error(f"Error streaming report: {str(e)}")
+        yield _sse_event(
+            "error",
+            {
+                "code": "CLAUDE_ERROR",
+                "userMessage": "分析に失敗しました。もう一度お試しください。",
+            },
+        )
+
+
+@router.post("/generate/stream")
+async def generate_report_stream(request: ReportGenerateRequest) -> StreamingResponse:
+    """Generate a report, streaming progress and components as SSE.
+
+    Emits ``session``, ``progress``, ``component`` and ``metadata`` events, or
+    an ``error`` event if the analysis fails.
+    """
+    return StreamingResponse(
+        _stream_report(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/jobs",
+    response_model=ReportJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def create_report_job(request: ReportJobRequest) -> ReportJobResponse:
+    """Queue a report for a worker and return its job ID immediately.
+
+    Poll ``GET /jobs/{job_id}``, subscribe to ``GET /jobs/{job_id}/events``,
+    or pass ``callback_url`` to be notified when the job finishes; it must
+    be on an origin listed in ``REPORT_JOB_CALLBACK_ORIGINS``.
+    """
+    try:
+        job_id = await container.report_jobs.enqueue(request.model_dump())
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    return ReportJobResponse(job_id=job_id, status="queued")
+
+
+async def _get_job_or_404(job_id: str) -> Dict[str, Any]:
+    """Get a job, or raise 404."""
+    job = await container.report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=ReportJobResponse)
+async def get_report_job(job_id: str) -> ReportJobResponse:
+    """Get a report job's status, and its report once finished."""
+    return ReportJobResponse(**await _get_job_or_404(job_id))
+
+
+async def _stream_job(job_id: str) -> AsyncIterator[str]:
+    """Yield a job's status changes as Server-Sent Events."""
+    async for job in container.report_jobs.subscribe(job_id):
+        yield _sse_event(
+            "job", ReportJobResponse(**job).model_dump(exclude_none=True)
+        )
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_report_job(job_id: str) -> StreamingResponse:
+    """Stream a report job's status changes as SSE until it finishes."""
+    await _get_job_or_404(job_id)
+    return StreamingResponse(
+        _stream_job(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/saved", response_model=SavedReportDefinition)
+async def save_report(request: SavedReportRequest) -> SavedReportDefinition:
+    """Create a saved report, precomputed on its schedule by the worker."""
+    return await _save_definition(request.model_dump())
+
+
+@router.put("/saved/{report_id}", response_model=SavedReportDefinition)
+async def update_saved_report(
+    report_id: str, request: SavedReportRequest
+) -> SavedReportDefinition:
+    """Replace a saved report's definition."""
+    await _get_definition_or_404(report_id)
+    return await _save_definition({**request.model_dump(), "report_id": report_id})
+
+
+async def _save_definition(definition: Dict[str, Any]) -> SavedReportDefinition:
+    """Store a definition, or raise 400 for an invalid schedule."""
+    try:
+        saved = await container.saved_reports.save(definition)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    return SavedReportDefinition(**saved)
+
+
+async def _get_definition_or_404(report_id: str) -> Dict[str, Any]:
+    """Get a saved report definition, or raise 404."""
+    definition = await container.saved_reports.get(report_id)
+    if definition is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Saved report not found",
+        )
+    return definition
+
+
+@router.get("/saved", response_model=List[SavedReportDefinition])
+async def list_saved_reports() -> List[SavedReportDefinition]:
+    """List saved reports with their next run times."""
+    return [
+        SavedReportDefinition(**definition)
+        for definition in await container.saved_reports.list()
+    ]
+
+
+@router.get("/saved/{report_id}", response_model=SavedReportResponse)
+async def get_saved_report(report_id: str) -> SavedReportResponse:
+    """Get a saved report's latest precomputed result.
+
+    ``metadata.saved_report`` tells when it was computed, whether it is stale
+    (a table changed since, or it passed its maximum age) and the next run.
+    """
+    await _get_definition_or_404(report_id)
+    result = await container.saved_reports.get_result(report_id)
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Saved report has not been computed yet",
+        )
+    return SavedReportResponse(report_id=report_id, **result)
+
+
+@router.post("/saved/{report_id}/refresh", status_code=status.HTTP_202_ACCEPTED)
+async def refresh_saved_report(report_id: str) -> Dict[str, Any]:
+    """Recompute a saved report on the scheduler's next pass."""
+    if not await container.saved_reports.request_run(report_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Saved report not found",
+        )
+    return {"report_id": report_id, "status": "scheduled"}
+
+
+@router.delete("/saved/{report_id}")
+async def delete_saved_report(report_id: str) -> Dict[str, Any]:
+    """Delete a saved report and its stored result."""
+    if not await container.saved_reports.delete(report_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Saved report not found",
+        )
+    return {"report_id": report_id, "deleted": True}
+
+
+async def _export(
+    sql: Optional[str], export_format: str, filename: str
+) -> StreamingResponse:
+    """Stream a report's query results as a file download.
+
+    Only SQL recorded server-side with a job or saved report is exported;
+    clients never supply the query. The SQL runs again (BigQuery answers a
+    recent identical query from its own result cache) and rows are written
+    page by page as they arrive, so memory stays bounded however many rows
+    there are. Errors before the first page are reported as usual; the
+    download is cut short on later ones.
+    """
+    if not sql:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report has no executed query to export",
+        )
+    try:
+        ensure_read_only(sql)
+        table_export.check_format(export_format)
+        schema, pages = await container.bigquery_service.query_pages(sql)
+    except ValueError as e:
+        # Not read-only, over the byte budget or no pyarrow for Parquet
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"code": "EXPORT_REJECTED", "userMessage": str(e)},
+        )
+    except TimeoutError:
+        logger.error("Export query timed out")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail={
+                "code": "TIMEOUT",
+                "userMessage": "クエリに時間がかかりすぎました。期間を絞ってお試しください。",
+            },
+        )
+    except Exception as e:
+        logger.error(f"Failed to export report: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "code": "BIGQUERY_ERROR",
+                "userMessage": "エクスポートに失敗しました。もう一度お試しください。",
+            },
+        )
+
+    writer = table_export.create_writer(export_format, schema)
+    return StreamingResponse(
+        table_export.stream_export(writer, pages),
+        media_type=writer.media_type,
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{filename}.{writer.extension}"'
+            ),
+        },
+    )
+
+
+@router.get("/jobs/{job_id}/export")
+async def export_report_job(
+    job_id: str, format: ExportFormat = "csv"
+) -> StreamingResponse:
+    """Export the full results behind a finished report job."""
+    job = await _get_job_or_404(job_id)
+    metadata = (job.get("result") or {}).get("metadata") or {}
+    return await _export(metadata.get("query_executed"), format, f"report-{job_id}")
+
+
+@router.get("/saved/{report_id}/export")
+async def export_saved_report(
+    report_id: str, format: ExportFormat = "csv"
+) -> StreamingResponse:
+    """Export the full results behind a saved report's latest result."""
+    await _get_definition_or_404(report_id)
+    result = await container.saved_reports.get_result(report_id) or {}
+    metadata = result.get("metadata") or {}
+    return await _export(
+        metadata.get("query_executed"), format, f"report-{report_id}"
+    )
+
+
+@router.get("/tables/{table_id}")
+async def get_table_page(table_id: str, cursor: str) -> Dict[str, Any]:
+    """Get a further page of a paginated Table component.
+
+    Start with the ``pagination.nextCursor`` of the component and follow each
+    page's ``nextCursor`` until it is null.
+    """
+    if not cursor.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+    page = await container.component_budget.get_page(table_id, cursor)
+    if page is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Table page not found",
+        )
+    return page
+
+
+@router.get("/cache/stats")
+async def get_cache_stats() -> Dict[str, Any]:
+    """Get report and BigQuery result cache counters for this worker."""
+    return {
+        **container.report_cache.stats(),
+        "query_cache": container.bigquery_service.query_cache.stats(),
+    }
+
+
+@router.get("/scheduler/stats")
+async def get_scheduler_stats() -> Dict[str, Any]:
+    """Get Claude run queue and process pool counters for this worker."""
+    claude_service = container.claude_service
+    stats = claude_service.scheduler.stats()
+    if claude_service.pool is not None:
+        stats["pool"] = claude_service.pool.stats()
+    return stats
+
+
+@router.get("/rollups")
+async def get_rollups() -> Dict[str, Any]:
+    """List the refreshed rollup tables with their coverage and refresh times."""
+    if not settings.rollups_enabled:
+        return {"enabled": False, "rollups": []}
+    return {
+        "enabled": True,
+        "rollups": await container.rollups.describe(),
+        "stats": container.rollups.stats(),
+    }
+
+
+@router.get("/session/{session_id}/turns")
+async def get_session_turns(session_id: str) -> Dict[str, Any]:
+    """Get a session's conversation turns with prompt size per turn."""
+    turns = await container.conversation_memory.get_turns(session_id)
+    if not turns:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found",
+        )
+    return {
+        "session_id": session_id,
+        "turns": [
+            {
+                "turn": number,
+                "query": turn["query"],
+                "prompt_tokens": turn.get("prompt_tokens"),
+                "history_tokens": turn.get("history_tokens"),
+                "created_at": turn.get("created_at"),
+            }
+            for number, turn in enumerate(turns, start=1)
+        ],
+    }
+
+
 @router.get("/session/{session_id}")
 async def get_session(session_id: str) -> Dict[str, Any]:
     """Get session information."""
-    session_data = await session_service.get_session(session_id)
+    session_data = await container.session_service.get_session(session_id)
     if not session_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
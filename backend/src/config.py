@@ -1,6 +1,7 @@
 """Configuration settings for the application."""
 
-from typing import List
+from functools import lru_cache
+from typing import Any, List
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -10,19 +11,35 @@ class Settings(BaseSettings):
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
+    # Credentials are checked by the services that use them, not at import
     # Claude API
-    claude_api_key: str
+    claude_api_key: str = ""
 
     # BigQuery
-    bq_private_key_id: str
-    bq_private_key: str
-    bq_client_email: str
-    bq_client_id: str
+    bq_private_key_id: str = ""
+    bq_private_key: str = ""
+    bq_client_email: str = ""
+    bq_client_id: str = ""
     bq_project_id: str = "growth-force-project"
     bq_dataset_id: str = "semantic"
 
     # Redis
     redis_url: str = "redis://localhost:6379"
+    redis_max_connections: int = 50  # Per pool, per process
+    redis_pool_timeout: float = 5  # Seconds to wait for a free connection
+    redis_socket_timeout: float = 5
+    redis_health_check_interval: int = 30  # Ping connections idle this long
+
+    # Sessions
+    session_ttl: int = 3600  # 1 hour
+    session_local_cache_size: int = 1000
+    session_local_cache_ttl: float = 10  # Bounds staleness across workers
+    session_compress_threshold: int = 512  # zlib payloads larger than this
+
+    # Conversation history for follow-up questions
+    conversation_memory_enabled: bool = True
+    conversation_recent_token_budget: int = 1000  # Recent turns in detail
+    conversation_summary_token_budget: int = 500  # One-line summaries of older turns
 
     # API Settings
     api_host: str = "0.0.0.0"
@@ -32,14 +49,148 @@ class Settings(BaseSettings):
     # CORS
     cors_origins: List[str] = ["http://localhost:3000"]
 
+    # Response compression (brotli needs the "compression" extra)
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    # Instrumentation (/metrics needs the "metrics" extra, spans the "tracing" extra)
+    metrics_enabled: bool = True
+    server_timing_enabled: bool = True
+    tracing_enabled: bool = False
+
     # Environment
     environment: str = "development"
 
+    # Report cache
+    report_cache_enabled: bool = True
+    report_cache_ttl: int = 1800  # Under component_table_ttl; pages outlive it
+    report_cache_max_entries: int = 1000
+    report_cache_watermark_ttl: int = 300  # Re-check table freshness every 5 minutes
+
+    # Application-level BigQuery result cache
+    query_cache_enabled: bool = True
+    query_cache_backend: str = "redis"  # "redis" (shared) or "disk" (per host)
+    query_cache_dir: str = ".cache/bigquery"
+    query_cache_ttl: int = 86400  # Upper bound; table changes invalidate sooner
+    query_cache_max_bytes: int = 512 * 1024**2
+    query_cache_max_entry_bytes: int = 16 * 1024**2
+    query_cache_watermark_ttl: int = 60  # Re-check table last-modified times
+
+    # Component payload budgets
+    component_budget_enabled: bool = True
+    component_max_series_points: int = 500  # LineChart / time-series BarChart
+    component_max_categories: int = 12  # PieChart / BarChart, incl. "other"
+    component_table_page_size: int = 100
+    component_table_ttl: int = 3600  # Keep further table pages for 1 hour
+
+    # Coalesce identical concurrent analyses and queries across workers
+    single_flight_enabled: bool = True
+
+    # Agent turns per report run: one per tool call round, plus the answer
+    claude_max_turns: int = 10
+
+    # Claude Code run admission control (per worker)
+    claude_max_concurrent_runs: int = 4
+    claude_max_runs_per_session: int = 1
+    claude_max_queue_size: int = 20
+    claude_queue_timeout: int = 120  # Max seconds to wait for a run slot
+
+    # Pre-started Claude Code processes (falls back to one process per run)
+    claude_pool_enabled: bool = True
+    claude_pool_size: int = 2  # Fresh processes kept ready per worker
+    claude_pool_max_parked: int = 8  # Processes kept for sessions' follow-ups
+    claude_pool_max_runs: int = 20  # Recycle a process after this many runs
+    claude_pool_max_rss_growth_mb: int = 300  # Or once its memory grew this much
+    claude_pool_idle_ttl: int = 600  # Stop a session's parked process after 10 min
+    claude_pool_health_interval: int = 15
+    claude_pool_start_timeout: int = 60  # Startup and between-run reset
+
+    # Schema catalog injected into prompts
+    schema_catalog_enabled: bool = True
+    schema_refresh_interval: int = 600  # 10 minutes
+    schema_digest_token_budget: int = 1500
+
+    # In-process BigQuery tools for the agent (replaces the bq CLI)
+    bigquery_tool_enabled: bool = True
+    bigquery_tool_max_rows: int = 200
+    bigquery_tool_max_chars: int = 20000
+
+    # Asynchronous report jobs
+    report_job_ttl: int = 86400  # Keep job status and results for 1 day
+    report_job_max_attempts: int = 3
+    report_job_backoff_base: int = 5  # Seconds before the first retry, doubling
+    report_job_visibility_timeout: int = 120  # Lease before a job is requeued
+    report_job_reap_interval: int = 15
+    report_job_worker_concurrency: int = 2  # Jobs run at once per worker process
+    # Origins (scheme://host[:port]) a job's callback_url may point to; none if empty
+    report_job_callback_origins: List[str] = []
+
+    # Saved reports precomputed by the worker
+    saved_reports_enabled: bool = True
+    saved_report_timezone: str = "Asia/Tokyo"  # For cron schedules
+    saved_report_poll_interval: int = 30
+    saved_report_max_concurrency: int = 2  # Precomputations at once per worker
+    saved_report_jitter: int = 300  # Spread run starts over up to 5 minutes
+    saved_report_max_age: int = 86400  # Older results are stale
+    saved_report_retry_delay: int = 600  # After a failed run
+    saved_report_claim_ttl: int = 86400
+    saved_report_ttl: int = 7 * 86400  # Keep stored results for a week
+
+    # Rollup tables of the daily fact tables, refreshed by the worker
+    rollups_enabled: bool = False  # Needs write access to rollup_dataset_id
+    rollup_dataset_id: str = "semantic_rollups"
+    rollup_sources: List[str] = [
+        "fact_meta_ad_performance_daily",
+        "fact_google_ads_campaign_performance_daily",
+    ]
+    rollup_grains: List[str] = ["day", "week", "month"]
+    rollup_dimensions: List[str] = ["campaign_name,channel", "channel"]  # Per rollup
+    rollup_date_column: str = "date"
+    rollup_refresh_interval: int = 900
+    rollup_max_days_per_job: int = 93  # Longer runs of changed periods are split
+    rollup_lock_ttl: int = 3600  # One refresher across workers
+
+    # Outbound HTTP client (shared keep-alive pool)
+    http_timeout: float = 30.0
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 60.0
+
+    # Claude subscription tokens
+    claude_token_refresh_margin: int = 300  # Refresh 5 minutes before expiry
+    claude_token_refresh_jitter: int = 60  # Plus up to a minute, per token
+    claude_token_validation_ttl: int = 60  # Reuse a validation result for a minute
+    claude_token_refresh_retry: int = 30  # Seconds between failed background refreshes
+    credential_encryption_key: str = ""  # Fernet key; derived from claude_api_key if unset
+    credential_reload_interval: float = 30  # Re-read shared credentials if pub/sub is quiet
+
+    # Startup warm-up (reported by /ready)
+    warm_up_enabled: bool = True  # Ping Redis, fetch a BigQuery token, load schemas
+    warm_up_timeout: float = 30  # Per check attempt
+    warm_up_retry_interval: float = 10  # Seconds between failed attempts
+
     # Timeouts (in seconds)
     claude_timeout: int = 300  # 5 minutes
     bigquery_timeout: int = 120  # 2 minutes
     api_request_timeout: int = 600  # 10 minutes
 
+    # BigQuery execution
+    bigquery_max_workers: int = 8  # Threads for blocking client calls
+    bigquery_max_concurrent_queries: int = 4  # Query jobs in flight per worker
+    bigquery_poll_interval: float = 0.5  # Seconds between job status polls
+    bigquery_use_storage_api: bool = True  # Columnar reads via BigQuery Storage
+
+    # BigQuery cost guard
+    bigquery_dry_run_enabled: bool = True
+    bigquery_max_bytes_processed: int = 10 * 1024**3  # Reject above 10 GB (dry run)
+    bigquery_max_bytes_billed: int = 20 * 1024**3  # Hard cap enforced by BigQuery
+
+    # Table export
+    export_page_size: int = 10000  # Rows fetched from BigQuery per page
+    export_parquet_row_group_size: int = 131072  # Rows per Parquet row group
+
     @property
     def is_production(self) -> bool:
         """Check if running in production."""
@@ -52,4 +203,20 @@ class Settings(BaseSettings):
         return self.cors_origins
 
 
-settings = Settings()
\ No newline at end of file
+@lru_cache
+def get_settings() -> Settings:
+    """Load settings on first use."""
+    return Settings()
+
+
+class _LazySettings:
+    """Module-level ``settings`` that defers reading the environment."""
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(get_settings(), name, value)
+
+
+settings: Settings = _LazySettings()  # type: ignore[assignment]
\ No newline at end of file
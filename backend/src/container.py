@@ -0,0 +1,217 @@
+"""Application service container.
+
+Services are built on first use rather than at import, so importing the app
+(or a worker, or a test) reads no credentials and opens no connections. The
+API lifespan and the job worker call ``start``/``stop``; everything else
+reaches services through ``container``. Tests can replace a service by
+assigning it before first use, e.g. ``container.bigquery_service = fake``.
+"""
+
+import asyncio
+import inspect
+import logging
+from functools import cached_property
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.config import settings
+from src.services.bigquery_service import BigQueryService
+from src.services.claude_service import ClaudeService
+from src.services.component_budget import ComponentBudget
+from src.services.conversation_memory import ConversationMemory
+from src.services.http_client import close_http_client, get_http_client
+from src.services.redis_client import close_redis, init_redis
+from src.services.report_cache import ReportCache
+from src.services.report_jobs import ReportJobQueue
+from src.services.rollups import BigQueryRollupEngine, RollupManager
+from src.services.saved_reports import SavedReportStore
+from src.services.schema_catalog import SchemaCatalog
+from src.services.session_service import SessionService
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """Lazily constructed services plus startup warm-up and readiness.
+
+    Warm-up runs in the background after ``start`` so the process accepts
+    connections (and answers ``/health``) immediately; ``readiness`` reports
+    each check until all have passed. Failed checks are retried every
+    ``warm_up_retry_interval`` seconds. Starting the background services is
+    a check too, so missing credentials show on ``/ready`` instead of failing
+    startup.
+    """
+
+    def __init__(self):
+        """Initialize container."""
+        self.started = False
+        self.checks: Dict[str, str] = {}
+        self._warm_up_task: Optional[asyncio.Task] = None
+
+    @cached_property
+    def bigquery_service(self) -> BigQueryService:
+        """BigQuery client and query executor."""
+        return BigQueryService()
+
+    @cached_property
+    def schema_catalog(self) -> SchemaCatalog:
+        """Cached table schemas for prompts."""
+        return SchemaCatalog(
+            self.bigquery_service,
+            rollup_loader=self.rollups.describe if settings.rollups_enabled else None,
+        )
+
+    @cached_property
+    def claude_service(self) -> ClaudeService:
+        """Claude report generation."""
+        return ClaudeService(
+            schema_catalog=self.schema_catalog, bigquery_service=self.bigquery_service
+        )
+
+    @cached_property
+    def session_service(self) -> SessionService:
+        """Session metadata."""
+        return SessionService()
+
+    @cached_property
+    def conversation_memory(self) -> ConversationMemory:
+        """Per-session conversation history."""
+        return ConversationMemory()
+
+    @cached_property
+    def component_budget(self) -> ComponentBudget:
+        """Component size limits and table paging."""
+        return ComponentBudget()
+
+    @cached_property
+    def report_cache(self) -> ReportCache:
+        """Finished report cache."""
+        # Resolved per call, so the cache alone does not build the BigQuery client
+        return ReportCache(
+            watermark_loader=lambda: self.bigquery_service.get_table_last_modified()
+        )
+
+    @cached_property
+    def report_jobs(self) -> ReportJobQueue:
+        """Asynchronous report job queue."""
+        return ReportJobQueue()
+
+    @cached_property
+    def saved_reports(self) -> SavedReportStore:
+        """Saved report definitions and precomputed results."""
+        return SavedReportStore(
+            watermark_loader=lambda: self.bigquery_service.get_table_last_modified()
+        )
+
+    @cached_property
+    def rollups(self) -> RollupManager:
+        """Rollup tables of the daily fact tables."""
+        # Its own client with write access, built only when refreshing
+        return RollupManager(
+            engine_factory=lambda: BigQueryRollupEngine(
+                BigQueryService(read_only=False)
+            )
+        )
+
+    def _built(self, name: str) -> Any:
+        """Return a service if it has been constructed, else None."""
+        return self.__dict__.get(name)
+
+    async def start(self, warm_up: Optional[bool] = None) -> None:
+        """Start background services and, optionally, warm-up.
+
+        The services' first start is awaited, so they are normally up on
+        return; if it fails it is retried in the background like warm-up.
+        """
+        if warm_up is None:
+            warm_up = settings.warm_up_enabled
+        get_http_client()
+
+        # Services are resolved per call, so a failed build is retried
+        checks: Dict[str, Callable[[], Awaitable[None]]] = {
+            "services": self._start_services
+        }
+        if warm_up:
+            checks["redis"] = init_redis
+            checks["bigquery_auth"] = lambda: self.bigquery_service.warm_up()
+            if settings.schema_catalog_enabled:
+                checks["schema"] = lambda: self.schema_catalog.wait_loaded()
+        self.checks = {name: "pending" for name in checks}
+        if await self._try_check("services", self._start_services):
+            del checks["services"]
+        if checks:
+            self._warm_up_task = asyncio.create_task(self._warm_up(checks))
+        self.started = True
+
+    async def _start_services(self) -> None:
+        """Build and start the services with background work."""
+        await self.claude_service.start()
+        if settings.schema_catalog_enabled:
+            self.schema_catalog.start()
+
+    async def _warm_up(self, checks: Dict[str, Callable[[], Awaitable[None]]]) -> None:
+        """Run warm-up checks concurrently."""
+        await asyncio.gather(
+            *(self._run_check(name, check) for name, check in checks.items())
+        )
+        logger.info("Warm-up complete")
+
+    async def _run_check(self, name: str, check: Callable[[], Awaitable[None]]) -> None:
+        """Run one warm-up check until it passes."""
+        while not await self._try_check(name, check):
+            await asyncio.sleep(settings.warm_up_retry_interval)
+
+    async def _try_check(self, name: str, check: Callable[[], Awaitable[None]]) -> bool:
+        """Run one warm-up check once and record its state."""
+        try:
+            async with asyncio.timeout(settings.warm_up_timeout):
+                await check()
+            self.checks[name] = "ok"
+            return True
+        except Exception as e:
+            # Details stay in the log; /ready is unauthenticated
+            self.checks[name] = f"failed: {type(e).__name__}"
+            logger.error(f"Warm-up check {name} failed: {str(e)}")
+            return False
+
+    @property
+    def ready(self) -> bool:
+        """Whether startup and every warm-up check have completed."""
+        return self.started and all(state == "ok" for state in self.checks.values())
+
+    def readiness(self) -> Dict[str, Any]:
+        """Readiness and per-check warm-up state."""
+        return {"ready": self.ready, "checks": dict(self.checks)}
+
+    async def _close(self, name: str) -> None:
+        """Stop or close a built service, logging rather than raising errors."""
+        service = self._built(name)
+        close = getattr(service, "stop", None) or getattr(service, "close", None)
+        if close is None:
+            return
+        try:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.error(f"Failed to close {name}: {str(e)}")
+
+    async def stop(self) -> None:
+        """Stop background work and close connections."""
+        if self._warm_up_task is not None:
+            self._warm_up_task.cancel()
+            try:
+                await self._warm_up_task
+            except asyncio.CancelledError:
+                pass
+            self._warm_up_task = None
+        self.started = False
+
+        # Services built last depend on earlier ones, so they go first
+        for name in reversed(list(self.__dict__)):
+            if isinstance(getattr(type(self), name, None), cached_property):
+                await self._close(name)
+        await close_http_client()
+        await close_redis()
+
+
+container = ServiceContainer()
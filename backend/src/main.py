@@ -2,74 +2,140 @@
 
 import logging
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any
 
-from fastapi import FastAPI
+from fastapi import APIRouter, FastAPI, HTTPException, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from src.api import reports
+from src.api import auth, reports
 from src.config import settings
+from src.container import container
+from src.services import metrics
+from src.middleware.compression import setup_compression
+from src.middleware.metrics import setup_metrics
 from src.middleware.security import setup_security_headers
 
-# Configure logging
-logging.basicConfig(level=settings.log_level)
 logger = logging.getLogger(__name__)
 
+# Endpoints outside the API routers
+router = APIRouter()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events."""
     # Startup
     logger.info("Starting Growth Force Reporting Agent API")
+    await container.start()
     yield
     # Shutdown
     logger.info("Shutting down Growth Force Reporting Agent API")
+    await container.stop()
 
 
-# Create FastAPI app
-app = FastAPI(
-    title="Growth Force Reporting Agent API",
-    description="AI-powered reporting agent for BigQuery analysis",
-    version="0.1.0",
-    lifespan=lifespan,
-)
-
-# Setup CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.get_cors_origins(),
-    allow_credentials=True,
-    allow_methods=["GET", "POST"],
-    allow_headers=["*"],
-)
-
-# Setup security headers
-setup_security_headers(app)
-
-# Include routers
-app.include_router(reports.router, prefix="/api/reports", tags=["reports"])
-
-# Add BigQuery router for testing (remove in production)
-if settings.environment == "development":
-    from src.api import bigquery
-    app.include_router(bigquery.router, prefix="/api/bigquery", tags=["bigquery"])
-
-# Add auth router for token management
-from src.api import auth
-app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
-
-
-@app.get("/")
+@router.get("/")
 async def root():
     """Root endpoint."""
     return {"message": "Growth Force Reporting Agent API", "version": "0.1.0"}
 
 
-@app.get("/health")
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus metrics endpoint."""
+    if not metrics.metrics_enabled():
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    body, content_type = metrics.render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@router.get("/health")
 async def health():
     """Health check endpoint."""
     return {"status": "healthy"}
 
 
+@router.get("/ready")
+async def ready():
+    """Readiness endpoint: 503 until startup warm-up has finished."""
+    readiness = container.readiness()
+    return JSONResponse(
+        content=readiness,
+        status_code=200 if readiness["ready"] else 503,
+    )
+
+
+def create_app() -> FastAPI:
+    """Create the app, configured from the settings."""
+    # Configure logging
+    logging.basicConfig(level=settings.log_level)
+
+    # Create FastAPI app
+    app = FastAPI(
+        title="Growth Force Reporting Agent API",
+        description="AI-powered reporting agent for BigQuery analysis",
+        version="0.1.0",
+        lifespan=lifespan,
+    )
+
+    # Setup CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.get_cors_origins(),
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "PUT", "DELETE"],
+        allow_headers=["*"],
+    )
+
+    # Setup response compression
+    if settings.compression_enabled:
+        setup_compression(
+            app,
+            minimum_size=settings.compression_minimum_size,
+            gzip_level=settings.compression_gzip_level,
+            brotli_quality=settings.compression_brotli_quality,
+        )
+
+    # Setup security headers
+    setup_security_headers(app)
+
+    # Setup request timing (outermost, so it covers the other middleware)
+    if metrics.enabled():
+        setup_metrics(app, server_timing=metrics.server_timing_enabled())
+
+    # Include routers
+    app.include_router(reports.router, prefix="/api/reports", tags=["reports"])
+
+    # Add BigQuery router for testing (remove in production)
+    if settings.environment == "development":
+        from src.api import bigquery
+
+        app.include_router(bigquery.router, prefix="/api/bigquery", tags=["bigquery"])
+
+    # Add auth router for token management
+    app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
+    app.include_router(router)
+    return app
+
+
+@lru_cache
+def get_app() -> FastAPI:
+    """Create the app on first use."""
+    return create_app()
+
+
+def __getattr__(name: str) -> Any:
+    """Create ``app`` on first access (``uvicorn src.main:app``).
+
+    Importing this module reads no settings, so tests and tools can configure
+    the environment after importing it.
+    """
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == "__main__":
     import uvicorn
 
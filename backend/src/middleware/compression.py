@@ -0,0 +1,195 @@
+"""Response compression middleware."""
+
+import asyncio
+import zlib
+from typing import Callable, Optional
+
+from fastapi import FastAPI
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install growth-force-backend[compression]
+    brotli = None
+
+COMPRESSIBLE_MEDIA_TYPES = ("application/json", "text/csv")
+# Compress whole bodies at least this large off the event loop
+THREAD_MINIMUM_SIZE = 256 * 1024
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick "br" or "gzip" from an Accept-Encoding header, or None."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    """Incremental gzip or brotli compressor."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        """Initialize compressor."""
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=brotli_quality)
+            self._process: Callable[[bytes], bytes] = compressor.process
+            self._flush: Callable[[], bytes] = compressor.flush
+            self._finish: Callable[[], bytes] = compressor.finish
+        else:
+            # wbits 31 writes a gzip header and trailer
+            compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._process = compressor.compress
+            self._flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = compressor.flush
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress a chunk and flush it so the client can decode it now."""
+        return self._process(data) + self._flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        """Compress the last (or only) chunk and end the stream."""
+        return self._process(data) + self._finish()
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing JSON and CSV responses with brotli or gzip.
+
+    Complete bodies are compressed only from ``minimum_size`` bytes on.
+    Streamed bodies (such as CSV exports) are compressed chunk by chunk with
+    a flush after each, so nothing is held back. Server-Sent Events and
+    other media types, including already compressed XLSX and Parquet, pass
+    through untouched.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        """Initialize middleware."""
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle an ASGI connection."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(
+            send,
+            encoding,
+            self.minimum_size,
+            _Compressor(encoding, self.gzip_level, self.brotli_quality),
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Per-response state of ``CompressionMiddleware``."""
+
+    def __init__(
+        self, send: Send, encoding: str, minimum_size: int, compressor: _Compressor
+    ):
+        """Initialize responder."""
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.compressor = compressor
+        self.start_message: Optional[Message] = None
+        # None until the first body message decides; then "identity" or encoding
+        self.mode: Optional[str] = None
+
+    def _is_compressible(self, headers: MutableHeaders) -> bool:
+        """Check whether the response may be compressed."""
+        media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return (
+            media_type in COMPRESSIBLE_MEDIA_TYPES and "content-encoding" not in headers
+        )
+
+    async def send(self, message: Message) -> None:
+        """Intercept response messages."""
+        if message["type"] == "http.response.start":
+            # Hold the start until the first body shows the size
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.mode is None:
+            headers = MutableHeaders(scope=self.start_message)
+            if not self._is_compressible(headers) or (
+                not more_body and len(body) < self.minimum_size
+            ):
+                self.mode = "identity"
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            self.mode = self.encoding
+            headers["content-encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["content-length"]
+                body = self.compressor.chunk(body)
+            else:
+                if len(body) >= THREAD_MINIMUM_SIZE:
+                    body = await asyncio.to_thread(self.compressor.finish, body)
+                else:
+                    body = self.compressor.finish(body)
+                headers["content-length"] = str(len(body))
+            await self._send(self.start_message)
+            await self._send(
+                {"type": "http.response.body", "body": body, "more_body": more_body}
+            )
+            return
+
+        if self.mode == "identity":
+            await self._send(message)
+            return
+
+        body = (
+            self.compressor.chunk(body) if more_body else self.compressor.finish(body)
+        )
+        await self._send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
+
+
+def setup_compression(
+    app: FastAPI, minimum_size: int, gzip_level: int, brotli_quality: int
+) -> None:
+    """Setup response compression middleware."""
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=minimum_size,
+        gzip_level=gzip_level,
+        brotli_quality=brotli_quality,
+    )
@@ -0,0 +1,83 @@
+"""Request timing middleware."""
+
+import time
+
+from fastapi import FastAPI
+from starlette.routing import NoMatchFound
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services import metrics
+
+
+def route_template(scope: Scope) -> str:
+    """Get the full path template of the route a request matched.
+
+    Routes of an included router may only know their path below the router's
+    prefix, so the prefix is taken from the request path, in front of the
+    part the route matched: ``/api/reports`` + ``/jobs/{job_id}``.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    try:
+        matched = route.url_path_for(route.name, **scope.get("path_params", {}))
+    except (NoMatchFound, AttributeError):
+        return template
+    path = scope["path"]
+    if not path.endswith(matched):
+        return template
+    return path[: len(path) - len(matched)] + template
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing requests and adding a Server-Timing header.
+
+    The request duration is recorded per route template (not raw path, to
+    bound label cardinality) once the response is complete. The header lists
+    the stages finished before the response started, plus ``app`` (time to
+    the first response byte).
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = True):
+        """Initialize middleware."""
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle an ASGI connection."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings = metrics.start_server_timing() if self.server_timing else None
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if timings is not None:
+                    timings.append(("app", time.perf_counter() - started))
+                    header = metrics.format_server_timing(timings)
+                    message["headers"] = [
+                        *message.get("headers", ()),
+                        (b"server-timing", header.encode("latin-1")),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            metrics.observe_http_request(
+                scope["method"],
+                route_template(scope),
+                status,
+                time.perf_counter() - started,
+            )
+
+
+def setup_metrics(app: FastAPI, server_timing: bool) -> None:
+    """Setup request timing middleware."""
+    app.add_middleware(MetricsMiddleware, server_timing=server_timing)
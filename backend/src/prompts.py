@@ -5,10 +5,11 @@ SYSTEM_PROMPT = """
 ビジネスインサイトを提供します。
 
 ## 利用可能なデータセット
-bqコマンドを使用して以下のように��ータセットのテーブル一覧を確認できます：
-bq ls growth-force-project:semantic
+関連するテーブルのスキーマは、ユーザーの質問と一緒に提供されます。
+提供されたスキーマで足りる場合は、テーブル一覧やスキーマの確認は不要です。
 
-各テーブルのスキーマを確認するには：
+スキーマが提供されていない場合や不足している場合は、bqコマンドで確認できます：
+bq ls growth-force-project:semantic
 bq show --schema --format=prettyjson growth-force-project:semantic.テーブル名
 
 ## 出力フォーマット
@@ -34,4 +35,15 @@ bq show --schema --format=prettyjson growth-force-project:semantic.テーブル
 2. 金額は日本円（JPY）として扱ってください
 3. 日付は日本時間（JST）として扱ってください
 4. パフォーマンスメトリクスは適切に集計してください（SUM, AVG等）
-"""
\ No newline at end of file
+"""
+
+BIGQUERY_TOOLS_PROMPT = """
+## BigQueryツール
+データへのアクセスには、bqコマンドではなく以下のツールを使用してください：
+- run_query: 読み取り専用のSELECTクエリを実行し、結果をTSVで返します
+- list_tables: semanticデータセットのテーブル一覧を返します
+- get_table_schema: テーブルの列名・型・説明を返します
+
+結果が大きい場合はサンプリングされるため、集計はSQL側で行ってください。
+スキャン量が上限を超えるクエリは実行前に拒否されます。その場合は期間や列を絞って再実行してください。
+"""
@@ -1,28 +1,148 @@
 """BigQuery integration service."""
 
+import asyncio
+import functools
+import hashlib
 import logging
 import os
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
+from google.auth.transport.requests import Request
 from google.cloud import bigquery
 from google.oauth2 import service_account
 
 from src.config import settings
+from src.services import metrics
+from src.services.component_serializer import Columns, to_records
+from src.services.query_cache import QueryCache, normalize_sql
+from src.services.single_flight import SingleFlight
+
+try:
+    import pyarrow
+except ImportError:  # Optional: pip install growth-force-backend[columnar]
+    pyarrow = None
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Pages of row tuples; see BigQueryService.query_pages()
+RowPages = AsyncGenerator[List[Tuple[Any, ...]], None]
+
+# Per-request accumulator of job statistics; see start_query_stats()
+_query_stats: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar(
+    "bigquery_query_stats", default=None
+)
+
+
+class QueryBudgetExceededError(ValueError):
+    """Raised when a dry run estimates more bytes than the budget allows."""
+
+
+def start_query_stats() -> List[Dict[str, Any]]:
+    """Collect statistics of every job run from the current context on."""
+    stats: List[Dict[str, Any]] = []
+    _query_stats.set(stats)
+    return stats
+
+
+def summarize_query_stats(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Summarize collected job statistics for response metadata."""
+    return {
+        "queries": len(stats),
+        "bytes_processed": sum(s["bytes_processed"] or 0 for s in stats),
+        "bytes_billed": sum(s["bytes_billed"] or 0 for s in stats),
+        "slot_ms": sum(s["slot_ms"] or 0 for s in stats),
+        "cache_hits": sum(1 for s in stats if s["cache_hit"]),
+        "app_cache_hits": sum(1 for s in stats if s.get("app_cache_hit")),
+        "jobs": stats,
+    }
+
+
+def _format_bytes(num_bytes: int) -> str:
+    """Format a byte count as GB for messages."""
+    return f"{num_bytes / 1024**3:.2f} GB"
+
+
+def _row_count(result: Any) -> int:
+    """Count rows of fetched results, as rows, column lists or a row iterator."""
+    if isinstance(result, dict):
+        return len(next(iter(result.values()), ()))
+    if isinstance(result, list):
+        return len(result)
+    return result.total_rows or 0
+
+
+def _read_page(pages: Iterator[Any]) -> Optional[List[Tuple[Any, ...]]]:
+    """Fetch the next page of a row iterator as tuples, or None at the end."""
+    page = next(pages, None)
+    if page is None:
+        return None
+    # Row.values() deep-copies each row; tuple() only reads it
+    return [tuple(row) for row in page]
+
+
+def sql_fingerprint(query: str) -> str:
+    """Fingerprint a SQL query, ignoring layout but not literal contents."""
+    normalized = normalize_sql(query)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
 
 class BigQueryService:
     """Service for interacting with BigQuery."""
 
-    def __init__(self):
-        """Initialize BigQuery service."""
+    def __init__(self, read_only: bool = True):
+        """Initialize BigQuery service.
+
+        Only the rollup refresher needs a client that can write
+        (``read_only=False``); the agent's client gets the read-only scope.
+        """
+        self.read_only = read_only
         self.client = self._create_client()
         self.project_id = settings.bq_project_id
         self.dataset_id = settings.bq_dataset_id
+        # The google-cloud-bigquery client is blocking, so every call runs on a
+        # dedicated, size-limited pool instead of the event loop.
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.bigquery_max_workers,
+            thread_name_prefix="bigquery",
+        )
+        self._query_semaphore = asyncio.Semaphore(
+            settings.bigquery_max_concurrent_queries
+        )
+        self._single_flight = SingleFlight("bigquery", settings.bigquery_timeout)
+        self.query_cache = QueryCache(watermark_loader=self.get_table_last_modified)
 
     def _create_client(self) -> bigquery.Client:
         """Create BigQuery client with service account credentials."""
+        missing = [
+            name
+            for name in (
+                "bq_private_key_id",
+                "bq_private_key",
+                "bq_client_email",
+                "bq_client_id",
+            )
+            if not getattr(settings, name)
+        ]
+        if missing:
+            raise ValueError(
+                f"BigQuery credentials are not configured: {', '.join(missing)}"
+            )
+
         try:
             # Create credentials from environment variables
             service_account_info = {
@@ -41,7 +161,11 @@ class BigQueryService:
             # Create credentials
             credentials = service_account.Credentials.from_service_account_info(
                 service_account_info,
-                scopes=["https://www.googleapis.com/auth/bigquery.readonly"],
+                scopes=[
+                    "https://www.googleapis.com/auth/bigquery.readonly"
+                    if self.read_only
+                    else "https://www.googleapis.com/auth/bigquery"
+                ],
             )
 
             # Create and return client
@@ -54,26 +178,203 @@ class BigQueryService:
             logger.error(f"Failed to create BigQuery client: {str(e)}")
             raise
 
-    async def execute_query(self, query: str) -> List[Dict[str, Any]]:
-        """Execute a BigQuery query and return results."""
+    async def _run_blocking(
+        self, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """Run a blocking client call on the BigQuery executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    async def _wait_for_job(self, query_job: bigquery.QueryJob) -> None:
+        """Poll a query job until it is done, yielding to the event loop."""
+        while not await self._run_blocking(query_job.done):
+            await asyncio.sleep(settings.bigquery_poll_interval)
+
+    async def _cancel_job(self, query_job: bigquery.QueryJob) -> None:
+        """Cancel a query job on BigQuery."""
         try:
+            await self._run_blocking(query_job.cancel)
+            logger.info(f"Cancelled BigQuery job {query_job.job_id}")
+        except Exception as e:
+            logger.error(f"Failed to cancel BigQuery job: {str(e)}")
+
+    def _fetch_rows(self, query_job: bigquery.QueryJob) -> List[Dict[str, Any]]:
+        """Fetch all rows of a finished query job."""
+        results = query_job.result(timeout=settings.bigquery_timeout)
+
+        # Convert to list of dictionaries
+        return [dict(row) for row in results]
+
+    def _fetch_columns(self, query_job: bigquery.QueryJob) -> Columns:
+        """Fetch all rows of a finished query job as columns.
+
+        With pyarrow the columns stay Arrow arrays, read through the BigQuery
+        Storage API when installed; consumers convert only what they need.
+        """
+        results = query_job.result(timeout=settings.bigquery_timeout)
+
+        if pyarrow is not None:
+            table = results.to_arrow(
+                create_bqstorage_client=settings.bigquery_use_storage_api
+            )
+            return dict(zip(table.column_names, table.columns))
+
+        columns: Dict[str, List[Any]] = {field.name: [] for field in results.schema}
+        appenders = [column.append for column in columns.values()]
+        for row in results:
+            for append, value in zip(appenders, row.values()):
+                append(value)
+        return columns
+
+    def _open_pages(self, query_job: bigquery.QueryJob) -> Any:
+        """Get a finished query job's row iterator without fetching every page."""
+        return query_job.result(
+            page_size=settings.export_page_size, timeout=settings.bigquery_timeout
+        )
+
+    async def _run_query(
+        self,
+        query: str,
+        fetch: Callable[[bigquery.QueryJob], T],
+        query_parameters: Sequence[bigquery.ScalarQueryParameter] = (),
+    ) -> T:
+        """Run a query job and fetch its results with ``fetch``.
+
+        Values from outside the query go in ``query_parameters`` (``@name``
+        in the SQL), never into the SQL text. The job is cancelled on
+        BigQuery if the caller is cancelled (e.g. the HTTP request is
+        dropped) or ``bigquery_timeout`` elapses.
+        """
+        async with self._query_semaphore:
+            estimated_bytes = None
+            if settings.bigquery_dry_run_enabled:
+                with metrics.timed("bigquery.dry_run"):
+                    estimated_bytes = await self._dry_run(query, query_parameters)
+
             # Configure query job
             job_config = bigquery.QueryJobConfig(
                 use_query_cache=True,
-                timeout_ms=settings.bigquery_timeout * 1000,  # Convert to milliseconds
+                job_timeout_ms=settings.bigquery_timeout * 1000,  # Convert to milliseconds
+                maximum_bytes_billed=settings.bigquery_max_bytes_billed,
+                query_parameters=list(query_parameters),
             )
 
             # Execute query
-            query_job = self.client.query(query, job_config=job_config)
-            
+            query_job = await self._run_blocking(
+                self.client.query, query, job_config=job_config
+            )
+
             # Wait for results
-            results = query_job.result(timeout=settings.bigquery_timeout)
-            
-            # Convert to list of dictionaries
-            rows = []
-            for row in results:
-                rows.append(dict(row))
-            
+            try:
+                async with asyncio.timeout(settings.bigquery_timeout):
+                    with metrics.timed("bigquery.job_wait"):
+                        await self._wait_for_job(query_job)
+                    with metrics.timed("bigquery.fetch"):
+                        result = await self._run_blocking(fetch, query_job)
+            except (asyncio.CancelledError, TimeoutError):
+                await self._cancel_job(query_job)
+                raise
+
+            self._record_stats(query_job, estimated_bytes)
+            metrics.record_bigquery_job(
+                query_job.total_bytes_processed, _row_count(result)
+            )
+            return result
+
+    async def _dry_run(
+        self,
+        query: str,
+        query_parameters: Sequence[bigquery.ScalarQueryParameter] = (),
+    ) -> int:
+        """Estimate bytes processed and enforce the per-query budget.
+
+        Raises QueryBudgetExceededError with a message the agent can act on.
+        """
+        job_config = bigquery.QueryJobConfig(
+            dry_run=True,
+            use_query_cache=False,
+            query_parameters=list(query_parameters),
+        )
+        dry_run_job = await self._run_blocking(
+            self.client.query, query, job_config=job_config
+        )
+        estimated_bytes = dry_run_job.total_bytes_processed or 0
+
+        if estimated_bytes > settings.bigquery_max_bytes_processed:
+            logger.warning(
+                f"Rejected query scanning {_format_bytes(estimated_bytes)}"
+            )
+            raise QueryBudgetExceededError(
+                f"このクエリは約{_format_bytes(estimated_bytes)}をスキャンするため実行できません"
+                f"（上限{_format_bytes(settings.bigquery_max_bytes_processed)}）。"
+                "WHERE句で日付パーティションの期間を絞るか、必要な列だけをSELECTしてください。"
+            )
+        return estimated_bytes
+
+    def _record_stats(
+        self, query_job: bigquery.QueryJob, estimated_bytes: Optional[int]
+    ) -> None:
+        """Record a finished job's statistics for the current request."""
+        stats = _query_stats.get()
+        if stats is None:
+            return
+        stats.append({
+            "job_id": query_job.job_id,
+            "estimated_bytes": estimated_bytes,
+            "bytes_processed": query_job.total_bytes_processed,
+            "bytes_billed": query_job.total_bytes_billed,
+            "slot_ms": query_job.slot_millis,
+            "cache_hit": query_job.cache_hit,
+        })
+
+    async def _query_columns(self, query: str) -> Columns:
+        """Get a query's columns from the result cache or a shared job run.
+
+        Identical concurrent queries share one job, matched by SQL fingerprint.
+        """
+        lookup = None
+        if settings.query_cache_enabled:
+            lookup = await self.query_cache.lookup(query)
+        if lookup is not None:
+            columns = await self.query_cache.get(lookup)
+            if columns is not None:
+                self._record_cache_hit()
+                return columns
+
+        if settings.single_flight_enabled:
+            columns = await self._single_flight.do(
+                sql_fingerprint(query),
+                lambda: self._run_query(query, self._fetch_columns),
+            )
+        else:
+            columns = await self._run_query(query, self._fetch_columns)
+
+        if lookup is not None:
+            # Watermarks from before the run, so mid-run table updates count
+            await self.query_cache.set(lookup, columns)
+        return columns
+
+    def _record_cache_hit(self) -> None:
+        """Record a result served from the application cache."""
+        stats = _query_stats.get()
+        if stats is None:
+            return
+        stats.append({
+            "job_id": None,
+            "estimated_bytes": 0,
+            "bytes_processed": 0,
+            "bytes_billed": 0,
+            "slot_ms": 0,
+            "cache_hit": True,
+            "app_cache_hit": True,
+        })
+
+    async def execute_query(self, query: str) -> List[Dict[str, Any]]:
+        """Execute a BigQuery query and return results."""
+        try:
+            rows = to_records(await self._query_columns(query))
             logger.info(f"Query executed successfully, returned {len(rows)} rows")
             return rows
 
@@ -81,12 +382,59 @@ class BigQueryService:
             logger.error(f"BigQuery query failed: {str(e)}")
             raise
 
+    async def execute_query_columnar(self, query: str) -> Columns:
+        """Execute a BigQuery query and return results column by column.
+
+        Avoids building a dict per row; see ``component_serializer`` for turning
+        the columns into component props.
+        """
+        try:
+            columns = await self._query_columns(query)
+            row_count = len(next(iter(columns.values()), []))
+            logger.info(f"Query executed successfully, returned {row_count} rows")
+            return columns
+
+        except Exception as e:
+            logger.error(f"BigQuery query failed: {str(e)}")
+            raise
+
+    async def query_pages(
+        self, query: str
+    ) -> Tuple[List[bigquery.SchemaField], RowPages]:
+        """Run a query and return its schema and an iterator over row pages.
+
+        Pages of ``export_page_size`` rows are fetched one at a time, with the
+        next one prefetched while the caller handles the current one, so
+        memory stays bounded however many rows the query returns. Bypasses
+        the result cache; the query still counts against the byte budget.
+        """
+        try:
+            results = await self._run_query(query, self._open_pages)
+        except Exception as e:
+            logger.error(f"BigQuery query failed: {str(e)}")
+            raise
+        logger.info(f"Query executed successfully, paging {results.total_rows} rows")
+        return list(results.schema), self._iter_pages(iter(results.pages))
+
+    async def _iter_pages(self, pages: Iterator[Any]) -> RowPages:
+        """Yield row pages, fetching each next page in the background."""
+        fetch = asyncio.ensure_future(self._run_blocking(_read_page, pages))
+        try:
+            while True:
+                rows = await fetch
+                if rows is None:
+                    return
+                fetch = asyncio.ensure_future(self._run_blocking(_read_page, pages))
+                yield rows
+        finally:
+            fetch.cancel()
+
     async def get_table_schema(self, table_name: str) -> List[Dict[str, Any]]:
         """Get schema for a specific table."""
         try:
             table_ref = f"{self.project_id}.{self.dataset_id}.{table_name}"
-            table = self.client.get_table(table_ref)
-            
+            table = await self._run_blocking(self.client.get_table, table_ref)
+
             schema = []
             for field in table.schema:
                 schema.append({
@@ -95,7 +443,7 @@ class BigQueryService:
                     "mode": field.mode,
                     "description": field.description,
                 })
-            
+
             return schema
 
         except Exception as e:
@@ -106,18 +454,70 @@ class BigQueryService:
         """List all tables in the dataset."""
         try:
             dataset_ref = f"{self.project_id}.{self.dataset_id}"
-            tables = self.client.list_tables(dataset_ref)
-            
+            # list_tables pages lazily, so materialize it on the executor too
+            tables = await self._run_blocking(
+                lambda: list(self.client.list_tables(dataset_ref))
+            )
+
             table_names = []
             for table in tables:
                 table_names.append(table.table_id)
-            
+
             return table_names
 
         except Exception as e:
             logger.error(f"Failed to list tables: {str(e)}")
             raise
 
+    async def get_table_last_modified(self) -> Dict[str, int]:
+        """Get each table's last-modified time (epoch ms) in the dataset."""
+        try:
+            # Bypasses the result cache, which depends on these times
+            rows = await self._run_query(
+                "SELECT table_id, last_modified_time "
+                f"FROM `{self.project_id}.{self.dataset_id}.__TABLES__`",
+                self._fetch_rows,
+            )
+            return {row["table_id"]: row["last_modified_time"] for row in rows}
+
+        except Exception as e:
+            logger.error(f"Failed to get table last-modified times: {str(e)}")
+            raise
+
+    async def get_partition_last_modified(self, table_name: str) -> Dict[str, int]:
+        """Get each partition's last-modified time (epoch ms) of a table.
+
+        Unpartitioned tables have a single ``__UNPARTITIONED__`` entry.
+        """
+        try:
+            rows = await self._run_query(
+                "SELECT partition_id, UNIX_MILLIS(last_modified_time) AS last_modified "
+                f"FROM `{self.project_id}.{self.dataset_id}.INFORMATION_SCHEMA.PARTITIONS` "
+                "WHERE table_name = @table_name",
+                self._fetch_rows,
+                [bigquery.ScalarQueryParameter("table_name", "STRING", table_name)],
+            )
+            return {row["partition_id"]: row["last_modified"] for row in rows}
+
+        except Exception as e:
+            logger.error(f"Failed to get partition last-modified times: {str(e)}")
+            raise
+
+    async def execute_statement(self, statement: str) -> List[Dict[str, Any]]:
+        """Run a DDL or DML statement, bypassing the result cache."""
+        try:
+            return await self._run_query(statement, self._fetch_rows)
+
+        except Exception as e:
+            logger.error(f"Statement execution failed: {str(e)}")
+            raise
+
+    async def warm_up(self) -> None:
+        """Fetch an access token so the first query skips the OAuth round trip."""
+        credentials = getattr(self.client, "_credentials", None)
+        if credentials is not None and not credentials.valid:
+            await self._run_blocking(credentials.refresh, Request())
+
     def validate_connection(self) -> bool:
         """Validate BigQuery connection."""
         try:
@@ -126,4 +526,9 @@ class BigQueryService:
             return True
         except Exception as e:
             logger.error(f"BigQuery connection validation failed: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+
+    def close(self) -> None:
+        """Shut down the BigQuery executor."""
+        self._single_flight.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
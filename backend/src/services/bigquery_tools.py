@@ -0,0 +1,202 @@
+"""In-process BigQuery tools exposed to Claude Code as an SDK MCP server."""
+
+import functools
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from claude_code_sdk import McpSdkServerConfig, create_sdk_mcp_server, tool
+
+from src.config import settings
+from src.services.bigquery_service import BigQueryService
+from src.services.claude_pool import in_run_context
+from src.services.component_serializer import Columns, take_rows
+from src.services.schema_catalog import SchemaCatalog
+
+logger = logging.getLogger(__name__)
+
+SERVER_NAME = "bigquery"
+TOOL_NAMES = ["run_query", "list_tables", "get_table_schema"]
+ALLOWED_TOOLS = [f"mcp__{SERVER_NAME}__{name}" for name in TOOL_NAMES]
+
+# Comments and quoted strings/identifiers are blanked before keyword checks
+_SQL_NOISE = re.compile(
+    r"--[^\n]*|/\*.*?\*/|'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`",
+    re.DOTALL,
+)
+_WRITE_KEYWORDS = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|CREATE|DROP|ALTER|TRUNCATE|GRANT|REVOKE"
+    r"|CALL|EXPORT|LOAD|BEGIN|DECLARE|SET|EXECUTE)\b",
+    re.IGNORECASE,
+)
+
+
+def ensure_read_only(sql: str) -> None:
+    """Reject anything but a single SELECT/WITH statement.
+
+    Raises ValueError with a message the agent can act on.
+    """
+    stripped = _SQL_NOISE.sub(" ", sql).strip().rstrip(";").strip()
+    if ";" in stripped:
+        raise ValueError(
+            "複数のSQL文は実行できません。SELECT文を1つだけ送ってください。"
+        )
+    if not re.match(r"(SELECT|WITH)\b", stripped, re.IGNORECASE):
+        raise ValueError(
+            "読み取り専用です。SELECTまたはWITHで始まるクエリのみ実行できます。"
+        )
+    match = _WRITE_KEYWORDS.search(stripped)
+    if match:
+        raise ValueError(
+            f"読み取り専用です。{match.group(1).upper()}を含むクエリは実行できません。"
+        )
+
+
+def _format_value(value: Any) -> str:
+    """Format a cell for the tab-separated tool output."""
+    if value is None:
+        return ""
+    return str(value).replace("\t", " ").replace("\n", " ")
+
+
+def format_rows(columns: Columns, max_rows: int, max_chars: int) -> str:
+    """Render columns as TSV for the model, truncating or sampling large results.
+
+    Results over ``max_rows`` keep the first half of the budget as-is and an
+    evenly spaced sample of the remainder, so trends stay visible. Only the
+    rows shown are converted from Arrow to Python objects.
+    """
+    names = list(columns)
+    total = len(columns[names[0]]) if names else 0
+    if total <= max_rows:
+        indices = list(range(total))
+        note = f"{total} rows"
+    else:
+        head = max_rows // 2
+        step = (total - head) / (max_rows - head)
+        indices = list(range(head)) + [
+            head + int(i * step) for i in range(max_rows - head)
+        ]
+        note = (
+            f"{total} rows; showing first {head} and {max_rows - head} evenly "
+            "sampled rows. Aggregate in SQL for exact figures."
+        )
+
+    shown = take_rows(columns, indices)
+    lines = ["\t".join(names)]
+    length = len(lines[0])
+    for values in zip(*shown.values()):
+        line = "\t".join(map(_format_value, values))
+        length += len(line) + 1
+        if length > max_chars:
+            note += f" Output truncated at {len(lines) - 1} rows."
+            break
+        lines.append(line)
+
+    return f"({note})\n" + "\n".join(lines)
+
+
+def _text_result(text: str, is_error: bool = False) -> Dict[str, Any]:
+    """Build an MCP tool result."""
+    result: Dict[str, Any] = {"content": [{"type": "text", "text": text}]}
+    if is_error:
+        result["is_error"] = True
+    return result
+
+
+ToolHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def _in_run_context(handler: ToolHandler) -> ToolHandler:
+    """Run a tool handler in the context of the request it serves.
+
+    Its BigQuery jobs and timings are then recorded for that request, also
+    when the run is on a pooled process.
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(args: Dict[str, Any]) -> Dict[str, Any]:
+        return await in_run_context(handler(args))
+
+    return wrapper
+
+
+def create_bigquery_server(
+    bigquery_service: BigQueryService,
+    schema_catalog: Optional[SchemaCatalog] = None,
+) -> McpSdkServerConfig:
+    """Create the in-process BigQuery MCP server.
+
+    Tool calls go through the long-lived ``BigQueryService`` client instead of
+    forking the ``bq`` CLI, so each call costs only the BigQuery round-trip.
+    """
+
+    @tool(
+        "run_query",
+        "Run a read-only BigQuery Standard SQL SELECT query on the semantic "
+        "dataset and return the rows as TSV. Large results are sampled; "
+        "aggregate in SQL where possible.",
+        {"sql": str},
+    )
+    @_in_run_context
+    async def run_query(args: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a read-only query."""
+        sql = args["sql"]
+        try:
+            ensure_read_only(sql)
+            columns = await bigquery_service.execute_query_columnar(sql)
+        except ValueError as e:
+            return _text_result(str(e), is_error=True)
+        except Exception as e:
+            logger.error(f"run_query tool failed: {str(e)}")
+            return _text_result(f"クエリの実行に失敗しました: {str(e)}", is_error=True)
+
+        return _text_result(
+            format_rows(
+                columns,
+                settings.bigquery_tool_max_rows,
+                settings.bigquery_tool_max_chars,
+            )
+        )
+
+    @tool("list_tables", "List the tables in the semantic dataset.", {})
+    @_in_run_context
+    async def list_tables(args: Dict[str, Any]) -> Dict[str, Any]:
+        """List dataset tables."""
+        try:
+            if schema_catalog is not None and schema_catalog.tables:
+                tables = sorted(schema_catalog.tables)
+            else:
+                tables = await bigquery_service.list_tables()
+        except Exception as e:
+            logger.error(f"list_tables tool failed: {str(e)}")
+            return _text_result(
+                f"テーブル一覧の取得に失敗しました: {str(e)}", is_error=True
+            )
+        return _text_result("\n".join(tables))
+
+    @tool(
+        "get_table_schema",
+        "Get the column names, types and descriptions of a table.",
+        {"table": str},
+    )
+    @_in_run_context
+    async def get_table_schema(args: Dict[str, Any]) -> Dict[str, Any]:
+        """Get a table schema."""
+        table = args["table"].split(".")[-1]
+        try:
+            if schema_catalog is not None and table in schema_catalog.tables:
+                schema = schema_catalog.tables[table]["columns"]
+            else:
+                schema = await bigquery_service.get_table_schema(table)
+        except Exception as e:
+            logger.error(f"get_table_schema tool failed: {str(e)}")
+            return _text_result(
+                f"スキーマの取得に失敗しました: {str(e)}", is_error=True
+            )
+        return _text_result(json.dumps(schema, ensure_ascii=False))
+
+    return create_sdk_mcp_server(
+        name=SERVER_NAME, tools=[run_query, list_tables, get_table_schema]
+    )
@@ -1,104 +1,257 @@
 """Custom authentication service for Claude Code with subscription tokens."""
 
-import json
+import asyncio
 import logging
 import os
-from typing import Optional
+import random
+import time
+from typing import Dict, Optional, Tuple
 
 import httpx
 
 from src.config import settings
+from src.services.credential_store import ClaudeCredentials, CredentialStore
+from src.services.http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
 
 class ClaudeAuthService:
-    """Service for managing Claude authentication with custom tokens."""
+    """Service for managing Claude authentication with custom tokens.
 
-    def __init__(self):
+    Tokens live in the shared ``CredentialStore``, so tokens set through any
+    worker are used by all of them; they are handed to each Claude Code run
+    through ``auth_env()`` rather than the process environment.
+
+    Uses the shared keep-alive HTTP client. Tokens are refreshed ahead of
+    ``expires_at`` (by a margin plus per-worker jitter), concurrent callers
+    share one refresh, and a Redis lock lets only one worker refresh at a
+    time while the others pick up its result. Validation results are cached
+    briefly per token.
+    """
+
+    def __init__(
+        self,
+        credential_store: Optional[CredentialStore] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
         """Initialize auth service."""
         self.base_url = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com")
-        self.access_token = None
-        self.refresh_token = None
-        self.expires_at = None
+        self.credential_store = credential_store or CredentialStore()
+        self.http_client = http_client
+        # (expires_at, refresh_at): jitter drawn once per token
+        self._refresh_at: Optional[Tuple[int, float]] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._scheduled_refresh: Optional[asyncio.Task] = None
+        # (token, valid, checked_at)
+        self._validation: Optional[Tuple[str, bool, float]] = None
+
+    def _client(self) -> httpx.AsyncClient:
+        """Get the HTTP client."""
+        return self.http_client or get_http_client()
+
+    @property
+    def access_token(self) -> Optional[str]:
+        """The current access token."""
+        credentials = self.credential_store.current
+        return credentials.access_token if credentials else None
+
+    @property
+    def refresh_token(self) -> Optional[str]:
+        """The current refresh token."""
+        credentials = self.credential_store.current
+        return credentials.refresh_token if credentials else None
+
+    @property
+    def expires_at(self) -> Optional[int]:
+        """Expiry of the current access token (epoch seconds)."""
+        credentials = self.credential_store.current
+        return credentials.expires_at if credentials else None
+
+    def _refresh_time(self) -> Optional[float]:
+        """When this worker should refresh the current token."""
+        expires_at = self.expires_at
+        if expires_at is None:
+            return None
+        if self._refresh_at is None or self._refresh_at[0] != expires_at:
+            self._refresh_at = (
+                expires_at,
+                expires_at
+                - settings.claude_token_refresh_margin
+                - random.uniform(0, settings.claude_token_refresh_jitter),
+            )
+        return self._refresh_at[1]
+
+    async def _refresh_when_due(self) -> None:
+        """Refresh in the background, following tokens set by any worker."""
+        store = self.credential_store
+        while True:
+            store.changed.clear()
+            refresh_at = self._refresh_time() if self.refresh_token else None
+            timeout = (
+                None if refresh_at is None else max(0.0, refresh_at - time.time())
+            )
+            try:
+                await asyncio.wait_for(store.changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                await self.get_valid_token()
+                if self.needs_refresh():
+                    # Refresh failed; retry shortly instead of spinning
+                    await asyncio.sleep(settings.claude_token_refresh_retry)
+
+    async def start(self) -> None:
+        """Load the shared credentials and schedule proactive refresh."""
+        await self.credential_store.start()
+        if self._scheduled_refresh is None:
+            self._scheduled_refresh = asyncio.create_task(self._refresh_when_due())
 
     async def authenticate_with_tokens(
         self, access_token: str, refresh_token: str, expires_at: int
     ) -> bool:
-        """Authenticate using subscription tokens."""
+        """Validate subscription tokens and share them with all workers."""
         try:
-            # Store tokens
-            self.access_token = access_token
-            self.refresh_token = refresh_token
-            self.expires_at = expires_at
+            if not await self._validate_token(access_token):
+                return False
 
-            # Set as environment variable for Claude Code SDK
-            os.environ["ANTHROPIC_AUTH_TOKEN"] = f"Bearer {access_token}"
-            
-            # Validate token
-            return await self._validate_token()
+            await self.credential_store.save(
+                ClaudeCredentials(access_token, refresh_token, expires_at)
+            )
+            return True
 
         except Exception as e:
             logger.error(f"Authentication failed: {str(e)}")
             return False
 
-    async def _validate_token(self) -> bool:
-        """Validate the current token."""
+    async def _validate_token(self, token: Optional[str] = None) -> bool:
+        """Validate a token (default: the current one), reusing a recent result."""
+        token = token or self.access_token
+        if self._validation is not None:
+            cached_token, valid, checked_at = self._validation
+            if (
+                cached_token == token
+                and time.monotonic() - checked_at < settings.claude_token_validation_ttl
+            ):
+                return valid
+
         try:
-            async with httpx.AsyncClient() as client:
-                headers = {
-                    "Authorization": f"Bearer {self.access_token}",
-                    "Content-Type": "application/json",
-                }
-                
-                # Try a simple API call to validate
-                response = await client.get(
-                    f"{self.base_url}/v1/models",
-                    headers=headers,
-                )
-                
-                return response.status_code == 200
+            headers = {
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json",
+            }
+
+            # Try a simple API call to validate
+            response = await self._client().get(
+                f"{self.base_url}/v1/models",
+                headers=headers,
+            )
+            valid = response.status_code == 200
 
         except Exception as e:
             logger.error(f"Token validation failed: {str(e)}")
+            # Transient failures are not cached
             return False
 
+        self._validation = (token, valid, time.monotonic())
+        return valid
+
     async def refresh_access_token(self) -> Optional[str]:
-        """Refresh the access token using refresh token."""
+        """Refresh the access token, sharing one request among callers."""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh())
+            self._refresh_task.add_done_callback(self._clear_refresh_task)
+        return await asyncio.shield(self._refresh_task)
+
+    def _clear_refresh_task(self, task: asyncio.Task) -> None:
+        """Allow the next refresh once this one is done."""
+        if self._refresh_task is task:
+            self._refresh_task = None
+
+    async def _refresh(self) -> Optional[str]:
+        """Refresh the access token using refresh token.
+
+        Another worker may have refreshed already, or may be refreshing now;
+        in both cases its result is used instead of refreshing again.
+        """
+        store = self.credential_store
         try:
-            async with httpx.AsyncClient() as client:
+            await store.load()
+            if not self.needs_refresh():
+                return self.access_token
+
+            lock_ttl = int(settings.http_timeout * 2)
+            lock = await store.acquire_refresh_lock(lock_ttl)
+            if lock is None:
+                # Wait for the holder's update to arrive
+                deadline = time.monotonic() + lock_ttl
+                while time.monotonic() < deadline:
+                    await asyncio.sleep(0.5)
+                    await store.load()
+                    if not self.needs_refresh():
+                        break
+                return self.access_token
+
+            try:
+                refresh_token = self.refresh_token
                 # This is a hypothetical endpoint - actual implementation may vary
-                response = await client.post(
+                response = await self._client().post(
                     f"{self.base_url}/auth/refresh",
-                    json={"refresh_token": self.refresh_token},
+                    json={"refresh_token": refresh_token},
                 )
-                
+
                 if response.status_code == 200:
                     data = response.json()
-                    self.access_token = data["access_token"]
-                    self.expires_at = data["expires_at"]
-                    
-                    # Update environment variable
-                    os.environ["ANTHROPIC_AUTH_TOKEN"] = f"Bearer {self.access_token}"
-                    
+                    await store.save(
+                        ClaudeCredentials(
+                            access_token=data["access_token"],
+                            refresh_token=data.get("refresh_token", refresh_token),
+                            expires_at=data["expires_at"],
+                        )
+                    )
                     return self.access_token
-                    
+            finally:
+                await store.release_refresh_lock(lock)
+
         except Exception as e:
             logger.error(f"Token refresh failed: {str(e)}")
-            
+
         return None
 
     def is_token_expired(self) -> bool:
         """Check if the current token is expired."""
         if not self.expires_at:
             return True
-            
-        import time
+
         return time.time() > self.expires_at
 
+    def needs_refresh(self) -> bool:
+        """Check if the token is expired or within its refresh window."""
+        refresh_at = self._refresh_time()
+        if refresh_at is None:
+            return True
+        return time.time() >= refresh_at
+
     async def get_valid_token(self) -> Optional[str]:
-        """Get a valid access token, refreshing if necessary."""
-        if self.is_token_expired():
+        """Get a valid access token, refreshing if necessary.
+
+        Inside the refresh window the current token is still returned if the
+        refresh fails; once expired, the caller gets whatever the refresh got.
+        """
+        if self.needs_refresh() and self.refresh_token:
             await self.refresh_access_token()
-            
-        return self.access_token
\ No newline at end of file
+
+        return self.access_token
+
+    def auth_env(self) -> Dict[str, str]:
+        """Environment for one Claude Code run, carrying the current token."""
+        if not self.access_token:
+            return {}
+        return {"ANTHROPIC_AUTH_TOKEN": f"Bearer {self.access_token}"}
+
+    async def close(self) -> None:
+        """Stop the scheduled refresh and change notifications."""
+        for task in (self._scheduled_refresh, self._refresh_task):
+            if task is not None:
+                task.cancel()
+        self._scheduled_refresh = None
+        self._refresh_task = None
+        await self.credential_store.stop()
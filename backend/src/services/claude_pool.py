@@ -0,0 +1,381 @@
+"""Pool of pre-started Claude Code CLI sessions."""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager, suppress
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Coroutine,
+    Dict,
+    List,
+    Optional,
+    Set,
+    TypeVar,
+)
+
+from claude_code_sdk import ClaudeCodeOptions, ClaudeSDKClient, Message, ResultMessage
+
+logger = logging.getLogger(__name__)
+
+# Sent between runs so a reused process starts from an empty conversation
+RESET_COMMAND = "/clear"
+
+T = TypeVar("T")
+
+# The session whose owner task, and so whose SDK tasks, the current task is
+_current_session: contextvars.ContextVar[Optional["PooledSession"]] = (
+    contextvars.ContextVar("claude_pooled_session", default=None)
+)
+
+
+def _env_fingerprint(options: ClaudeCodeOptions) -> str:
+    """Fingerprint the environment (credentials) a process was started with."""
+    material = json.dumps(options.env, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(material).hexdigest()
+
+
+class PooledSession:
+    """One Claude Code CLI process in streaming-input mode.
+
+    The SDK client must be connected and disconnected by the same task, so
+    each session owns a task that connects, waits to be stopped and then
+    disconnects; runs themselves may come from any task.
+    """
+
+    def __init__(self, options: ClaudeCodeOptions):
+        """Initialize session."""
+        self.client = ClaudeSDKClient(options)
+        self.fingerprint = _env_fingerprint(options)
+        self.session_id: Optional[str] = None  # Owner, from the first lease
+        self.runs = 0
+        self.idle_since = time.monotonic()
+        self.baseline_rss: Optional[int] = None
+        # Context of the request holding the lease; see in_run_context()
+        self.run_context: Optional[contextvars.Context] = None
+        self._connected = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+    async def start(self, timeout: float) -> None:
+        """Start the CLI and wait for its initialize handshake."""
+        self._task = asyncio.create_task(self._own())
+        connected = asyncio.create_task(self._connected.wait())
+        try:
+            await asyncio.wait(
+                {self._task, connected},
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            connected.cancel()
+            if not self._connected.is_set():
+                await self.stop()
+        if not self._connected.is_set():
+            raise self._error or TimeoutError("Claude Code session did not start")
+        self.baseline_rss = self.rss()
+
+    async def _own(self) -> None:
+        """Hold the connection open until stopped."""
+        _current_session.set(self)
+        try:
+            await self.client.connect()
+            self._connected.set()
+            await self._stop.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            with suppress(Exception):
+                await self.client.disconnect()
+
+    async def stop(self) -> None:
+        """Disconnect and end the process."""
+        self._stop.set()
+        if self._task is not None:
+            if not self._connected.is_set():
+                self._task.cancel()
+            await asyncio.wait({self._task})
+
+    @property
+    def pid(self) -> Optional[int]:
+        """Process ID of the CLI, if running."""
+        transport = getattr(self.client, "_transport", None)
+        process = getattr(transport, "_process", None)
+        if process is None or process.returncode is not None:
+            return None
+        return process.pid
+
+    def healthy(self) -> bool:
+        """Whether the process is alive and still connected."""
+        return (
+            self._connected.is_set()
+            and not self._stop.is_set()
+            and self._task is not None
+            and not self._task.done()
+            and self.pid is not None
+        )
+
+    def rss(self) -> Optional[int]:
+        """Resident memory of the CLI process in bytes (Linux only)."""
+        pid = self.pid
+        if pid is None:
+            return None
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+
+    async def run(self, prompt: str) -> AsyncIterator[Message]:
+        """Send a prompt and yield messages up to its result."""
+        self.runs += 1
+        await self.client.query(prompt, session_id=self.session_id or "default")
+        async for message in self.client.receive_response():
+            yield message
+
+    async def reset(self) -> None:
+        """Clear the conversation before the next run."""
+        async for message in self.run(RESET_COMMAND):
+            if isinstance(message, ResultMessage) and message.is_error:
+                raise RuntimeError(f"Reset failed: {message.result}")
+        self.runs -= 1  # The reset itself does not count
+
+
+async def in_run_context(coro: Coroutine[Any, Any, T]) -> T:
+    """Await in the context of the request the current pooled run serves.
+
+    The SDK handles a pooled process's in-process tool calls in tasks of the
+    process's owner, which started before any request, so per-request
+    context variables (BigQuery job statistics, Server-Timing) are not set
+    there. Outside a pooled session this just awaits.
+    """
+    session = _current_session.get()
+    context = session.run_context if session is not None else None
+    if context is None:
+        return await coro
+    # A copy per call, so concurrent tool calls can each enter it
+    return await asyncio.create_task(coro, context=context.copy())
+
+
+class ClaudeSessionPool:
+    """Keep Claude Code processes started ahead of demand.
+
+    ``size`` fresh processes wait for their first run, so a report no longer
+    pays the CLI's startup. After a run, a process is cleared and parked for
+    the same session only: processes are never shared between sessions, and
+    follow-up questions reuse their session's process. The least recently
+    used parked processes beyond ``max_parked``, and any idle for
+    ``idle_ttl``, are stopped. A process is recycled after
+    ``max_runs`` runs, when its memory has grown by ``max_rss_growth_mb``,
+    when it fails a health check, or when the credentials it was started with
+    change. If no process is available a lease yields ``None`` and the caller
+    falls back to spawning one for the request.
+    """
+
+    def __init__(
+        self,
+        options_factory: Callable[[], ClaudeCodeOptions],
+        size: int,
+        max_parked: int,
+        max_runs: int,
+        max_rss_growth_mb: int,
+        idle_ttl: float,
+        health_interval: float,
+        start_timeout: float,
+    ):
+        """Initialize pool."""
+        self.options_factory = options_factory
+        self.size = size
+        self.max_parked = max_parked
+        self.max_runs = max_runs
+        self.max_rss_growth = max_rss_growth_mb * 1024 * 1024
+        self.idle_ttl = idle_ttl
+        self.health_interval = health_interval
+        self.start_timeout = start_timeout
+        self._fresh: List[PooledSession] = []
+        self._parked: "OrderedDict[str, PooledSession]" = OrderedDict()
+        self._starting = 0
+        self._wake = asyncio.Event()
+        self._maintain_task: Optional[asyncio.Task] = None
+        self._releasing: Set[asyncio.Task] = set()
+        self._stopping: Set[asyncio.Task] = set()
+        self._stats: Dict[str, int] = defaultdict(int)
+
+    def start(self) -> None:
+        """Start filling the pool and checking its processes."""
+        if self._maintain_task is None:
+            self._maintain_task = asyncio.create_task(self._maintain())
+
+    async def stop(self) -> None:
+        """Stop maintenance and every idle process."""
+        if self._maintain_task is not None:
+            self._maintain_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._maintain_task
+            self._maintain_task = None
+        for task in self._releasing:
+            task.cancel()
+        await asyncio.gather(*self._releasing, return_exceptions=True)
+        sessions = [*self._fresh, *self._parked.values()]
+        self._fresh.clear()
+        self._parked.clear()
+        await asyncio.gather(*self._stopping, *(session.stop() for session in sessions))
+
+    @asynccontextmanager
+    async def lease(
+        self, session_id: str, context: Optional[contextvars.Context] = None
+    ) -> AsyncIterator[Optional[PooledSession]]:
+        """Hold a process for one run, or ``None`` to spawn per request.
+
+        In-process tool calls of the run execute in ``context`` (usually the
+        leasing request's ``contextvars.copy_context()``); see
+        ``in_run_context()``. A process whose run raised or was abandoned is
+        stopped, not reused.
+        """
+        session = self._acquire(session_id)
+        if session is None:
+            self._stats["misses"] += 1
+            yield None
+            return
+
+        self._stats["hits"] += 1
+        self._wake.set()
+        session.run_context = context
+        try:
+            yield session
+        except BaseException:
+            self._retire(session, "failed")
+            raise
+        finally:
+            session.run_context = None
+        task = asyncio.create_task(self._release(session, session_id))
+        self._releasing.add(task)
+        task.add_done_callback(self._releasing.discard)
+
+    def _acquire(self, session_id: str) -> Optional[PooledSession]:
+        """Take the session's parked process, else a fresh one."""
+        fingerprint = _env_fingerprint(self.options_factory())
+        session = self._parked.pop(session_id, None)
+        if session is not None:
+            if session.healthy() and session.fingerprint == fingerprint:
+                return session
+            self._retire(session, "stale")
+
+        while self._fresh:
+            session = self._fresh.pop()
+            if session.healthy() and session.fingerprint == fingerprint:
+                session.session_id = session_id
+                return session
+            self._retire(session, "stale")
+        return None
+
+    async def _release(self, session: PooledSession, session_id: str) -> None:
+        """Recycle or clear and park a process after its run."""
+        if session.runs >= self.max_runs:
+            self._retire(session, "max_runs")
+            return
+        rss = session.rss()
+        if (
+            rss is not None
+            and session.baseline_rss is not None
+            and rss - session.baseline_rss > self.max_rss_growth
+        ):
+            self._retire(session, "memory")
+            return
+        try:
+            async with asyncio.timeout(self.start_timeout):
+                await session.reset()
+        except asyncio.CancelledError:
+            await session.stop()
+            raise
+        except Exception as e:
+            logger.error(f"Failed to reset Claude Code session: {str(e)}")
+            self._retire(session, "failed")
+            return
+        if not session.healthy():
+            self._retire(session, "failed")
+            return
+
+        session.idle_since = time.monotonic()
+        previous = self._parked.pop(session_id, None)
+        if previous is not None:
+            self._retire(previous, "evicted")
+        self._parked[session_id] = session
+        while len(self._parked) > self.max_parked:
+            _, oldest = self._parked.popitem(last=False)
+            self._retire(oldest, "evicted")
+
+    def _retire(self, session: PooledSession, reason: str) -> None:
+        """Stop a process in the background."""
+        self._stats[f"recycled_{reason}"] += 1
+        task = asyncio.create_task(session.stop())
+        self._stopping.add(task)
+        task.add_done_callback(self._stopping.discard)
+        self._wake.set()
+
+    def _check(self) -> None:
+        """Drop dead, stale and long-idle processes."""
+        fingerprint = _env_fingerprint(self.options_factory())
+        fresh = []
+        for session in self._fresh:
+            if session.healthy() and session.fingerprint == fingerprint:
+                fresh.append(session)
+            else:
+                self._retire(session, "stale")
+        self._fresh = fresh
+
+        now = time.monotonic()
+        for session_id, session in list(self._parked.items()):
+            if now - session.idle_since > self.idle_ttl:
+                del self._parked[session_id]
+                self._retire(session, "idle")
+            elif not session.healthy() or session.fingerprint != fingerprint:
+                del self._parked[session_id]
+                self._retire(session, "stale")
+
+    async def _spawn(self) -> None:
+        """Start one fresh process."""
+        self._starting += 1
+        try:
+            session = PooledSession(self.options_factory())
+            await session.start(self.start_timeout)
+            self._fresh.append(session)
+            self._stats["spawned"] += 1
+        finally:
+            self._starting -= 1
+
+    async def _maintain(self) -> None:
+        """Health-check idle processes and keep ``size`` fresh ones ready."""
+        while True:
+            self._wake.clear()
+            try:
+                self._check()
+                missing = self.size - len(self._fresh) - self._starting
+                if missing > 0:
+                    await asyncio.gather(*(self._spawn() for _ in range(missing)))
+            except Exception as e:
+                self._stats["spawn_failures"] += 1
+                logger.error(f"Failed to start Claude Code session: {str(e)}")
+                # Back off instead of retrying on every lease
+                await asyncio.sleep(self.health_interval)
+                continue
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.health_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool occupancy, hit/miss and recycling counters."""
+        return {
+            "size": self.size,
+            "fresh": len(self._fresh),
+            "parked": len(self._parked),
+            "starting": self._starting,
+            **self._stats,
+        }
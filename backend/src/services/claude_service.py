@@ -1,16 +1,49 @@
 """Claude Code integration service."""
 
+import asyncio
+import contextvars
+import hashlib
 import json
 import logging
 import os
-from typing import Any, Dict, List, Optional
+import time
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import anyio
-from claude_code_sdk import ClaudeCodeOptions, Message, query
+from claude_code_sdk import (
+    AssistantMessage,
+    ClaudeCodeOptions,
+    Message,
+    ResultMessage,
+    TextBlock,
+    ToolResultBlock,
+    ToolUseBlock,
+    UserMessage,
+    query,
+)
 
 from src.config import settings
-from src.prompts import SYSTEM_PROMPT
+from src.prompts import BIGQUERY_TOOLS_PROMPT, SYSTEM_PROMPT
+from src.services.bigquery_service import (
+    BigQueryService,
+    start_query_stats,
+    summarize_query_stats,
+)
+from src.services.bigquery_tools import (
+    ALLOWED_TOOLS,
+    SERVER_NAME,
+    create_bigquery_server,
+)
 from src.services.claude_auth_service import ClaudeAuthService
+from src.services.claude_pool import ClaudeSessionPool
+from src.services import metrics
+from src.services.component_parser import ComponentStreamParser
+from src.services.report_cache import normalize_query
+from src.services.run_scheduler import RunScheduler
+from src.services.schema_catalog import SchemaCatalog, estimate_tokens
+from src.services.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
@@ -18,66 +51,291 @@ logger = logging.getLogger(__name__)
 class ClaudeService:
     """Service for interacting with Claude Code."""
 
-    def __init__(self):
+    def __init__(
+        self,
+        schema_catalog: Optional[SchemaCatalog] = None,
+        bigquery_service: Optional[BigQueryService] = None,
+        auth_service: Optional[ClaudeAuthService] = None,
+    ):
         """Initialize Claude service."""
-        self.auth_service = ClaudeAuthService()
-        self.options = ClaudeCodeOptions(
-            system_prompt=SYSTEM_PROMPT,
-            max_turns=1,  # Single turn for report generation
-            allowed_tools=["bash"],  # Only allow bash for bq commands
-            permission_mode="auto",
+        self.auth_service = auth_service or ClaudeAuthService()
+        self.schema_catalog = schema_catalog
+        self.bigquery_tools_enabled = (
+            bigquery_service is not None and settings.bigquery_tool_enabled
         )
-        
+        if self.bigquery_tools_enabled:
+            # Data access through the pooled in-process client; no bash needed
+            self.options = ClaudeCodeOptions(
+                system_prompt=SYSTEM_PROMPT + BIGQUERY_TOOLS_PROMPT,
+                max_turns=settings.claude_max_turns,
+                mcp_servers={
+                    SERVER_NAME: create_bigquery_server(
+                        bigquery_service, schema_catalog
+                    )
+                },
+                allowed_tools=ALLOWED_TOOLS,
+                permission_mode="auto",
+            )
+        else:
+            self.options = ClaudeCodeOptions(
+                system_prompt=SYSTEM_PROMPT,
+                max_turns=settings.claude_max_turns,
+                allowed_tools=["bash"],  # Only allow bash for bq commands
+                permission_mode="auto",
+            )
+        self._single_flight = SingleFlight("analysis", settings.claude_timeout)
+        self.scheduler = RunScheduler(
+            max_concurrent=settings.claude_max_concurrent_runs,
+            max_per_key=settings.claude_max_runs_per_session,
+            max_queue=settings.claude_max_queue_size,
+            queue_timeout=settings.claude_queue_timeout,
+        )
+        self.pool: Optional[ClaudeSessionPool] = None
+        if settings.claude_pool_enabled:
+            self.pool = ClaudeSessionPool(
+                options_factory=self._run_options,
+                size=settings.claude_pool_size,
+                max_parked=settings.claude_pool_max_parked,
+                max_runs=settings.claude_pool_max_runs,
+                max_rss_growth_mb=settings.claude_pool_max_rss_growth_mb,
+                idle_ttl=settings.claude_pool_idle_ttl,
+                health_interval=settings.claude_pool_health_interval,
+                start_timeout=settings.claude_pool_start_timeout,
+            )
+
     async def set_auth_tokens(
-        self, 
-        access_token: str, 
-        refresh_token: str, 
-        expires_at: int
+        self, access_token: str, refresh_token: str, expires_at: int
     ) -> bool:
         """Set authentication tokens for Claude Code."""
         return await self.auth_service.authenticate_with_tokens(
             access_token, refresh_token, expires_at
         )
 
+    async def start(self) -> None:
+        """Load shared credentials, start background refresh and the pool."""
+        await self.auth_service.start()
+        if self.pool is not None:
+            self.pool.start()
+
+    async def close(self) -> None:
+        """Release background resources."""
+        self._single_flight.close()
+        if self.pool is not None:
+            await self.pool.stop()
+        await self.auth_service.close()
+
+    def _run_options(self) -> ClaudeCodeOptions:
+        """Options for a run, carrying the current credentials."""
+        # Credentials go to the run only, never the process environment
+        return replace(
+            self.options,
+            env={**self.options.env, **self.auth_service.auth_env()},
+        )
+
+    async def _spawned_run(
+        self, prompt: str, session_id: str
+    ) -> AsyncIterator[Message]:
+        """Run a prompt on a Claude Code process started for this run.
+
+        The prompt is streamed rather than passed as a string: in string mode
+        the CLI's stdin is closed at start, and in-process MCP tool calls are
+        answered over stdin. The SDK closes stdin once the prompt stream
+        ends, so the stream stays open until the run's result arrives.
+        """
+        finished = asyncio.Event()
+
+        async def prompt_stream() -> AsyncIterator[Dict[str, Any]]:
+            yield {
+                "type": "user",
+                "message": {"role": "user", "content": prompt},
+                "parent_tool_use_id": None,
+                "session_id": session_id,
+            }
+            await finished.wait()
+
+        try:
+            async for message in query(
+                prompt=prompt_stream(), options=self._run_options()
+            ):
+                if isinstance(message, ResultMessage):
+                    finished.set()
+                yield message
+        finally:
+            finished.set()
+
+    @asynccontextmanager
+    async def _messages(
+        self, prompt: str, session_id: str
+    ) -> AsyncIterator[AsyncIterator[Message]]:
+        """Run a prompt on a pooled process, or spawn one for this run."""
+        if self.pool is None:
+            yield self._spawned_run(prompt, session_id)
+            return
+        # Pooled tool calls record their BigQuery jobs into this request
+        lease = self.pool.lease(session_id, contextvars.copy_context())
+        async with lease as session:
+            if session is None:
+                yield self._spawned_run(prompt, session_id)
+            else:
+                yield session.run(prompt)
+
     async def analyze_query(
-        self, query_text: str, session_id: str, context: Dict[str, Any]
+        self,
+        query_text: str,
+        session_id: str,
+        context: Dict[str, Any],
+        priority: str = "interactive",
+    ) -> Dict[str, Any]:
+        """Analyze user query and generate report components.
+
+        Identical concurrent requests share a single Claude Code run.
+        """
+        with metrics.timed("claude.analyze_query"):
+            if not settings.single_flight_enabled:
+                return await self._analyze(query_text, session_id, context, priority)
+
+            return await self._single_flight.do(
+                self._analysis_key(query_text, context),
+                lambda: self._analyze(query_text, session_id, context, priority),
+            )
+
+    def _analysis_key(self, query_text: str, context: Dict[str, Any]) -> str:
+        """Fingerprint a query and its context for request coalescing."""
+        material = json.dumps(
+            {
+                "query": normalize_query(query_text),
+                "context": context,
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def _analyze(
+        self,
+        query_text: str,
+        session_id: str,
+        context: Dict[str, Any],
+        priority: str,
     ) -> Dict[str, Any]:
-        """Analyze user query and generate report components."""
+        """Run the analysis and collect its components and metadata."""
+        components: List[Dict[str, Any]] = []
+        metadata: Dict[str, Any] = {}
+
+        async for event in self.stream_analysis(
+            query_text, session_id, context, priority
+        ):
+            if event["event"] == "component":
+                components.append(event["data"])
+            elif event["event"] == "metadata":
+                metadata = event["data"]
+
+        return {"components": components, "metadata": metadata}
+
+    async def stream_analysis(
+        self,
+        query_text: str,
+        session_id: str,
+        context: Dict[str, Any],
+        priority: str = "interactive",
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Analyze user query, yielding events as the agent works.
+
+        Yields ``progress`` events (start, tool calls, partial text), then one
+        ``component`` event per report component as soon as it is complete,
+        and a final ``metadata`` event. The transcript itself is not buffered.
+        The run waits for a scheduler slot first and raises
+        ``SchedulerBusyError`` if none is available.
+        """
         try:
             # Build context for Claude
             claude_context = self._build_context(query_text, context)
 
-            # Execute Claude Code
-            logger.info(f"Analyzing query with Claude: {query_text}")
-            
-            messages: List[Message] = []
-            result_text = ""
-            
-            async for message in query(
-                prompt=claude_context,
-                options=self.options
-            ):
-                messages.append(message)
-                if hasattr(message, 'content'):
-                    result_text += message.content
-            
+            parser = ComponentStreamParser()
+            run_info: Dict[str, Any] = {}
+            # In-process tool calls record their BigQuery jobs here
+            query_stats = start_query_stats()
+
+            async with self.scheduler.slot(session_id, priority):
+                # Execute Claude Code
+                logger.info(f"Analyzing query with Claude: {query_text}")
+                run_started = time.perf_counter()
+                first_message = True
+                # tool_use_id -> (tool name, call time)
+                pending_tools: Dict[str, Any] = {}
+                yield {"event": "progress", "data": {"stage": "started"}}
+                # No-op unless the token is inside its refresh window
+                await self.auth_service.get_valid_token()
+
+                async with self._messages(claude_context, session_id) as messages:
+                    async for message in messages:
+                        now = time.perf_counter()
+                        if first_message:
+                            first_message = False
+                            metrics.observe("claude.first_message", now - run_started)
+                        if isinstance(message, AssistantMessage):
+                            for block in message.content:
+                                if isinstance(block, TextBlock):
+                                    yield {
+                                        "event": "progress",
+                                        "data": {"stage": "text", "text": block.text},
+                                    }
+                                    for component in parser.feed(block.text):
+                                        yield {"event": "component", "data": component}
+                                elif isinstance(block, ToolUseBlock):
+                                    pending_tools[block.id] = (block.name, now)
+                                    yield {
+                                        "event": "progress",
+                                        "data": {
+                                            "stage": "tool_use",
+                                            "tool": block.name,
+                                            "command": (
+                                                block.input.get("command")
+                                                or block.input.get("sql")
+                                            ),
+                                        },
+                                    }
+                        elif isinstance(message, UserMessage) and pending_tools:
+                            for block in message.content:
+                                if isinstance(block, ToolResultBlock):
+                                    call = pending_tools.pop(block.tool_use_id, None)
+                                    if call is not None:
+                                        metrics.observe_tool_call(
+                                            call[0], now - call[1]
+                                        )
+                        elif isinstance(message, ResultMessage):
+                            run_info = {
+                                "duration_ms": message.duration_ms,
+                                "num_turns": message.num_turns,
+                                "prompt_tokens_estimate": estimate_tokens(
+                                    claude_context
+                                ),
+                            }
+                metrics.observe("claude.total", time.perf_counter() - run_started)
+
             # Parse JSON response from Claude
             try:
-                # Extract JSON from the response
-                result = self._extract_json_from_response(result_text)
-                
-                # Validate the response structure
-                if "components" not in result:
-                    raise ValueError("Invalid response: missing 'components' field")
-                
-                return result
-                
+                result = parser.close()
+                # Every component of the accepted report was streamed by feed;
+                # counting across candidates would skip the report's own ones
+                remaining = []
             except json.JSONDecodeError as e:
                 logger.error(f"Failed to parse Claude response: {e}")
                 # Return a fallback response
-                return self._create_error_response(
+                result = self._create_error_response(
                     "JSONのパースに失敗しました。もう一度お試しください。"
                 )
+                remaining = result["components"]
+
+            for component in remaining:
+                yield {"event": "component", "data": component}
+            if query_stats:
+                run_info["bigquery"] = summarize_query_stats(query_stats)
+            yield {
+                "event": "metadata",
+                "data": {**(result.get("metadata") or {}), **run_info},
+            }
 
         except Exception as e:
             logger.error(f"Error in Claude analysis: {str(e)}")
@@ -85,30 +343,37 @@ class ClaudeService:
 
     def _build_context(self, query_text: str, context: Dict[str, Any]) -> str:
         """Build context string for Claude."""
+        schema_digest = ""
+        if self.schema_catalog is not None and settings.schema_catalog_enabled:
+            schema_digest = self.schema_catalog.render_digest(query_text)
+
+        schema_tool = (
+            "get_table_schemaツール" if self.bigquery_tools_enabled else "bqコマンド"
+        )
+        if schema_digest:
+            schema_instruction = f"""以下のスキーマ情報を使ってSQLクエリを構築してください。
+ここにないテーブルや列が必要な場合のみ、{schema_tool}でスキーマを確認してください。
+
+{schema_digest}"""
+        else:
+            schema_instruction = f"""まず、必要なテーブルのスキーマを{schema_tool}で確認してから、
+適切なSQLクエリを構築してください。"""
+
+        context = dict(context)
+        history = context.pop("conversation_history", "")
+        history_section = f"これまでの会話:\n{history}\n" if history else ""
+
         return f"""
+{history_section}
 ユーザーの質問: {query_text}
 
-まず、必要なテーブルのスキーマをbqコマンドで確認してから、
-適切なSQLクエリを構築してください。
+{schema_instruction}
 
 追加コンテキスト: {json.dumps(context, ensure_ascii=False)}
 
 必ず指定されたJSON形式でレスポンスを返してください。
 """
-    
-    def _extract_json_from_response(self, text: str) -> Dict[str, Any]:
-        """Extract JSON from Claude's response."""
-        # Try to find JSON in the response
-        import re
-        
-        # Look for JSON block
-        json_match = re.search(r'```json\s*({.*?})\s*```', text, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group(1))
-        
-        # Try to parse the entire response as JSON
-        return json.loads(text)
-    
+
     def _create_error_response(self, error_message: str) -> Dict[str, Any]:
         """Create an error response."""
         return {
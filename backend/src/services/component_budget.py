@@ -0,0 +1,267 @@
+"""Per-component payload budgets for generated reports."""
+
+import logging
+import re
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import redis.asyncio as redis
+
+from src.config import settings
+from src.services.query_cache import decode_entry, encode_entry
+from src.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+OTHER_LABEL = "その他"
+
+_DATE_LIKE = re.compile(r"^\d{4}-\d{2}(-\d{2})?")
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Pick ``threshold`` indices that preserve the shape of a series.
+
+    Largest-Triangle-Three-Buckets, vectorized: every bucket is scored at once
+    against the means of its neighbouring buckets (rather than the point
+    chosen in the previous bucket), which keeps peaks and troughs while
+    avoiding a Python loop. The first and last points are always kept.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # threshold - 2 buckets over the interior points 1 .. n - 2
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    sizes = ends - starts
+
+    x_sums = np.concatenate(([0.0], np.cumsum(x)))
+    y_sums = np.concatenate(([0.0], np.cumsum(y)))
+    x_means = (x_sums[ends] - x_sums[starts]) / sizes
+    y_means = (y_sums[ends] - y_sums[starts]) / sizes
+    # Previous and next anchors; the outer buckets use the end points
+    prev_x = np.concatenate(([x[0]], x_means[:-1]))
+    prev_y = np.concatenate(([y[0]], y_means[:-1]))
+    next_x = np.concatenate((x_means[1:], [x[-1]]))
+    next_y = np.concatenate((y_means[1:], [y[-1]]))
+
+    offsets = np.arange(sizes.max())
+    candidates = starts[:, None] + offsets[None, :]
+    valid = offsets[None, :] < sizes[:, None]
+    candidates = np.where(valid, candidates, starts[:, None])
+
+    cx, cy = x[candidates], y[candidates]
+    area = np.abs(
+        (prev_x[:, None] - next_x[:, None]) * (cy - prev_y[:, None])
+        - (prev_x[:, None] - cx) * (next_y[:, None] - prev_y[:, None])
+    )
+    area = np.where(valid, np.nan_to_num(area, nan=-1.0), -np.inf)
+    chosen = candidates[np.arange(len(starts)), area.argmax(axis=1)]
+    return np.concatenate(([0], chosen, [n - 1]))
+
+
+def _numeric(data: Sequence[Dict[str, Any]], key: str) -> Optional[np.ndarray]:
+    """Get a column as floats (missing values as NaN); None if not numeric."""
+    try:
+        return np.array([row.get(key) for row in data], dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+
+
+def _series_keys(component: Dict[str, Any]) -> List[str]:
+    """Get the value keys plotted by a chart component."""
+    props = component["props"]
+    series = props.get("lines") or props.get("bars") or []
+    return [s["dataKey"] for s in series if isinstance(s, dict) and "dataKey" in s]
+
+
+def downsample_series(
+    data: List[Dict[str, Any]], value_keys: List[str], max_points: int
+) -> List[Dict[str, Any]]:
+    """Downsample rows of a multi-series chart to about ``max_points``.
+
+    Each series gets an equal share of the budget; the union of the points
+    they keep is returned in the original order.
+    """
+    per_series = max(3, max_points // max(1, len(value_keys)))
+    x = np.arange(len(data), dtype=np.float64)
+    keep = np.zeros(len(data), dtype=bool)
+    for key in value_keys:
+        y = _numeric(data, key)
+        if y is None:
+            continue
+        keep[lttb_indices(x, np.nan_to_num(y), per_series)] = True
+    if not keep.any():
+        # Nothing numeric to shape by; fall back to an even stride
+        keep[np.linspace(0, len(data) - 1, max_points).astype(np.int64)] = True
+    return [data[i] for i in np.flatnonzero(keep)]
+
+
+def top_n_with_other(
+    data: List[Dict[str, Any]],
+    name_key: str,
+    value_keys: List[str],
+    max_categories: int,
+) -> List[Dict[str, Any]]:
+    """Keep the largest categories and sum the rest into one "other" row.
+
+    Categories are ranked by the first value key; every value key is summed.
+    """
+    ranking = _numeric(data, value_keys[0])
+    if ranking is None:
+        return data[:max_categories]
+
+    # Descending; missing values rank last
+    order = np.argsort(np.nan_to_num(-ranking, nan=np.inf), kind="stable")
+    top, rest = order[: max_categories - 1], order[max_categories - 1 :]
+    other: Dict[str, Any] = {name_key: OTHER_LABEL}
+    for key in value_keys:
+        values = _numeric(data, key)
+        if values is not None:
+            total = np.nansum(values[rest])
+            other[key] = int(total) if float(total).is_integer() else float(total)
+    return [data[i] for i in top] + [other]
+
+
+class ComponentBudget:
+    """Enforce size budgets on report components after analysis.
+
+    Line series (and bar charts over dates) are downsampled with LTTB,
+    categorical pie/bar charts keep the top N plus an "other" slice, and
+    tables return their first page with a cursor; the remaining pages are kept
+    in Redis for ``GET /tables/{table_id}``.
+    """
+
+    def __init__(self):
+        """Initialize component budget."""
+        self.redis_client = None
+
+    async def _get_redis(self) -> redis.Redis:
+        """Get Redis client."""
+        if not self.redis_client:
+            self.redis_client = get_redis(decode_responses=False)
+        return self.redis_client
+
+    async def apply(
+        self, component: Dict[str, Any], table_ttl: Optional[int] = None
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """Fit a component to its budget.
+
+        Returns the (possibly new) component and, if it was reduced, a record
+        of the original and returned row counts. The input is not modified.
+        Further table pages are kept for ``table_ttl`` seconds (default
+        ``component_table_ttl``); results stored longer pass their own TTL.
+        """
+        props = component.get("props") or {}
+        data = props.get("data")
+        if not isinstance(data, list) or not data or not isinstance(data[0], dict):
+            return component, None
+
+        component_type = component.get("type")
+        rows = len(data)
+        method = None
+        extra: Dict[str, Any] = {}
+        x_key = props.get("xAxis", "date")
+        is_series = component_type == "LineChart" or (
+            component_type == "BarChart"
+            and isinstance(data[0].get(x_key), str)
+            and _DATE_LIKE.match(data[0][x_key])
+        )
+
+        if is_series:
+            if rows > settings.component_max_series_points:
+                data = downsample_series(
+                    data, _series_keys(component), settings.component_max_series_points
+                )
+                method = "lttb"
+        elif component_type == "BarChart" and rows > settings.component_max_categories:
+            value_keys = _series_keys(component)
+            if value_keys:
+                data = top_n_with_other(
+                    data, x_key, value_keys, settings.component_max_categories
+                )
+                method = "top_n"
+        elif component_type == "PieChart" and rows > settings.component_max_categories:
+            data = top_n_with_other(
+                data,
+                props.get("nameKey", "name"),
+                [props.get("dataKey", "value")],
+                settings.component_max_categories,
+            )
+            method = "top_n"
+        elif component_type == "Table" and rows > settings.component_table_page_size:
+            extra["pagination"] = await self._paginate(data, table_ttl)
+            data = data[: settings.component_table_page_size]
+            method = "paginated"
+
+        if method is None:
+            return component, None
+
+        new_props = {**props, "data": data, **extra}
+        return (
+            {**component, "props": new_props},
+            {
+                "type": component_type,
+                "method": method,
+                "original_rows": rows,
+                "returned_rows": len(data),
+            },
+        )
+
+    async def apply_all(
+        self, components: List[Dict[str, Any]], table_ttl: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Fit every component to its budget; returns components and records."""
+        results: List[Dict[str, Any]] = []
+        reduced: List[Dict[str, Any]] = []
+        for index, component in enumerate(components):
+            component, info = await self.apply(component, table_ttl)
+            results.append(component)
+            if info is not None:
+                reduced.append({"index": index, **info})
+        return results, reduced
+
+    async def _paginate(
+        self, data: List[Dict[str, Any]], ttl: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Store a table's pages after the first; return its pagination props."""
+        page_size = settings.component_table_page_size
+        table_id = uuid.uuid4().hex
+        pages = [
+            encode_entry({"rows": data[offset : offset + page_size]})
+            for offset in range(0, len(data), page_size)
+        ]
+        pagination = {
+            "tableId": table_id,
+            "pageSize": page_size,
+            "totalRows": len(data),
+            "nextCursor": "1",
+        }
+        try:
+            client = await self._get_redis()
+            key = f"table_pages:{table_id}"
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.rpush(key, *pages)
+                pipe.expire(key, ttl or settings.component_table_ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error storing table pages: {str(e)}")
+            pagination["nextCursor"] = None
+        return pagination
+
+    async def get_page(self, table_id: str, cursor: str) -> Optional[Dict[str, Any]]:
+        """Get one page of a paginated table; None if unknown or expired."""
+        page = int(cursor)
+        client = await self._get_redis()
+        key = f"table_pages:{table_id}"
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.lindex(key, page)
+            pipe.llen(key)
+            payload, page_count = await pipe.execute()
+        if payload is None:
+            return None
+        return {
+            "data": decode_entry(payload)["rows"],
+            "nextCursor": str(page + 1) if page + 1 < page_count else None,
+        }
@@ -0,0 +1,198 @@
+"""Incremental parser for report components in Claude's streamed response."""
+
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+COMPONENT_TYPES = ("LineChart", "BarChart", "PieChart", "Summary", "Table", "Metric")
+
+# Characters that matter inside a JSON string, and outside of one. A backtick
+# can never appear in JSON outside a string, so it marks a bogus candidate.
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRUCTURAL = re.compile(r'[{}\[\]"`]')
+
+
+def validate_component(component: Any) -> bool:
+    """Check a component against the report component schema."""
+    return (
+        isinstance(component, dict)
+        and component.get("type") in COMPONENT_TYPES
+        and isinstance(component.get("props"), dict)
+    )
+
+
+class ComponentStreamParser:
+    """Find the report JSON document in a text stream, chunk by chunk.
+
+    The document may be fenced (```json ... ```) or bare, and may be preceded
+    by prose. Each element of ``components`` is returned from ``feed`` as soon
+    as its closing brace arrives, and its text is dropped from the buffer, so
+    memory stays proportional to the largest single component. The document
+    returned by ``close`` holds exactly the components streamed for it; those
+    of an abandoned candidate are not carried over.
+    """
+
+    def __init__(self):
+        """Initialize parser state."""
+        self.components: List[Dict[str, Any]] = []
+        self.document: Optional[Dict[str, Any]] = None
+        self._buffer = ""
+        self._pos = 0
+        self._reset_candidate()
+
+    def _reset_candidate(self) -> None:
+        """Forget the current candidate document."""
+        self._in_document = False
+        self._stack: List[str] = []
+        self._in_string = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._last_string_end = 0
+        self._array_start: Optional[int] = None
+        self._array_open = False
+        self._element_start: Optional[int] = None
+
+    def _abandon_candidate(self) -> None:
+        """Drop a candidate that is not the report and rescan after its ``{``."""
+        self._buffer = self._buffer[1:]
+        self._pos = 0
+        self.components = []
+        self._reset_candidate()
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume a chunk of text and return newly completed components."""
+        if self.document is not None:
+            return []
+        self._buffer += chunk
+        return self._scan()
+
+    def close(self) -> Dict[str, Any]:
+        """Return the parsed document once the stream has ended."""
+        if self.document is None:
+            raise json.JSONDecodeError(
+                "No report JSON document found in response", self._buffer, 0
+            )
+        return self.document
+
+    def _scan(self) -> List[Dict[str, Any]]:
+        """Scan the unread part of the buffer."""
+        completed: List[Dict[str, Any]] = []
+
+        while self.document is None:
+            if not self._in_document:
+                start = self._buffer.find("{", self._pos)
+                if start < 0:
+                    # Prose before the document is not needed
+                    self._buffer = ""
+                    self._pos = 0
+                    break
+                self._buffer = self._buffer[start:]
+                self._pos = 1
+                self._stack = ["{"]
+                self._in_document = True
+                continue
+
+            if self._in_string:
+                match = _STRING_SPECIAL.search(self._buffer, self._pos)
+                if match is None:
+                    self._pos = len(self._buffer)
+                    break
+                if match.group() == "\\":
+                    if match.end() >= len(self._buffer):
+                        # Escape split across chunks; wait for the next one
+                        self._pos = match.start()
+                        break
+                    self._pos = match.end() + 1
+                    continue
+                self._in_string = False
+                self._pos = match.end()
+                if len(self._stack) == 1:
+                    self._last_string = self._buffer[self._string_start : self._pos]
+                    self._last_string_end = self._pos
+                continue
+
+            match = _STRUCTURAL.search(self._buffer, self._pos)
+            if match is None:
+                self._pos = len(self._buffer)
+                break
+            char = match.group()
+            index = match.start()
+            self._pos = match.end()
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in "{[":
+                if (
+                    char == "["
+                    and len(self._stack) == 1
+                    and self._is_components_key(index)
+                ):
+                    self._array_start = index
+                    self._array_open = True
+                elif char == "{" and len(self._stack) == 2 and self._array_open:
+                    self._element_start = index
+                self._stack.append(char)
+            elif char in "}]":
+                if self._stack[-1] != ("{" if char == "}" else "["):
+                    self._abandon_candidate()
+                    continue
+                self._stack.pop()
+                if len(self._stack) == 2 and self._element_start is not None:
+                    component = self._complete_element(index)
+                    if component is not None:
+                        completed.append(component)
+                elif len(self._stack) == 1 and self._array_open:
+                    self._array_open = False
+                elif not self._stack:
+                    self._complete_document(index)
+            else:
+                self._abandon_candidate()
+
+        return completed
+
+    def _is_components_key(self, index: int) -> bool:
+        """Check whether the array opening at ``index`` is ``"components": [``."""
+        return (
+            self._last_string == '"components"'
+            and self._buffer[self._last_string_end : index].strip() == ":"
+        )
+
+    def _complete_element(self, end: int) -> Optional[Dict[str, Any]]:
+        """Parse a finished ``components`` element and drop its text."""
+        text = self._buffer[self._element_start : end + 1]
+        # Keep only "[" so the final document parses with an empty array
+        self._buffer = self._buffer[: self._array_start + 1] + self._buffer[end + 1 :]
+        self._pos = self._array_start + 1
+        self._element_start = None
+
+        try:
+            component = json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping unparsable component: {e}")
+            return None
+        if not validate_component(component):
+            logger.warning(f"Skipping invalid component: {str(component)[:200]}")
+            return None
+
+        self.components.append(component)
+        return component
+
+    def _complete_document(self, end: int) -> None:
+        """Accept the candidate if it is the report document."""
+        try:
+            document = json.loads(self._buffer[: end + 1])
+        except json.JSONDecodeError:
+            document = None
+
+        if not isinstance(document, dict) or self._array_start is None:
+            self._abandon_candidate()
+            return
+
+        document["components"] = self.components
+        self.document = document
+        self._buffer = ""
+        self._pos = 0
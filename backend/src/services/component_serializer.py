@@ -0,0 +1,193 @@
+"""Serialize columnar query results into report component JSON."""
+
+import json
+from json.encoder import encode_basestring
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+try:
+    import pyarrow
+    import pyarrow.compute as pc
+except ImportError:  # Optional: pip install growth-force-backend[columnar]
+    pyarrow = None
+
+# Column name -> values, as returned by BigQueryService.execute_query_columnar:
+# Arrow arrays when fetched with pyarrow, lists otherwise (or from the cache)
+Columns = Mapping[str, Sequence[Any]]
+
+DATA_COMPONENT_TYPES = ("LineChart", "BarChart", "PieChart", "Table")
+
+# Same palette as the frontend chart components
+DEFAULT_COLORS = [
+    "#8884d8",
+    "#82ca9d",
+    "#ffc658",
+    "#ff7c7c",
+    "#8dd1e1",
+    "#d084d0",
+    "#ffb347",
+    "#67b7dc",
+]
+
+# Rows encoded together by records_json
+RECORD_BATCH_ROWS = 50_000
+
+_encode = json.JSONEncoder(ensure_ascii=False, default=str).encode
+
+
+def _is_arrow(column: Sequence[Any]) -> bool:
+    """Check whether a column is an Arrow array."""
+    return pyarrow is not None and isinstance(
+        column, (pyarrow.Array, pyarrow.ChunkedArray)
+    )
+
+
+def take_rows(columns: Columns, indices: List[int]) -> Dict[str, List[Any]]:
+    """Get some rows of each column, converting only those to Python objects."""
+    return {
+        name: (
+            column.take(indices).to_pylist()
+            if _is_arrow(column)
+            else [column[index] for index in indices]
+        )
+        for name, column in columns.items()
+    }
+
+
+def to_records(columns: Columns) -> List[Dict[str, Any]]:
+    """Turn columns into row dicts, for callers that need rows."""
+    if columns and all(map(_is_arrow, columns.values())):
+        # Arrow builds the dicts in C++ without intermediate lists
+        return pyarrow.table(dict(columns)).to_pylist()
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def build_props(
+    component_type: str,
+    columns: Columns,
+    x_key: Optional[str] = None,
+    value_keys: Optional[List[str]] = None,
+    title: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Build the non-data props of a component from column names.
+
+    ``x_key`` defaults to the first column and ``value_keys`` to the rest.
+    """
+    if component_type not in DATA_COMPONENT_TYPES:
+        raise ValueError(f"Component type {component_type} has no data props")
+
+    keys = list(columns)
+    if not keys:
+        raise ValueError("Cannot build component props without columns")
+    x_key = x_key or keys[0]
+    value_keys = value_keys or [key for key in keys if key != x_key]
+
+    props: Dict[str, Any] = {}
+    if title:
+        props["title"] = title
+
+    if component_type == "Table":
+        props["columns"] = keys
+    elif component_type == "PieChart":
+        props["nameKey"] = x_key
+        props["dataKey"] = value_keys[0]
+    else:
+        series = [
+            {
+                "dataKey": key,
+                "name": key,
+                "color": DEFAULT_COLORS[idx % len(DEFAULT_COLORS)],
+            }
+            for idx, key in enumerate(value_keys)
+        ]
+        props["xAxis"] = x_key
+        props["lines" if component_type == "LineChart" else "bars"] = series
+
+    return props
+
+
+def _encode_column(column: Sequence[Any]) -> List[str]:
+    """JSON-encode each value of a column.
+
+    Arrow numbers, booleans and dates are formatted by Arrow in one pass, and
+    strings by the C string encoder; anything else goes value by value.
+    """
+    if not _is_arrow(column):
+        return list(map(_encode, column))
+
+    kind = column.type
+    if pyarrow.types.is_string(kind) or pyarrow.types.is_large_string(kind):
+        return [
+            "null" if value is None else encode_basestring(value)
+            for value in column.to_pylist()
+        ]
+    if pyarrow.types.is_date32(kind):
+        # ISO dates, as str() gives them
+        text = pc.binary_join_element_wise(
+            '"', pc.cast(column, pyarrow.string()), '"', ""
+        )
+    elif (
+        pyarrow.types.is_integer(kind)
+        or pyarrow.types.is_boolean(kind)
+        or (
+            pyarrow.types.is_floating(kind)
+            # NaN and infinities are left to the JSON encoder
+            and pc.all(pc.is_finite(column)).as_py() is not False
+        )
+    ):
+        text = pc.cast(column, pyarrow.string())
+    else:
+        return list(map(_encode, column.to_pylist()))
+    return pc.fill_null(text, "null").to_pylist()
+
+
+def records_json(columns: Columns, keys: Optional[List[str]] = None) -> str:
+    """Render columns as a JSON array of row objects.
+
+    Values are encoded column by column and joined row-wise, so no dict is
+    built per row. Rows are encoded in batches, so only one batch of
+    encoded values is held at a time besides the output.
+    """
+    keys = keys or list(columns)
+    encoded_keys = [_encode(key) + ":" for key in keys]
+    total = len(columns[keys[0]]) if keys else 0
+    batches = []
+    for start in range(0, total, RECORD_BATCH_ROWS):
+        encoded_columns = [
+            _encode_column(columns[key][start : start + RECORD_BATCH_ROWS])
+            for key in keys
+        ]
+        batches.append(
+            ",".join(
+                "{" + ",".join(map(str.__add__, encoded_keys, values)) + "}"
+                for values in zip(*encoded_columns)
+            )
+        )
+    return "[" + ",".join(batches) + "]"
+
+
+def serialize_component(
+    component_type: str,
+    columns: Columns,
+    x_key: Optional[str] = None,
+    value_keys: Optional[List[str]] = None,
+    title: Optional[str] = None,
+) -> str:
+    """Serialize columns straight into a ``{type, props}`` component JSON."""
+    props = build_props(component_type, columns, x_key, value_keys, title)
+    if component_type == "Table":
+        data_keys = props["columns"]
+    elif component_type == "PieChart":
+        data_keys = [props["nameKey"], props["dataKey"]]
+    else:
+        data_keys = [props["xAxis"]] + [
+            series["dataKey"] for series in props.get("lines", props.get("bars", []))
+        ]
+
+    props_json = _encode(props)
+    data_json = records_json(columns, data_keys)
+    separator = "," if props else ""
+    return (
+        f'{{"type":{_encode(component_type)},"props":'
+        f'{props_json[:-1]}{separator}"data":{data_json}}}}}'
+    )
@@ -0,0 +1,190 @@
+"""Bounded conversation history for follow-up questions."""
+
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+
+from src.config import settings
+from src.services.redis_client import get_redis
+from src.services.schema_catalog import estimate_tokens
+from src.services.session_service import decode_session, encode_session
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _clip(text: Any, limit: int) -> str:
+    """Collapse whitespace and cut text to ``limit`` characters."""
+    text = _WHITESPACE.sub(" ", str(text or "")).strip()
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def extract_key_results(components: List[Dict[str, Any]], limit: int = 5) -> List[str]:
+    """Pick the headline figures of a report for later turns."""
+    results: List[str] = []
+    for component in components:
+        props = component.get("props") or {}
+        if component.get("type") == "Metric":
+            label = props.get("label") or props.get("title")
+            results.append(f"{label}: {props.get('value')}")
+        elif component.get("type") == "Summary":
+            results.append(_clip(props.get("text"), 120))
+        elif props.get("title"):
+            results.append(f"{component.get('type')}「{props['title']}」")
+        if len(results) >= limit:
+            break
+    return results
+
+
+class ConversationMemory:
+    """Per-session conversation turns with incremental summarization.
+
+    Turns are appended to a Redis list and never rewritten. Recent turns are
+    rendered in detail (query, SQL, period, key results) within a token
+    budget; whenever a new turn pushes them over it, the oldest detailed turns
+    are folded into one-line summaries, and the oldest summaries are dropped
+    once they exceed their own budget. The history in the prompt therefore
+    stays bounded however long the chat runs, and each append only summarizes
+    the turns it displaced.
+    """
+
+    def __init__(self):
+        """Initialize conversation memory."""
+        self.redis_client = None
+        self.ttl = settings.session_ttl
+
+    async def _get_redis(self) -> redis.Redis:
+        """Get Redis client."""
+        if not self.redis_client:
+            self.redis_client = get_redis(decode_responses=False)
+        return self.redis_client
+
+    @staticmethod
+    def _turns_key(session_id: str) -> str:
+        """Get the Redis key of a session's turn list."""
+        return f"conversation:{session_id}:turns"
+
+    @staticmethod
+    def _state_key(session_id: str) -> str:
+        """Get the Redis key of a session's summary state."""
+        return f"conversation:{session_id}:state"
+
+    @staticmethod
+    def _render_turn(number: int, turn: Dict[str, Any]) -> str:
+        """Render a recent turn in detail."""
+        lines = [f"[質問{number}] {_clip(turn['query'], 200)}"]
+        if turn.get("sql"):
+            lines.append(f"SQL: {_clip(turn['sql'], 400)}")
+        if turn.get("data_range"):
+            lines.append(f"期間: {_clip(turn['data_range'], 60)}")
+        if turn.get("key_results"):
+            lines.append("結果: " + "; ".join(turn["key_results"]))
+        return "\n".join(lines)
+
+    @staticmethod
+    def _summarize_turn(number: int, turn: Dict[str, Any]) -> str:
+        """Compact an older turn into one line."""
+        line = f"[質問{number}] {_clip(turn['query'], 80)}"
+        if turn.get("sql"):
+            line += f" / SQL: {_clip(turn['sql'], 120)}"
+        if turn.get("key_results"):
+            line += " → " + "; ".join(_clip(r, 60) for r in turn["key_results"][:2])
+        return line
+
+    async def _load(
+        self, client: redis.Redis, session_id: str
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Load the summary state and the not-yet-summarized turns."""
+        payload = await client.get(self._state_key(session_id))
+        state = (
+            decode_session(payload)
+            if payload
+            else {"summary": [], "summarized": 0, "dropped": 0}
+        )
+        raw = await client.lrange(self._turns_key(session_id), state["summarized"], -1)
+        return state, [decode_session(item) for item in raw]
+
+    async def append_turn(
+        self,
+        session_id: str,
+        query_text: str,
+        components: List[Dict[str, Any]],
+        metadata: Dict[str, Any],
+        history_tokens: int = 0,
+    ) -> None:
+        """Record a finished turn and compact older turns if over budget."""
+        turn = {
+            "query": query_text,
+            "sql": metadata.get("query_executed"),
+            "data_range": metadata.get("data_range"),
+            "key_results": extract_key_results(components),
+            "prompt_tokens": metadata.get("prompt_tokens_estimate"),
+            "history_tokens": history_tokens,
+            "created_at": time.time(),
+        }
+        try:
+            client = await self._get_redis()
+            state, recent = await self._load(client, session_id)
+            recent.append(turn)
+            first = state["summarized"] + 1
+            rendered = [self._render_turn(first + i, t) for i, t in enumerate(recent)]
+            # Keep at least the latest turn in detail
+            while (
+                len(recent) > 1
+                and estimate_tokens("\n".join(rendered))
+                > settings.conversation_recent_token_budget
+            ):
+                state["summary"].append(
+                    self._summarize_turn(state["summarized"] + 1, recent.pop(0))
+                )
+                rendered.pop(0)
+                state["summarized"] += 1
+            while (
+                len(state["summary"]) > 1
+                and estimate_tokens("\n".join(state["summary"]))
+                > settings.conversation_summary_token_budget
+            ):
+                state["summary"].pop(0)
+                state["dropped"] += 1
+
+            # The turn and the state it was summarized into land together
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.rpush(self._turns_key(session_id), encode_session(turn))
+                pipe.expire(self._turns_key(session_id), self.ttl)
+                pipe.set(
+                    self._state_key(session_id), encode_session(state), ex=self.ttl
+                )
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error appending conversation turn: {str(e)}")
+
+    async def render(self, session_id: str) -> str:
+        """Render the bounded history for the next prompt; empty if none."""
+        try:
+            client = await self._get_redis()
+            state, recent = await self._load(client, session_id)
+        except Exception as e:
+            logger.error(f"Error loading conversation: {str(e)}")
+            return ""
+
+        lines: List[str] = []
+        if state["dropped"]:
+            lines.append(f"（それ以前の{state['dropped']}件の質問は省略）")
+        lines.extend(state["summary"])
+        first = state["summarized"] + 1
+        lines.extend(self._render_turn(first + i, t) for i, t in enumerate(recent))
+        return "\n".join(lines)
+
+    async def get_turns(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Get all stored turns, including prompt size per turn."""
+        try:
+            client = await self._get_redis()
+            raw = await client.lrange(self._turns_key(session_id), 0, -1)
+        except Exception as e:
+            logger.error(f"Error getting conversation turns: {str(e)}")
+            return None
+        return [decode_session(item) for item in raw]
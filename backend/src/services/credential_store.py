@@ -0,0 +1,183 @@
+"""Shared, encrypted store for Claude subscription credentials."""
+
+import asyncio
+import base64
+import json
+import logging
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import redis.asyncio as redis
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from src.config import settings
+from src.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CREDENTIALS_KEY = "claude:credentials"
+CHANNEL = "claude:credentials:events"
+REFRESH_LOCK_KEY = "claude:credentials:refresh_lock"
+
+# Delete the lock only if we still own it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass(frozen=True)
+class ClaudeCredentials:
+    """Subscription tokens for Claude Code."""
+
+    access_token: str
+    refresh_token: str
+    expires_at: int
+
+
+def _build_fernet() -> Fernet:
+    """Build the cipher from the configured key, or derive one.
+
+    Without ``credential_encryption_key`` the key is derived from
+    ``claude_api_key``, a secret every worker already shares.
+    """
+    if settings.credential_encryption_key:
+        return Fernet(settings.credential_encryption_key)
+    if not settings.claude_api_key:
+        raise ValueError(
+            "Set CREDENTIAL_ENCRYPTION_KEY or CLAUDE_API_KEY to store Claude credentials"
+        )
+    derived = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"growth-force claude credentials",
+    ).derive(settings.claude_api_key.encode("utf-8"))
+    return Fernet(base64.urlsafe_b64encode(derived))
+
+
+class CredentialStore:
+    """Claude credentials in Redis, encrypted at rest, hot in every worker.
+
+    Writes go to Redis and are announced on a pub/sub channel (the message
+    carries no secret); every worker reloads its in-memory copy when told,
+    and at ``credential_reload_interval`` in case a message was missed.
+    Readers use ``current`` and never touch Redis.
+    """
+
+    def __init__(self):
+        """Initialize credential store."""
+        self.redis_client = None
+        self._fernet = _build_fernet()
+        self._current: Optional[ClaudeCredentials] = None
+        self._listen_task: Optional[asyncio.Task] = None
+        self.changed = asyncio.Event()
+
+    async def _get_redis(self) -> redis.Redis:
+        """Get Redis client."""
+        if not self.redis_client:
+            self.redis_client = get_redis()
+        return self.redis_client
+
+    @property
+    def current(self) -> Optional[ClaudeCredentials]:
+        """The in-memory copy of the credentials."""
+        return self._current
+
+    def _encrypt(self, credentials: ClaudeCredentials) -> str:
+        """Encrypt credentials for storage."""
+        payload = json.dumps(asdict(credentials)).encode("utf-8")
+        return self._fernet.encrypt(payload).decode("ascii")
+
+    def _decrypt(self, token: str) -> ClaudeCredentials:
+        """Decrypt stored credentials."""
+        payload = self._fernet.decrypt(token.encode("ascii"))
+        return ClaudeCredentials(**json.loads(payload))
+
+    def _replace(self, credentials: Optional[ClaudeCredentials]) -> None:
+        """Swap the in-memory copy and wake anyone waiting for a change."""
+        if credentials != self._current:
+            self._current = credentials
+            self.changed.set()
+
+    async def load(self) -> Optional[ClaudeCredentials]:
+        """Reload the in-memory copy from Redis."""
+        try:
+            client = await self._get_redis()
+            token = await client.get(CREDENTIALS_KEY)
+            self._replace(self._decrypt(token) if token else None)
+        except InvalidToken:
+            logger.error("Stored Claude credentials cannot be decrypted")
+        except Exception as e:
+            logger.error(f"Failed to load Claude credentials: {str(e)}")
+        return self._current
+
+    async def save(self, credentials: ClaudeCredentials) -> None:
+        """Store credentials and notify all workers."""
+        client = await self._get_redis()
+        await client.set(CREDENTIALS_KEY, self._encrypt(credentials))
+        await client.publish(CHANNEL, "updated")
+        self._replace(credentials)
+
+    async def acquire_refresh_lock(self, ttl: int) -> Optional[str]:
+        """Elect one worker to refresh; returns a token to release with."""
+        client = await self._get_redis()
+        token = uuid.uuid4().hex
+        if await client.set(REFRESH_LOCK_KEY, token, nx=True, ex=ttl):
+            return token
+        return None
+
+    async def release_refresh_lock(self, token: str) -> None:
+        """Release the refresh lock if this worker still holds it."""
+        try:
+            client = await self._get_redis()
+            await client.eval(_RELEASE_LOCK_SCRIPT, 1, REFRESH_LOCK_KEY, token)
+        except Exception as e:
+            logger.error(f"Failed to release refresh lock: {str(e)}")
+
+    async def _listen(self) -> None:
+        """Reload on change notifications, and periodically as a backstop."""
+        while True:
+            pubsub = None
+            try:
+                client = await self._get_redis()
+                pubsub = client.pubsub()
+                await pubsub.subscribe(CHANNEL)
+                # Subscribed first, so no update between load and listen is lost
+                await self.load()
+                while True:
+                    # A message or the timeout: either way, reload
+                    await pubsub.get_message(
+                        ignore_subscribe_messages=True,
+                        timeout=settings.credential_reload_interval,
+                    )
+                    await self.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Credential listener failed: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    await pubsub.aclose()
+
+    async def start(self) -> None:
+        """Load the credentials and follow changes from other workers."""
+        if self._listen_task is None:
+            await self.load()
+            self._listen_task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Stop following changes."""
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            try:
+                await self._listen_task
+            except asyncio.CancelledError:
+                pass
+            self._listen_task = None
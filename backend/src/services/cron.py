@@ -0,0 +1,82 @@
+"""Five-field cron expressions."""
+
+import datetime
+from typing import List, Set
+
+
+def _parse_field(field: str, low: int, high: int) -> Set[int]:
+    """Parse one field: ``*``, ``5``, ``1-5``, ``*/15``, ``0-30/10`` or lists."""
+    values: Set[int] = set()
+    for part in field.split(","):
+        part, _, step_text = part.partition("/")
+        step = int(step_text) if step_text else 1
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = int(part)
+            end = high if step_text else start
+        if step < 1 or not low <= start <= end <= high:
+            raise ValueError(f"Invalid cron field: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """A cron schedule: ``minute hour day-of-month month day-of-week``.
+
+    Day of week runs from 0 (Sunday) to 6, with 7 also meaning Sunday. As in
+    cron, when both day fields are restricted a day matching either fires.
+    Times are wall-clock in the timezone of the datetimes passed in.
+    """
+
+    def __init__(self, expression: str):
+        """Parse a cron expression; raises ``ValueError`` if invalid."""
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes: List[int] = sorted(_parse_field(fields[0], 0, 59))
+        self.hours: List[int] = sorted(_parse_field(fields[1], 0, 23))
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12)
+        self.weekdays = {day % 7 for day in _parse_field(fields[4], 0, 7)}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _matches_day(self, date: datetime.date) -> bool:
+        """Whether the schedule fires at some time on ``date``."""
+        if date.month not in self.months:
+            return False
+        weekday = (date.weekday() + 1) % 7
+        if self._any_day or self._any_weekday:
+            return date.day in self.days and weekday in self.weekdays
+        return date.day in self.days or weekday in self.weekdays
+
+    def next_after(self, moment: datetime.datetime) -> datetime.datetime:
+        """The first fire time strictly after ``moment``."""
+        start = (moment + datetime.timedelta(minutes=1)).replace(
+            second=0, microsecond=0
+        )
+        day = start.date()
+        # Every valid expression fires within a leap year cycle
+        for _ in range(366 * 4 + 1):
+            if self._matches_day(day):
+                first_day = day == start.date()
+                for hour in self.hours:
+                    if first_day and hour < start.hour:
+                        continue
+                    for minute in self.minutes:
+                        if first_day and hour == start.hour and minute < start.minute:
+                            continue
+                        return start.replace(
+                            year=day.year,
+                            month=day.month,
+                            day=day.day,
+                            hour=hour,
+                            minute=minute,
+                        )
+            day += datetime.timedelta(days=1)
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
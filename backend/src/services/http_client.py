@@ -0,0 +1,37 @@
+"""Shared outbound HTTP client."""
+
+from typing import Optional
+
+import httpx
+
+from src.config import settings
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the process-wide HTTP client.
+
+    Connections are pooled and kept alive (HTTP/2 where the server supports
+    it), so repeated calls to the same host skip the TCP and TLS handshakes.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(settings.http_timeout),
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry,
+            ),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the client at shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
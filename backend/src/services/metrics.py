@@ -0,0 +1,221 @@
+"""Latency instrumentation: Prometheus metrics, Server-Timing and tracing."""
+
+import os
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import settings
+
+try:
+    import prometheus_client
+except ImportError:  # Optional: pip install growth-force-backend[metrics]
+    prometheus_client = None
+
+try:
+    from opentelemetry import trace
+except ImportError:  # Optional: pip install growth-force-backend[tracing]
+    trace = None
+
+# Report stages take from milliseconds (Redis) to minutes (Claude runs)
+# fmt: off
+_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1, 2.5, 5, 10, 30, 60, 120, 300, 600,
+)
+# fmt: on
+
+# Per-request (name, seconds) entries for the Server-Timing header
+_server_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar(
+    "server_timings", default=None
+)
+
+
+@lru_cache
+def metrics_enabled() -> bool:
+    """Whether Prometheus metrics are recorded."""
+    return settings.metrics_enabled and prometheus_client is not None
+
+
+@lru_cache
+def tracing_enabled() -> bool:
+    """Whether stages are traced as OpenTelemetry spans."""
+    return settings.tracing_enabled and trace is not None
+
+
+@lru_cache
+def server_timing_enabled() -> bool:
+    """Whether responses carry a Server-Timing header."""
+    return settings.server_timing_enabled
+
+
+def enabled() -> bool:
+    """Whether any instrumentation is on."""
+    return metrics_enabled() or tracing_enabled() or server_timing_enabled()
+
+
+class _Instruments:
+    """The Prometheus metrics, registered on first use."""
+
+    def __init__(self):
+        """Register metrics."""
+        self.stage_seconds = prometheus_client.Histogram(
+            "report_stage_duration_seconds",
+            "Duration of a report pipeline stage",
+            ["stage"],
+            buckets=_BUCKETS,
+        )
+        self.tool_call_seconds = prometheus_client.Histogram(
+            "claude_tool_call_duration_seconds",
+            "Time from a Claude tool call to its result",
+            ["tool"],
+            buckets=_BUCKETS,
+        )
+        self.http_request_seconds = prometheus_client.Histogram(
+            "http_request_duration_seconds",
+            "HTTP request duration until the response is complete",
+            ["method", "route", "status"],
+            buckets=_BUCKETS,
+        )
+        self.bigquery_bytes_processed = prometheus_client.Counter(
+            "bigquery_bytes_processed_total", "Bytes processed by BigQuery query jobs"
+        )
+        self.bigquery_rows_fetched = prometheus_client.Counter(
+            "bigquery_rows_fetched_total", "Rows fetched from BigQuery query jobs"
+        )
+
+
+@lru_cache
+def _instruments() -> Optional[_Instruments]:
+    """Get the Prometheus metrics; None when disabled."""
+    return _Instruments() if metrics_enabled() else None
+
+
+@lru_cache
+def _tracer() -> Any:
+    """Get the tracer; None when tracing is disabled."""
+    return trace.get_tracer("growth-force-backend") if tracing_enabled() else None
+
+
+class _Timer:
+    """Times a block as one stage."""
+
+    __slots__ = ("stage", "_span", "_started")
+
+    def __init__(self, stage: str):
+        """Initialize timer."""
+        self.stage = stage
+        self._span: Any = None
+
+    def __enter__(self) -> "_Timer":
+        """Start timing."""
+        tracer = _tracer()
+        if tracer is not None:
+            self._span = tracer.start_as_current_span(self.stage)
+            self._span.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Record the elapsed time."""
+        observe(self.stage, time.perf_counter() - self._started)
+        if self._span is not None:
+            self._span.__exit__(*exc_info)
+
+
+class _NoopTimer:
+    """Stand-in when instrumentation is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopTimer":
+        """Do nothing."""
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Do nothing."""
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+def timed(stage: str) -> Any:
+    """Context manager timing a block as ``stage``.
+
+    Usable around ``await``s. Returns a shared no-op when all
+    instrumentation is disabled.
+    """
+    if not enabled():
+        return _NOOP_TIMER
+    return _Timer(stage)
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Record a stage duration measured by the caller."""
+    instruments = _instruments()
+    if instruments is not None:
+        instruments.stage_seconds.labels(stage).observe(seconds)
+    timings = _server_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+def observe_tool_call(tool: str, seconds: float) -> None:
+    """Record one Claude tool call."""
+    instruments = _instruments()
+    if instruments is not None:
+        instruments.tool_call_seconds.labels(tool).observe(seconds)
+    observe("claude.tool_call", seconds)
+
+
+def observe_http_request(method: str, route: str, status: int, seconds: float) -> None:
+    """Record one HTTP request."""
+    instruments = _instruments()
+    if instruments is not None:
+        instruments.http_request_seconds.labels(method, route, str(status)).observe(
+            seconds
+        )
+
+
+def record_bigquery_job(bytes_processed: Optional[int], rows: int) -> None:
+    """Count the bytes and rows of a finished query job."""
+    instruments = _instruments()
+    if instruments is not None:
+        instruments.bigquery_bytes_processed.inc(bytes_processed or 0)
+        instruments.bigquery_rows_fetched.inc(rows)
+
+
+def start_server_timing() -> List[Tuple[str, float]]:
+    """Collect stage timings of the current request."""
+    timings: List[Tuple[str, float]] = []
+    _server_timings.set(timings)
+    return timings
+
+
+def format_server_timing(timings: List[Tuple[str, float]]) -> str:
+    """Format timings as a Server-Timing header; repeated stages are summed."""
+    totals: Dict[str, float] = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(
+        f"{stage.replace('.', '-')};dur={seconds * 1000:.1f}"
+        for stage, seconds in totals.items()
+    )
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Render all metrics in the Prometheus text format.
+
+    With ``PROMETHEUS_MULTIPROC_DIR`` set (``uvicorn --workers N``), metrics
+    of all worker processes are aggregated.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    content_type = prometheus_client.CONTENT_TYPE_LATEST
+    return prometheus_client.generate_latest(registry), content_type
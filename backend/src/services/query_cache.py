@@ -0,0 +1,515 @@
+"""Application-level cache of BigQuery results keyed by SQL fingerprint."""
+
+import asyncio
+import datetime
+import decimal
+import hashlib
+import logging
+import os
+import re
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import msgpack
+import redis.asyncio as redis
+
+from src.config import settings
+from src.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+Columns = Dict[str, List[Any]]
+# A query's cache key and the watermarks of the tables it reads
+CacheLookup = Tuple[str, Dict[str, int]]
+
+_SQL_TOKENS = re.compile(
+    r"(?P<comment>--[^\n]*|#[^\n]*|/\*.*?\*/)"
+    r"|(?P<literal>'''.*?'''|\"\"\".*?\"\"\""
+    r"|'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\")"
+    r"|(?P<identifier>`(?:[^`\\]|\\.)*`)"
+    r"|(?P<space>\s+)"
+    r"|(?P<number>\d+(?:\.\d+)?)"
+    r"|(?P<word>\w+)"
+    r"|(?P<other>.)",
+    re.DOTALL,
+)
+_TIGHT_PUNCTUATION = {",", "(", ")", "=", "<", ">", ";"}
+# Keywords ending a FROM clause at its own nesting level
+_FROM_CLAUSE_END = {
+    "WHERE",
+    "GROUP",
+    "HAVING",
+    "QUALIFY",
+    "WINDOW",
+    "ORDER",
+    "LIMIT",
+    "UNION",
+    "INTERSECT",
+    "EXCEPT",
+}
+# Results differ per call; never cached
+_VOLATILE_FUNCTIONS = re.compile(
+    r"\b(RAND|GENERATE_UUID|CURRENT_TIMESTAMP|CURRENT_DATETIME|CURRENT_TIME"
+    r"|SESSION_USER|NOW)\b",
+    re.IGNORECASE,
+)
+# Results differ per day; cached with the date in the key
+_DAILY_FUNCTIONS = re.compile(r"\bCURRENT_DATE\b", re.IGNORECASE)
+
+# msgpack extension codes keeping BigQuery value types across the cache
+_EXT_DATE, _EXT_DATETIME, _EXT_DECIMAL, _EXT_TIME = 1, 2, 3, 4
+
+
+def _tokenize(query: str) -> List[Tuple[str, str]]:
+    """Split SQL into ``(kind, text)`` tokens, comments read as spaces."""
+    return [
+        (
+            ("space", " ")
+            if match.lastgroup == "comment"
+            else (match.lastgroup, match.group())
+        )
+        for match in _SQL_TOKENS.finditer(query)
+    ]
+
+
+def _literal_list(tokens: List[Tuple[str, str]], start: int) -> Tuple[List[str], int]:
+    """Read a ``literal, ...)`` list; ([], start) if it holds anything else."""
+    items: List[str] = []
+    index = start
+    while index < len(tokens):
+        sign = ""
+        if tokens[index] == ("other", "-"):
+            sign, index = "-", index + 1
+        if index >= len(tokens) or tokens[index][0] not in ("literal", "number"):
+            break
+        items.append(sign + tokens[index][1])
+        if index + 1 < len(tokens) and tokens[index + 1] == ("other", ")"):
+            return items, index + 2
+        if index + 1 >= len(tokens) or tokens[index + 1] != ("other", ","):
+            break
+        index += 2
+    return [], start
+
+
+def normalize_sql(query: str) -> str:
+    """Normalize SQL for fingerprinting.
+
+    Drops comments, collapses whitespace, tightens spacing around
+    punctuation and sorts literal ``IN (...)`` lists. String literals and
+    quoted identifiers are kept exactly as written.
+    """
+    tokens: List[Tuple[str, str]] = []
+    for kind, text in _tokenize(query):
+        if kind == "space":
+            if (
+                tokens
+                and tokens[-1][0] != "space"
+                and tokens[-1][1] not in (_TIGHT_PUNCTUATION)
+            ):
+                tokens.append(("space", " "))
+            continue
+        if kind == "other" and text in _TIGHT_PUNCTUATION:
+            if tokens and tokens[-1][0] == "space":
+                tokens.pop()
+        tokens.append((kind, text))
+    while tokens and tokens[-1] in (("space", " "), ("other", ";")):
+        tokens.pop()
+
+    parts: List[str] = []
+    index = 0
+    while index < len(tokens):
+        kind, text = tokens[index]
+        parts.append(text)
+        index += 1
+        if kind == "word" and text.upper() == "IN" and index < len(tokens):
+            if tokens[index] == ("other", "("):
+                items, end = _literal_list(tokens, index + 1)
+                if items:
+                    parts.append("(" + ",".join(sorted(set(items))) + ")")
+                    index = end
+    return "".join(parts)
+
+
+def mask_literals(normalized_sql: str) -> str:
+    """Blank out string literals, leaving only the SQL code to inspect."""
+    return "".join(
+        "''" if kind == "literal" else text for kind, text in _tokenize(normalized_sql)
+    )
+
+
+def _table_name(tokens: List[Tuple[str, str]], index: int) -> Tuple[str, int]:
+    """Read a possibly dotted table path; returns it and the index after it."""
+    parts = [tokens[index][1]]
+    index += 1
+    while (
+        index + 1 < len(tokens)
+        and tokens[index][1] in (".", "-")
+        and tokens[index + 1][0] in ("word", "identifier", "number")
+    ):
+        parts.extend((tokens[index][1], tokens[index + 1][1]))
+        index += 2
+    return "".join(parts).replace("`", ""), index
+
+
+def _from_clause(tokens: List[Tuple[str, str]], index: int) -> Optional[List[str]]:
+    """Get every table path in the FROM clause starting at ``index``.
+
+    Reads each comma- or JOIN-separated item up to the end of the clause.
+    Subqueries are skipped, as their own FROM clauses are read separately.
+    Returns None for items whose tables cannot be told, such as table
+    functions or parenthesized joins.
+    """
+    paths: List[str] = []
+    expect_item = True
+    depth = 0
+    while index < len(tokens):
+        kind, text = tokens[index]
+        keyword = text.upper() if kind == "word" else ""
+        if depth == 0 and expect_item:
+            expect_item = False
+            if text == "(":
+                following = (
+                    tokens[index + 1][1].upper() if index + 1 < len(tokens) else ""
+                )
+                if following not in ("SELECT", "WITH"):
+                    return None
+                depth = 1
+            elif kind in ("word", "identifier"):
+                path, index = _table_name(tokens, index)
+                if index < len(tokens) and tokens[index][1] == "(":
+                    if path.upper() != "UNNEST":
+                        return None
+                else:
+                    paths.append(path)
+                continue
+            else:
+                return None
+        elif text == "(":
+            depth += 1
+        elif text == ")":
+            if depth == 0:
+                break
+            depth -= 1
+        elif depth == 0:
+            if keyword in _FROM_CLAUSE_END or text == ";":
+                break
+            expect_item = text == "," or keyword == "JOIN"
+        index += 1
+    return None if expect_item else paths
+
+
+def referenced_tables(normalized_sql: str) -> Optional[Set[str]]:
+    """Get the dataset tables a normalized query reads.
+
+    Returns None if the query reads anything the dataset watermark cannot
+    track, such as another dataset or metadata views, or if its tables
+    cannot be told for certain.
+    """
+    tokens = [token for token in _tokenize(normalized_sql) if token[0] != "space"]
+    ctes: Set[str] = set()
+    paths: List[str] = []
+    # Keyword before each open parenthesis, to tell EXTRACT(... FROM ...)
+    openers: List[str] = []
+    for index, (kind, text) in enumerate(tokens):
+        previous = tokens[index - 1][1].upper() if index else ""
+        if text == "(":
+            openers.append(previous)
+            if previous == "AS" and index >= 2 and tokens[index - 2][0] == "word":
+                ctes.add(tokens[index - 2][1].lower())
+        elif text == ")":
+            if openers:
+                openers.pop()
+        elif kind == "word" and text.upper() == "FROM":
+            if previous == "DISTINCT" or (openers and openers[-1] == "EXTRACT"):
+                continue
+            clause = _from_clause(tokens, index + 1)
+            if clause is None:
+                return None
+            paths.extend(clause)
+
+    tables: Set[str] = set()
+    for path in paths:
+        parts = path.split(".")
+        if len(parts) == 1 and parts[0].lower() in ctes:
+            continue
+        if len(parts) > 1 and parts[-2] != settings.bq_dataset_id:
+            return None
+        tables.add(parts[-1])
+    return tables or None
+
+
+def _pack_default(value: Any) -> msgpack.ExtType:
+    """Encode BigQuery value types msgpack does not know."""
+    if isinstance(value, datetime.datetime):
+        return msgpack.ExtType(_EXT_DATETIME, value.isoformat().encode())
+    if isinstance(value, datetime.date):
+        return msgpack.ExtType(_EXT_DATE, value.isoformat().encode())
+    if isinstance(value, datetime.time):
+        return msgpack.ExtType(_EXT_TIME, value.isoformat().encode())
+    if isinstance(value, decimal.Decimal):
+        return msgpack.ExtType(_EXT_DECIMAL, str(value).encode())
+    if hasattr(value, "to_pylist"):
+        # Arrow columns from the columnar fetch; their values are encoded above
+        return value.to_pylist()
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+
+def _unpack_ext(code: int, data: bytes) -> Any:
+    """Decode values encoded by ``_pack_default``."""
+    text = data.decode()
+    if code == _EXT_DATETIME:
+        return datetime.datetime.fromisoformat(text)
+    if code == _EXT_DATE:
+        return datetime.date.fromisoformat(text)
+    if code == _EXT_TIME:
+        return datetime.time.fromisoformat(text)
+    if code == _EXT_DECIMAL:
+        return decimal.Decimal(text)
+    return msgpack.ExtType(code, data)
+
+
+def encode_entry(entry: Dict[str, Any]) -> bytes:
+    """Encode a cache entry as compressed msgpack."""
+    return zlib.compress(msgpack.packb(entry, default=_pack_default), 1)
+
+
+def decode_entry(payload: bytes) -> Dict[str, Any]:
+    """Decode a cache entry."""
+    return msgpack.unpackb(zlib.decompress(payload), ext_hook=_unpack_ext)
+
+
+class QueryCache:
+    """Cache of query results shared by workers.
+
+    Keys are fingerprints of normalized SQL, so formatting and comment
+    differences still hit. Each entry records the last-modified time of every
+    table the query reads, and is discarded once any of them advances. Results
+    are stored column-wise as compressed msgpack, either in Redis or in a
+    local directory, with least-recently-used eviction above
+    ``query_cache_max_bytes``.
+    """
+
+    def __init__(self, watermark_loader: Callable[[], Awaitable[Dict[str, int]]]):
+        """Initialize query cache."""
+        self.redis_client = None
+        self.watermark_loader = watermark_loader
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self._watermarks: Dict[str, int] = {}
+        self._watermarks_loaded_at = 0.0
+        self._watermark_lock = asyncio.Lock()
+        self._disk_bytes: Optional[int] = None
+
+    async def _get_redis(self) -> redis.Redis:
+        """Get Redis client."""
+        if not self.redis_client:
+            self.redis_client = get_redis(decode_responses=False)
+        return self.redis_client
+
+    async def _get_watermarks(self) -> Dict[str, int]:
+        """Get table last-modified times, reloaded periodically."""
+        async with self._watermark_lock:
+            now = time.monotonic()
+            if now - self._watermarks_loaded_at >= settings.query_cache_watermark_ttl:
+                self._watermarks = await self.watermark_loader()
+                self._watermarks_loaded_at = now
+        return self._watermarks
+
+    async def lookup(self, query: str) -> Optional[CacheLookup]:
+        """Get a query's cache key and table watermarks; None if uncacheable.
+
+        Take it before running the query and pass it to ``set``, so a table
+        modified while the query runs leaves the entry stale.
+        """
+        normalized = normalize_sql(query)
+        code = mask_literals(normalized)
+        if _VOLATILE_FUNCTIONS.search(code):
+            return None
+        tables = referenced_tables(normalized)
+        if tables is None:
+            return None
+        try:
+            watermarks = await self._get_watermarks()
+        except Exception as e:
+            logger.error(f"Error loading table watermarks: {str(e)}")
+            return None
+        if not tables <= watermarks.keys():
+            return None
+
+        if _DAILY_FUNCTIONS.search(code):
+            normalized += f"\n-- {datetime.datetime.now(datetime.timezone.utc).date()}"
+        key = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return key, {table: watermarks[table] for table in tables}
+
+    async def get(self, lookup: CacheLookup) -> Optional[Columns]:
+        """Get cached columns for a looked-up query, if still fresh."""
+        key, watermarks = lookup
+
+        try:
+            payload = await self._read(key)
+        except Exception as e:
+            logger.error(f"Error reading query cache: {str(e)}")
+            return None
+        if payload is None:
+            self.misses += 1
+            return None
+
+        entry = decode_entry(payload)
+        if any(
+            entry["tables"].get(table, -1) < modified
+            for table, modified in watermarks.items()
+        ):
+            self.invalidations += 1
+            self.misses += 1
+            await self._delete(key)
+            return None
+
+        self.hits += 1
+        return entry["columns"]
+
+    async def set(self, lookup: CacheLookup, columns: Columns) -> None:
+        """Cache a looked-up query's columns, unless too large."""
+        key, watermarks = lookup
+
+        payload = encode_entry({"tables": watermarks, "columns": columns})
+        if len(payload) > settings.query_cache_max_entry_bytes:
+            return
+        try:
+            await self._write(key, payload)
+        except Exception as e:
+            logger.error(f"Error writing query cache: {str(e)}")
+
+    async def _read(self, key: str) -> Optional[bytes]:
+        """Read an entry from the configured tier and mark it recently used."""
+        if settings.query_cache_backend == "disk":
+            return await asyncio.to_thread(self._read_file, key)
+
+        client = await self._get_redis()
+        payload = await client.get(f"query_cache:{key}")
+        if payload is not None:
+            await client.zadd("query_cache:index", {key: time.time()})
+        return payload
+
+    async def _write(self, key: str, payload: bytes) -> None:
+        """Write an entry to the configured tier, evicting to stay in budget."""
+        if settings.query_cache_backend == "disk":
+            await asyncio.to_thread(self._write_file, key, payload)
+            return
+
+        client = await self._get_redis()
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.set(f"query_cache:{key}", payload, ex=settings.query_cache_ttl)
+            pipe.zadd("query_cache:index", {key: time.time()})
+            pipe.hget("query_cache:sizes", key)
+            pipe.hset("query_cache:sizes", key, len(payload))
+            _, _, previous, _ = await pipe.execute()
+        total = await client.incrby(
+            "query_cache:bytes", len(payload) - int(previous or 0)
+        )
+
+        while total > settings.query_cache_max_bytes:
+            evicted = await client.zpopmin("query_cache:index", 1)
+            if not evicted:
+                break
+            evicted_key = evicted[0][0].decode()
+            size = await client.hget("query_cache:sizes", evicted_key)
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.delete(f"query_cache:{evicted_key}")
+                pipe.hdel("query_cache:sizes", evicted_key)
+                pipe.decrby("query_cache:bytes", int(size or 0))
+                *_, total = await pipe.execute()
+            self.evictions += 1
+
+    async def _delete(self, key: str) -> None:
+        """Drop an invalidated entry."""
+        try:
+            if settings.query_cache_backend == "disk":
+                await asyncio.to_thread(self._delete_file, key)
+                return
+            client = await self._get_redis()
+            size = await client.hget("query_cache:sizes", key)
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.delete(f"query_cache:{key}")
+                pipe.zrem("query_cache:index", key)
+                pipe.hdel("query_cache:sizes", key)
+                pipe.decrby("query_cache:bytes", int(size or 0))
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error deleting query cache entry: {str(e)}")
+
+    def _path(self, key: str) -> str:
+        """Get the file of a disk entry."""
+        return os.path.join(settings.query_cache_dir, f"{key}.bin")
+
+    def _read_file(self, key: str) -> Optional[bytes]:
+        """Read a disk entry, honouring the TTL; touch it for LRU."""
+        path = self._path(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > settings.query_cache_ttl:
+                self._delete_file(key)
+                return None
+            with open(path, "rb") as f:
+                payload = f.read()
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+            return payload
+        except FileNotFoundError:
+            return None
+
+    def _write_file(self, key: str, payload: bytes) -> None:
+        """Write a disk entry atomically, evicting least recently read files."""
+        os.makedirs(settings.query_cache_dir, exist_ok=True)
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(
+                entry.stat().st_size
+                for entry in os.scandir(settings.query_cache_dir)
+                if entry.name.endswith(".bin")
+            )
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        try:
+            self._disk_bytes -= os.stat(path).st_size
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+        self._disk_bytes += len(payload)
+
+        if self._disk_bytes > settings.query_cache_max_bytes:
+            entries = sorted(
+                (
+                    entry
+                    for entry in os.scandir(settings.query_cache_dir)
+                    if entry.name.endswith(".bin")
+                ),
+                key=lambda entry: entry.stat().st_atime,
+            )
+            for entry in entries:
+                if self._disk_bytes <= settings.query_cache_max_bytes:
+                    break
+                self._delete_file(entry.name[: -len(".bin")])
+                self.evictions += 1
+
+    def _delete_file(self, key: str) -> None:
+        """Delete a disk entry."""
+        try:
+            size = os.stat(self._path(key)).st_size
+            os.remove(self._path(key))
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters for this worker."""
+        return {
+            "backend": settings.query_cache_backend,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,59 @@
+"""Shared Redis connection pools."""
+
+import logging
+from typing import Dict
+
+import redis.asyncio as redis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+# One client per response mode: text for JSON/keys, binary for packed payloads
+_clients: Dict[bool, redis.Redis] = {}
+
+
+def get_redis(decode_responses: bool = True) -> redis.Redis:
+    """Get the process-wide Redis client.
+
+    Clients share an explicitly sized blocking pool, so bursts wait for a free
+    connection instead of opening new sockets. Connections are health-checked
+    when idle and commands are retried with backoff across reconnects.
+    """
+    client = _clients.get(decode_responses)
+    if client is None:
+        pool = redis.BlockingConnectionPool.from_url(
+            settings.redis_url,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout,
+            decode_responses=decode_responses,
+            health_check_interval=settings.redis_health_check_interval,
+            socket_keepalive=True,
+            socket_timeout=settings.redis_socket_timeout,
+            retry=Retry(ExponentialBackoff(cap=1.0, base=0.05), retries=3),
+            retry_on_error=[redis.ConnectionError, redis.TimeoutError],
+        )
+        client = redis.Redis.from_pool(pool)
+        _clients[decode_responses] = client
+    return client
+
+
+async def init_redis() -> None:
+    """Create the pools and open a connection on each.
+
+    Raises ``redis.RedisError`` if Redis is unreachable.
+    """
+    for decode_responses in (True, False):
+        await get_redis(decode_responses).ping()
+    logger.info(
+        f"Redis pools ready (max {settings.redis_max_connections} connections each)"
+    )
+
+
+async def close_redis() -> None:
+    """Close the pools at shutdown."""
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
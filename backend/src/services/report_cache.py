@@ -0,0 +1,195 @@
+"""Report result cache in front of Claude analysis."""
+
+import hashlib
+import json
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import redis.asyncio as redis
+
+from src.config import settings
+from src.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Session context carried into the next prompt, as it changes the answer. The
+# rest of a run's metadata (timings, token estimates, BigQuery and cache
+# stats) differs per run and would only split cache keys.
+ANSWER_CONTEXT_KEYS = ("query_executed", "data_range")
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[。．.？?！!\s]+$")
+
+
+def answer_context(session_context: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep the parts of a previous run's metadata that change the answer."""
+    return {
+        key: session_context[key]
+        for key in ANSWER_CONTEXT_KEYS
+        if key in session_context
+    }
+
+
+def normalize_query(query_text: str) -> str:
+    """Normalize a natural language query for cache lookups.
+
+    NFKC folds full-width and half-width forms, so "ＲＯＡＳ" and "roas" match.
+    """
+    text = unicodedata.normalize("NFKC", query_text).lower()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+class ReportCache:
+    """TTL + LRU cache of generated reports.
+
+    Entries live in Redis so all workers share them; if Redis is unavailable
+    an in-process LRU is used instead. Keys combine the normalized query, the
+    relevant context and the dataset's last-modified watermark, so a table
+    refresh naturally invalidates older reports.
+    """
+
+    def __init__(
+        self,
+        watermark_loader: Optional[Callable[[], Awaitable[Dict[str, int]]]] = None,
+    ):
+        """Initialize report cache."""
+        self.redis_client = None
+        self.ttl = settings.report_cache_ttl
+        self.max_entries = settings.report_cache_max_entries
+        self.watermark_loader = watermark_loader
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._watermark: Optional[int] = None
+        self._watermark_checked_at = 0.0
+
+    async def _get_redis(self) -> redis.Redis:
+        """Get Redis client."""
+        if not self.redis_client:
+            self.redis_client = get_redis()
+        return self.redis_client
+
+    async def _get_watermark(self) -> Optional[int]:
+        """Get the dataset's last-modified time, refreshed periodically."""
+        if self.watermark_loader is None:
+            return None
+
+        now = time.monotonic()
+        if now - self._watermark_checked_at >= settings.report_cache_watermark_ttl:
+            try:
+                last_modified = await self.watermark_loader()
+                self._watermark = max(last_modified.values(), default=None)
+            except Exception as e:
+                logger.error(f"Error loading dataset watermark: {str(e)}")
+            self._watermark_checked_at = now
+        return self._watermark
+
+    async def make_key(self, query_text: str, context: Dict[str, Any]) -> str:
+        """Build the cache key for a query and the context its prompt is given."""
+        material = json.dumps(
+            {
+                "query": normalize_query(query_text),
+                "context": context,
+                "watermark": await self._get_watermark(),
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached report, with cache-hit metadata attached."""
+        entry = await self._get_entry(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        cached_at, result = entry
+        metadata = result.setdefault("metadata", {})
+        metadata["cache"] = {
+            "hit": True,
+            "cached_at": cached_at,
+            "age_seconds": round(time.time() - cached_at, 3),
+        }
+        return result
+
+    async def set(self, key: str, result: Dict[str, Any]) -> None:
+        """Cache a generated report."""
+        cached_at = time.time()
+        try:
+            client = await self._get_redis()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.setex(
+                    f"report_cache:{key}",
+                    self.ttl,
+                    json.dumps(
+                        {"cached_at": cached_at, "result": result},
+                        ensure_ascii=False,
+                        default=str,
+                    ),
+                )
+                pipe.zadd("report_cache:index", {key: cached_at})
+                pipe.zcard("report_cache:index")
+                *_, size = await pipe.execute()
+
+            overflow = size - self.max_entries
+            if overflow > 0:
+                evicted = await client.zpopmin("report_cache:index", overflow)
+                await client.delete(*[f"report_cache:{k}" for k, _ in evicted])
+                self.evictions += len(evicted)
+        except Exception as e:
+            logger.error(f"Error caching report in Redis, using local cache: {str(e)}")
+            self._set_local(key, cached_at, result)
+
+    async def _get_entry(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Look a key up in Redis, falling back to the local cache."""
+        try:
+            client = await self._get_redis()
+            data = await client.get(f"report_cache:{key}")
+            if data is None:
+                return None
+            # Refresh recency for LRU eviction
+            await client.zadd("report_cache:index", {key: time.time()})
+            entry = json.loads(data)
+            return entry["cached_at"], entry["result"]
+        except Exception as e:
+            logger.error(f"Error reading report cache from Redis: {str(e)}")
+            return self._get_local(key)
+
+    def _get_local(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """Look a key up in the in-process LRU."""
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        cached_at, result = entry
+        if time.time() - cached_at > self.ttl:
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        # Copy so callers can annotate metadata without touching the entry
+        return cached_at, json.loads(json.dumps(result, default=str))
+
+    def _set_local(self, key: str, cached_at: float, result: Dict[str, Any]) -> None:
+        """Store a report in the in-process LRU."""
+        self._local[key] = (cached_at, result)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters for this worker."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "local_entries": len(self._local),
+        }
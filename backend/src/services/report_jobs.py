@@ -0,0 +1,286 @@
+"""Asynchronous report jobs backed by a Redis queue."""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+import httpx
+import redis.asyncio as redis
+
+from src.config import settings
+from src.services.http_client import get_http_client
+from src.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "report_jobs:queue"
+PROCESSING_KEY = "report_jobs:processing"
+DELAYED_KEY = "report_jobs:delayed"
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def _origin(url: str) -> Optional[Tuple[str, str, int]]:
+    """Get the scheme, host and effective port of a URL, if it has them."""
+    try:
+        parsed = httpx.URL(url)
+    except httpx.InvalidURL:
+        return None
+    if parsed.scheme not in ("http", "https") or not parsed.host:
+        return None
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return parsed.scheme, parsed.host, port
+
+
+def callback_allowed(callback_url: str) -> bool:
+    """Check a webhook URL against ``REPORT_JOB_CALLBACK_ORIGINS``.
+
+    Workers POST job results to it, so only configured origins are allowed,
+    never arbitrary (internal) addresses a client names.
+    """
+    origin = _origin(callback_url)
+    return origin is not None and origin in {
+        _origin(allowed) for allowed in settings.report_job_callback_origins
+    }
+
+
+class ReportJobQueue:
+    """Queue of report jobs shared by API and worker processes.
+
+    Jobs are hashes with a TTL. Workers move ids from the queue to a
+    processing list atomically and hold a lease key while running. The
+    reaper puts jobs whose lease expired (crashed worker) back on the queue
+    and releases delayed retries when their backoff has elapsed. Status
+    changes are published on a per-job channel for subscribers.
+    """
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        """Initialize job queue."""
+        self.redis_client = redis_client
+        # Lease-less ids seen by the last reap; requeued if still lease-less
+        self._suspects: Set[str] = set()
+
+    async def _get_redis(self) -> redis.Redis:
+        """Get Redis client."""
+        if not self.redis_client:
+            self.redis_client = get_redis()
+        return self.redis_client
+
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        """Get the Redis key of a job."""
+        return f"report_jobs:job:{job_id}"
+
+    @staticmethod
+    def _lease_key(job_id: str) -> str:
+        """Get the Redis key of a job's worker lease."""
+        return f"report_jobs:lease:{job_id}"
+
+    @staticmethod
+    def _channel(job_id: str) -> str:
+        """Get the pub/sub channel of a job's status updates."""
+        return f"report_jobs:events:{job_id}"
+
+    async def _update(self, job_id: str, **fields: Any) -> None:
+        """Update job fields and publish the new status."""
+        client = await self._get_redis()
+        fields["updated_at"] = time.time()
+        encoded = {
+            key: json.dumps(value, ensure_ascii=False, default=str)
+            for key, value in fields.items()
+        }
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.hset(self._job_key(job_id), mapping=encoded)
+            pipe.expire(self._job_key(job_id), settings.report_job_ttl)
+            pipe.publish(
+                self._channel(job_id),
+                json.dumps({"job_id": job_id, "status": fields.get("status")}),
+            )
+            await pipe.execute()
+
+    async def enqueue(self, payload: Dict[str, Any]) -> str:
+        """Create a job and put it on the queue.
+
+        Raises ValueError if its ``callback_url`` is not an allowed origin.
+        """
+        callback_url = payload.get("callback_url")
+        if callback_url and not callback_allowed(callback_url):
+            raise ValueError(
+                "callback_url must point to an origin in REPORT_JOB_CALLBACK_ORIGINS"
+            )
+        job_id = str(uuid.uuid4())
+        await self._update(
+            job_id,
+            status="queued",
+            payload=payload,
+            attempts=0,
+            created_at=time.time(),
+        )
+        client = await self._get_redis()
+        await client.lpush(QUEUE_KEY, job_id)
+        logger.info(f"Enqueued report job {job_id}")
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job's status and result."""
+        client = await self._get_redis()
+        data = await client.hgetall(self._job_key(job_id))
+        if not data:
+            return None
+        job = {key: json.loads(value) for key, value in data.items()}
+        job["job_id"] = job_id
+        return job
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the job on every status change until it finishes."""
+        client = await self._get_redis()
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self._channel(job_id))
+        try:
+            # Read after subscribing so no update can slip in between
+            job = await self.get(job_id)
+            while job is not None:
+                yield job
+                if job["status"] in TERMINAL_STATUSES:
+                    return
+                await pubsub.get_message(ignore_subscribe_messages=True, timeout=15.0)
+                job = await self.get(job_id)
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    async def run_worker(self, handler: JobHandler) -> None:
+        """Process jobs forever with ``handler``."""
+        client = await self._get_redis()
+        while True:
+            job_id = await client.blmove(
+                QUEUE_KEY, PROCESSING_KEY, timeout=2, src="RIGHT", dest="LEFT"
+            )
+            if job_id is None:
+                continue
+            try:
+                await self._process(job_id, handler)
+            except Exception as e:
+                logger.error(f"Report job {job_id} bookkeeping failed: {str(e)}")
+
+    async def _process(self, job_id: str, handler: JobHandler) -> None:
+        """Run one job under a lease, then record its outcome."""
+        client = await self._get_redis()
+        job = await self.get(job_id)
+        if job is None:
+            # Expired while queued
+            await client.lrem(PROCESSING_KEY, 0, job_id)
+            return
+
+        lease_ms = settings.report_job_visibility_timeout * 1000
+        await client.set(self._lease_key(job_id), "1", px=lease_ms)
+        attempts = job["attempts"] + 1
+        await self._update(job_id, status="running", attempts=attempts)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            result = await handler(job["payload"])
+        except Exception as e:
+            logger.error(f"Report job {job_id} attempt {attempts} failed: {str(e)}")
+            await self._retry_or_fail(job_id, attempts, str(e))
+        else:
+            await self._update(job_id, status="succeeded", result=result, error=None)
+            await self._notify(job_id, job["payload"].get("callback_url"))
+        finally:
+            heartbeat.cancel()
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.lrem(PROCESSING_KEY, 0, job_id)
+                pipe.delete(self._lease_key(job_id))
+                await pipe.execute()
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Keep the lease alive while the job runs."""
+        client = await self._get_redis()
+        lease_ms = settings.report_job_visibility_timeout * 1000
+        while True:
+            await asyncio.sleep(settings.report_job_visibility_timeout / 3)
+            await client.pexpire(self._lease_key(job_id), lease_ms)
+
+    async def _retry_or_fail(self, job_id: str, attempts: int, error: str) -> None:
+        """Schedule a retry with exponential backoff, or mark the job failed."""
+        if attempts >= settings.report_job_max_attempts:
+            await self._update(job_id, status="failed", error=error)
+            job = await self.get(job_id)
+            callback_url = (job or {}).get("payload", {}).get("callback_url")
+            await self._notify(job_id, callback_url)
+            return
+
+        delay = settings.report_job_backoff_base * 2 ** (attempts - 1)
+        await self._update(job_id, status="retrying", error=error, retry_in=delay)
+        client = await self._get_redis()
+        await client.zadd(DELAYED_KEY, {job_id: time.time() + delay})
+
+    async def _notify(self, job_id: str, callback_url: Optional[str]) -> None:
+        """POST the finished job to its webhook, if one was given."""
+        if not callback_url:
+            return
+        if not callback_allowed(callback_url):
+            # Enqueued before the origin was removed from the allow-list
+            logger.warning(f"Skipping webhook of report job {job_id}: not allowed")
+            return
+        job = await self.get(job_id)
+        try:
+            # Redirects are not followed, so they cannot leave the allowed origin
+            await get_http_client().post(callback_url, json=job, timeout=10)
+        except Exception as e:
+            logger.error(f"Webhook for report job {job_id} failed: {str(e)}")
+
+    async def reap(self) -> None:
+        """Retry jobs of crashed workers and release due retries."""
+        client = await self._get_redis()
+
+        # A worker takes the lease just after claiming a job, so only ids
+        # lease-less on two consecutive passes are treated as abandoned
+        suspects = set()
+        for job_id in await client.lrange(PROCESSING_KEY, 0, -1):
+            if await client.exists(self._lease_key(job_id)):
+                continue
+            if job_id not in self._suspects:
+                suspects.add(job_id)
+            elif await client.lrem(PROCESSING_KEY, 0, job_id):
+                await self._retry_abandoned(job_id)
+        self._suspects = suspects
+
+        due = await client.zrangebyscore(DELAYED_KEY, "-inf", time.time())
+        for job_id in due:
+            if await client.zrem(DELAYED_KEY, job_id):
+                await self._update(job_id, status="queued")
+                await client.lpush(QUEUE_KEY, job_id)
+
+    async def _retry_abandoned(self, job_id: str) -> None:
+        """Retry or fail a job whose worker died, counting it as an attempt.
+
+        A job that crashes its worker (out of memory, say) would otherwise
+        be requeued forever, taking down a worker each time.
+        """
+        job = await self.get(job_id)
+        if job is None:
+            return
+        attempts = job["attempts"]
+        if job["status"] != "running":
+            # The worker died before recording the attempt
+            attempts += 1
+            await self._update(job_id, attempts=attempts)
+        logger.warning(
+            f"Report job {job_id} attempt {attempts} lost its worker (lease expired)"
+        )
+        await self._retry_or_fail(job_id, attempts, "Worker stopped during the job")
+
+    async def run_reaper(self) -> None:
+        """Reap forever."""
+        while True:
+            try:
+                await self.reap()
+            except Exception as e:
+                logger.error(f"Report job reaper failed: {str(e)}")
+            await asyncio.sleep(settings.report_job_reap_interval)
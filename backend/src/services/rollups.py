@@ -0,0 +1,591 @@
+"""Rollup tables: pre-aggregated copies of the daily ad performance facts."""
+
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import re
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import redis.asyncio as redis
+
+from src.config import settings
+from src.services.bigquery_service import BigQueryService
+from src.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Table name suffix per date grain
+GRAINS = {"day": "daily", "week": "weekly", "month": "monthly"}
+PERIOD_COLUMN = "period_start"
+SOURCE_ROWS_COLUMN = "source_rows"
+LOCK_KEY = "rollups:lock"
+
+_ADDITIVE_TYPES = {"INTEGER", "INT64", "FLOAT", "FLOAT64", "NUMERIC", "BIGNUMERIC"}
+# Ratios, averages and IDs do not add up across rows
+_NON_ADDITIVE = re.compile(
+    r"(^|_)(id|ctr|cpc|cpm|cpa|cvr|roas|rate|ratio|avg|average|share|rank|score"
+    r"|frequency)($|_)"
+)
+
+
+def bucket_start(day: datetime.date, grain: str) -> datetime.date:
+    """First day of the period (week from Monday, month) containing ``day``."""
+    if grain == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    if grain == "month":
+        return day.replace(day=1)
+    return day
+
+
+def bucket_end(day: datetime.date, grain: str) -> datetime.date:
+    """Last day of the period containing ``day``."""
+    if grain == "week":
+        return bucket_start(day, grain) + datetime.timedelta(days=6)
+    if grain == "month":
+        next_month = day.replace(day=28) + datetime.timedelta(days=4)
+        return next_month - datetime.timedelta(days=next_month.day)
+    return day
+
+
+def partition_span(
+    partition_id: str,
+) -> Optional[Tuple[datetime.date, datetime.date]]:
+    """Dates a time partition covers (hourly, daily, monthly or yearly ids).
+
+    Returns None for ``__NULL__``, ``__UNPARTITIONED__`` (the streaming
+    buffer) and tables without date partitions.
+    """
+    if not partition_id.isdigit():
+        return None
+    try:
+        if len(partition_id) >= 8:
+            day = datetime.datetime.strptime(partition_id[:8], "%Y%m%d").date()
+            return day, day
+        if len(partition_id) == 6:
+            month = datetime.datetime.strptime(partition_id, "%Y%m").date()
+            return month, bucket_end(month, "month")
+        if len(partition_id) == 4:
+            year = int(partition_id)
+            return datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+    except ValueError:
+        pass
+    return None
+
+
+@dataclass(frozen=True)
+class RollupDefinition:
+    """One rollup: a source fact table summed per date grain and dimensions."""
+
+    source: str
+    grain: str
+    dimensions: Tuple[str, ...]
+
+    @property
+    def name(self) -> str:
+        """Table name, e.g. ``agg_meta_ad_performance_weekly_by_channel``."""
+        base = self.source.removeprefix("fact_").removesuffix("_daily")
+        return f"agg_{base}_{GRAINS[self.grain]}_by_{'_'.join(self.dimensions)}"
+
+
+def configured_rollups() -> List[RollupDefinition]:
+    """Every source × grain × dimension set from the settings."""
+    return [
+        RollupDefinition(
+            source, grain, tuple(name.strip() for name in dimensions.split(","))
+        )
+        for source in settings.rollup_sources
+        for grain in settings.rollup_grains
+        for dimensions in settings.rollup_dimensions
+    ]
+
+
+def _ranges(
+    buckets: List[datetime.date], grain: str, max_days: int
+) -> Iterator[Tuple[datetime.date, datetime.date]]:
+    """Merge sorted adjacent periods into date ranges of at most ``max_days``."""
+    start = end = None
+    for bucket in buckets:
+        last = bucket_end(bucket, grain)
+        if (
+            start is not None
+            and bucket == end + datetime.timedelta(days=1)
+            and (last - start).days < max_days
+        ):
+            end = last
+            continue
+        if start is not None:
+            yield start, end
+        start, end = bucket, last
+    if start is not None:
+        yield start, end
+
+
+class RollupEngine:
+    """Where rollups are computed and stored.
+
+    ``RollupManager`` builds the aggregate queries; an engine supplies the
+    dialect-specific pieces and runs the statements. ``BigQueryRollupEngine``
+    is the real one; ``benchmarks/fakes.py`` has a SQLite stand-in.
+    """
+
+    def source_table(self, table: str) -> str:
+        """Reference to a source fact table in SQL."""
+        raise NotImplementedError
+
+    def rollup_table(self, table: str) -> str:
+        """Reference to a rollup table in SQL."""
+        raise NotImplementedError
+
+    def period(self, column: str, grain: str) -> str:
+        """SQL expression for the first day of a date column's period."""
+        raise NotImplementedError
+
+    async def columns(self, table: str) -> List[Dict[str, Any]]:
+        """Columns of a source table, as ``name`` and ``type`` dicts."""
+        raise NotImplementedError
+
+    async def partitions(self, table: str) -> Dict[str, int]:
+        """Last-modified time (epoch ms) of each partition of a source table."""
+        raise NotImplementedError
+
+    async def create(
+        self, table: str, select: str, dimensions: Tuple[str, ...]
+    ) -> None:
+        """Create a rollup table with the columns of ``select``, if missing."""
+        raise NotImplementedError
+
+    async def replace(
+        self,
+        table: str,
+        select: str,
+        start: Optional[datetime.date],
+        end: Optional[datetime.date],
+    ) -> None:
+        """Atomically replace the rows of periods from ``start`` to ``end``.
+
+        With no dates, the whole table is replaced.
+        """
+        raise NotImplementedError
+
+    async def drop(self, table: str) -> None:
+        """Drop a rollup table, if it exists."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the engine's resources."""
+
+
+class BigQueryRollupEngine(RollupEngine):
+    """Rollups in ``rollup_dataset_id``, partitioned by month.
+
+    Needs a client allowed to write that dataset; the dataset itself is
+    provisioned outside the app.
+    """
+
+    def __init__(self, bigquery_service: BigQueryService):
+        """Initialize engine."""
+        self.bigquery_service = bigquery_service
+
+    def source_table(self, table: str) -> str:
+        """Reference to a source fact table in SQL."""
+        return f"`{settings.bq_project_id}.{settings.bq_dataset_id}.{table}`"
+
+    def rollup_table(self, table: str) -> str:
+        """Reference to a rollup table in SQL."""
+        return f"`{settings.bq_project_id}.{settings.rollup_dataset_id}.{table}`"
+
+    def period(self, column: str, grain: str) -> str:
+        """First day of the period, weeks starting on Monday."""
+        if grain == "week":
+            return f"DATE_TRUNC({column}, WEEK(MONDAY))"
+        if grain == "month":
+            return f"DATE_TRUNC({column}, MONTH)"
+        return column
+
+    async def columns(self, table: str) -> List[Dict[str, Any]]:
+        """Columns of a source table."""
+        return await self.bigquery_service.get_table_schema(table)
+
+    async def partitions(self, table: str) -> Dict[str, int]:
+        """Last-modified time of each partition of a source table."""
+        return await self.bigquery_service.get_partition_last_modified(table)
+
+    def _layout(self, dimensions: Tuple[str, ...]) -> str:
+        """Partitioning and clustering of rollup tables."""
+        return (
+            f"PARTITION BY DATE_TRUNC({PERIOD_COLUMN}, MONTH) "
+            f"CLUSTER BY {', '.join(dimensions)}"
+        )
+
+    async def create(
+        self, table: str, select: str, dimensions: Tuple[str, ...]
+    ) -> None:
+        """Create an empty rollup table."""
+        await self.bigquery_service.execute_statement(
+            f"CREATE TABLE IF NOT EXISTS {self.rollup_table(table)} "
+            f"{self._layout(dimensions)} AS {select}"
+        )
+
+    async def replace(
+        self,
+        table: str,
+        select: str,
+        start: Optional[datetime.date],
+        end: Optional[datetime.date],
+    ) -> None:
+        """Swap old rows for new in one MERGE, so readers never see a gap."""
+        scope = (
+            ""
+            if start is None or end is None
+            else f"AND target.{PERIOD_COLUMN} BETWEEN '{start}' AND '{end}' "
+        )
+        statement = (
+            f"MERGE {self.rollup_table(table)} AS target "
+            f"USING ({select}) AS source ON FALSE "
+            f"WHEN NOT MATCHED BY SOURCE {scope}THEN DELETE "
+            "WHEN NOT MATCHED THEN INSERT ROW"
+        )
+        await self.bigquery_service.execute_statement(statement)
+
+    async def drop(self, table: str) -> None:
+        """Drop a rollup table."""
+        await self.bigquery_service.execute_statement(
+            f"DROP TABLE IF EXISTS {self.rollup_table(table)}"
+        )
+
+    def close(self) -> None:
+        """Shut down the client's executor."""
+        self.bigquery_service.close()
+
+
+class RollupManager:
+    """Create rollup tables, refresh them incrementally and describe them.
+
+    Each rollup sums the additive numeric columns of a source fact table
+    (not IDs or ratios such as CTR) per date grain (day, week from Monday,
+    month) and dimension set, plus the number of source rows. Refreshes run
+    in the worker under a Redis lock, so one process refreshes at a time.
+    Changed source partitions (by last-modified time) are mapped to the
+    periods containing them, and only those periods are recomputed, in
+    ranges of at most ``rollup_max_days_per_job`` days. Sources without date
+    partitions are recomputed whole when they change, and a rollup whose
+    columns changed is rebuilt from scratch.
+
+    Partition times and each rollup's description (columns, covered dates,
+    refresh time) live in Redis, so API processes can put the ready rollups
+    in the agent's schema digest without touching BigQuery.
+    """
+
+    def __init__(
+        self,
+        engine_factory: Callable[[], RollupEngine],
+        definitions: Optional[List[RollupDefinition]] = None,
+    ):
+        """Initialize rollup manager."""
+        self.engine_factory = engine_factory
+        self.definitions = configured_rollups() if definitions is None else definitions
+        self.redis_client = None
+        self._engine: Optional[RollupEngine] = None
+        self._lock_token: Optional[str] = None
+        self._stats: Dict[str, int] = defaultdict(int)
+
+    @property
+    def engine(self) -> RollupEngine:
+        """The engine, built on first use (only refreshes need it)."""
+        if self._engine is None:
+            self._engine = self.engine_factory()
+        return self._engine
+
+    async def _get_redis(self) -> redis.Redis:
+        """Get Redis client."""
+        if not self.redis_client:
+            self.redis_client = get_redis()
+        return self.redis_client
+
+    @staticmethod
+    def _meta_key(definition: RollupDefinition) -> str:
+        return f"rollups:{definition.name}:meta"
+
+    @staticmethod
+    def _partitions_key(definition: RollupDefinition) -> str:
+        return f"rollups:{definition.name}:partitions"
+
+    def _measures(
+        self, definition: RollupDefinition, columns: List[Dict[str, Any]]
+    ) -> Optional[List[str]]:
+        """Additive columns to sum, or None if the source lacks a key column."""
+        names = {column["name"] for column in columns}
+        missing = {settings.rollup_date_column, *definition.dimensions} - names
+        if missing:
+            logger.warning(
+                f"Skipping rollup {definition.name}: "
+                f"{definition.source} has no column {', '.join(sorted(missing))}"
+            )
+            return None
+        return [
+            column["name"]
+            for column in columns
+            if column["type"] in _ADDITIVE_TYPES
+            and column.get("mode") != "REPEATED"
+            and column["name"] not in definition.dimensions
+            and not _NON_ADDITIVE.search(column["name"].lower())
+        ]
+
+    def select(
+        self, definition: RollupDefinition, measures: List[str], condition: str
+    ) -> str:
+        """The aggregate query of a rollup over source rows matching ``condition``."""
+        engine = self.engine
+        dimensions = ", ".join(definition.dimensions)
+        columns = [
+            f"{engine.period(settings.rollup_date_column, definition.grain)} "
+            f"AS {PERIOD_COLUMN}",
+            dimensions,
+            *(f"SUM({measure}) AS {measure}" for measure in measures),
+            f"COUNT(*) AS {SOURCE_ROWS_COLUMN}",
+        ]
+        return (
+            f"SELECT {', '.join(columns)} "
+            f"FROM {engine.source_table(definition.source)} "
+            f"WHERE {condition} "
+            f"GROUP BY {PERIOD_COLUMN}, {dimensions}"
+        )
+
+    async def refresh(self) -> Dict[str, int]:
+        """Bring every rollup up to date, unless another process is at it.
+
+        Returns the number of period ranges recomputed per rollup.
+        """
+        client = await self._get_redis()
+        token = uuid.uuid4().hex
+        if not await client.set(LOCK_KEY, token, nx=True, ex=settings.rollup_lock_ttl):
+            self._stats["skipped_locked"] += 1
+            return {}
+        self._lock_token = token
+
+        refreshed: Dict[str, int] = {}
+        try:
+            by_source: Dict[str, List[RollupDefinition]] = defaultdict(list)
+            for definition in self.definitions:
+                by_source[definition.source].append(definition)
+
+            for source, definitions in by_source.items():
+                try:
+                    columns = await self.engine.columns(source)
+                    partitions = {
+                        str(partition_id): int(modified)
+                        for partition_id, modified in (
+                            await self.engine.partitions(source)
+                        ).items()
+                    }
+                except Exception as e:
+                    self._stats["failures"] += 1
+                    logger.error(f"Failed to inspect rollup source {source}: {str(e)}")
+                    continue
+                for definition in definitions:
+                    try:
+                        refreshed[definition.name] = await self._refresh_rollup(
+                            definition, columns, partitions
+                        )
+                    except Exception as e:
+                        self._stats["failures"] += 1
+                        logger.error(
+                            f"Failed to refresh rollup {definition.name}: {str(e)}"
+                        )
+        finally:
+            self._lock_token = None
+            if await client.get(LOCK_KEY) == token:
+                await client.delete(LOCK_KEY)
+        self._stats["refreshes"] += 1
+        return refreshed
+
+    async def _extend_lock(self) -> None:
+        """Keep the refresh lock for another ``rollup_lock_ttl``, if still ours."""
+        client = await self._get_redis()
+        if self._lock_token and await client.get(LOCK_KEY) == self._lock_token:
+            await client.expire(LOCK_KEY, settings.rollup_lock_ttl)
+
+    async def _refresh_rollup(
+        self,
+        definition: RollupDefinition,
+        columns: List[Dict[str, Any]],
+        partitions: Dict[str, int],
+    ) -> int:
+        """Recompute a rollup's changed periods; returns the ranges run."""
+        measures = self._measures(definition, columns)
+        if measures is None:
+            return 0
+        client = await self._get_redis()
+        meta_key = self._meta_key(definition)
+        partitions_key = self._partitions_key(definition)
+        fingerprint = hashlib.sha256(
+            self.select(definition, measures, "TRUE").encode("utf-8")
+        ).hexdigest()
+
+        meta = json.loads(await client.get(meta_key) or "{}")
+        if meta.get("fingerprint") != fingerprint:
+            # New rollup, or the source's columns changed: rebuild
+            if meta:
+                logger.info(f"Rebuilding rollup {definition.name}")
+            # Unlisted from the schema digest until the rebuild finishes
+            await client.delete(meta_key)
+            await self.engine.drop(definition.name)
+            await client.delete(partitions_key)
+            await self.engine.create(
+                definition.name,
+                self.select(definition, measures, "1 = 0"),
+                definition.dimensions,
+            )
+
+        stored = await client.hgetall(partitions_key)
+        spans = {
+            partition_id: span
+            for partition_id in set(partitions) | set(stored)
+            if (span := partition_span(partition_id)) is not None
+        }
+        ranges = 0
+        if not spans:
+            # No date partitions: any change recomputes the whole table
+            current = {key: str(value) for key, value in partitions.items()}
+            if current and current != stored:
+                await self.engine.replace(
+                    definition.name,
+                    self.select(definition, measures, "TRUE"),
+                    None,
+                    None,
+                )
+                await client.delete(partitions_key)
+                await client.hset(partitions_key, mapping=current)
+                await self._extend_lock()
+                ranges = 1
+        else:
+            changed = [
+                partition_id
+                for partition_id in spans
+                if stored.get(partition_id)
+                != (
+                    str(partitions[partition_id])
+                    if partition_id in partitions
+                    else None
+                )
+            ]
+            ranges = await self._refresh_periods(
+                definition, measures, changed, spans, partitions
+            )
+
+        dates = [
+            span for partition_id, span in spans.items() if partition_id in partitions
+        ]
+        meta = {
+            "name": definition.name,
+            "table": self.engine.rollup_table(definition.name).strip("`"),
+            "source": definition.source,
+            "grain": definition.grain,
+            "dimensions": list(definition.dimensions),
+            "measures": measures,
+            "fingerprint": fingerprint,
+            "first_date": min(span[0] for span in dates).isoformat() if dates else None,
+            "last_date": max(span[1] for span in dates).isoformat() if dates else None,
+            "refreshed_at": time.time(),
+        }
+        await client.set(meta_key, json.dumps(meta))
+        self._stats["ranges_refreshed"] += ranges
+        return ranges
+
+    async def _refresh_periods(
+        self,
+        definition: RollupDefinition,
+        measures: List[str],
+        changed: List[str],
+        spans: Dict[str, Tuple[datetime.date, datetime.date]],
+        partitions: Dict[str, int],
+    ) -> int:
+        """Recompute the periods containing changed partitions, range by range.
+
+        Partition times are recorded after each range, so a failed refresh
+        resumes where it stopped.
+        """
+        client = await self._get_redis()
+        partitions_key = self._partitions_key(definition)
+        grain = definition.grain
+        buckets: Set[datetime.date] = set()
+        for partition_id in changed:
+            first, last = spans[partition_id]
+            day = bucket_start(first, grain)
+            while day <= last:
+                buckets.add(day)
+                day = bucket_end(day, grain) + datetime.timedelta(days=1)
+
+        ranges = 0
+        date_column = settings.rollup_date_column
+        for start, end in _ranges(
+            sorted(buckets), grain, settings.rollup_max_days_per_job
+        ):
+            await self.engine.replace(
+                definition.name,
+                self.select(
+                    definition,
+                    measures,
+                    f"{date_column} BETWEEN '{start}' AND '{end}'",
+                ),
+                start,
+                end,
+            )
+            ranges += 1
+            done = [
+                partition_id
+                for partition_id in changed
+                if start <= spans[partition_id][0] and spans[partition_id][1] <= end
+            ]
+            current = {
+                partition_id: str(partitions[partition_id])
+                for partition_id in done
+                if partition_id in partitions
+            }
+            removed = [
+                partition_id for partition_id in done if partition_id not in partitions
+            ]
+            if current:
+                await client.hset(partitions_key, mapping=current)
+            if removed:
+                await client.hdel(partitions_key, *removed)
+            # A backfill can outlast the lock; keep other workers out
+            await self._extend_lock()
+        return ranges
+
+    async def describe(self) -> List[Dict[str, Any]]:
+        """Describe the rollups refreshed at least once, for the schema digest."""
+        if not self.definitions:
+            return []
+        client = await self._get_redis()
+        values = await client.mget(
+            [self._meta_key(definition) for definition in self.definitions]
+        )
+        return [json.loads(value) for value in values if value]
+
+    async def run_refresher(self) -> None:
+        """Refresh rollups every ``rollup_refresh_interval`` seconds, forever."""
+        while True:
+            try:
+                refreshed = await self.refresh()
+                if any(refreshed.values()):
+                    logger.info(f"Refreshed rollups: {refreshed}")
+            except Exception as e:
+                logger.error(f"Rollup refresh failed: {str(e)}")
+            await asyncio.sleep(settings.rollup_refresh_interval)
+
+    def close(self) -> None:
+        """Release the engine, if built."""
+        if self._engine is not None:
+            self._engine.close()
+            self._engine = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get refresh counters for this process."""
+        return {"rollups": len(self.definitions), **self._stats}
@@ -0,0 +1,203 @@
+"""Admission control and priority scheduling for Claude Code runs."""
+
+import asyncio
+import itertools
+import logging
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List
+
+from src.services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lower value runs first
+PRIORITY_CLASSES = {"interactive": 0, "scheduled": 1}
+
+
+class SchedulerBusyError(Exception):
+    """Raised when a run cannot be admitted."""
+
+    def __init__(self, reason: str, queue_position: int, retry_after: int):
+        """Initialize error."""
+        super().__init__(f"Scheduler busy ({reason}), queue position {queue_position}")
+        self.reason = reason
+        self.queue_position = queue_position
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Ticket:
+    """A queued request for a run slot."""
+
+    key: str
+    priority: int
+    sequence: int
+    enqueued_at: float
+    future: "asyncio.Future[None]" = field(repr=False)
+
+
+class RunScheduler:
+    """Limit concurrent Claude Code runs in this worker.
+
+    Runs beyond ``max_concurrent`` wait in a bounded queue ordered by
+    priority class, then by how many runs the same user/session already has,
+    then by arrival. A key never holds more than ``max_per_key`` slots, so one
+    busy session cannot starve others. When the queue is full, or a request
+    waits longer than ``queue_timeout``, ``SchedulerBusyError`` is raised so
+    the API can fail fast instead of piling up agent processes.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_per_key: int,
+        max_queue: int,
+        queue_timeout: float,
+    ):
+        """Initialize scheduler."""
+        self.max_concurrent = max_concurrent
+        self.max_per_key = max_per_key
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._active_by_key: Dict[str, int] = defaultdict(int)
+        self._queue: List[_Ticket] = []
+        self._sequence = itertools.count()
+        self._stats: Dict[str, float] = defaultdict(float)
+
+    @asynccontextmanager
+    async def slot(
+        self, key: str, priority: str = "interactive"
+    ) -> AsyncIterator[None]:
+        """Hold a run slot for the duration of the block."""
+        wait_started = time.monotonic()
+        await self._acquire(key, PRIORITY_CLASSES.get(priority, 0))
+        run_started = time.monotonic()
+        self._record_wait(run_started - wait_started)
+        metrics.observe("claude.queue_wait", run_started - wait_started)
+        try:
+            yield
+        finally:
+            self._release(key)
+            self._stats["completed"] += 1
+            self._stats["run_seconds_total"] += time.monotonic() - run_started
+
+    def _can_start(self, key: str) -> bool:
+        """Check whether a run for ``key`` fits right now."""
+        return (
+            self._active < self.max_concurrent
+            and self._active_by_key.get(key, 0) < self.max_per_key
+        )
+
+    def _start(self, key: str) -> None:
+        """Account for a started run."""
+        self._active += 1
+        self._active_by_key[key] += 1
+        self._stats["admitted"] += 1
+
+    async def _acquire(self, key: str, priority: int) -> None:
+        """Wait for a run slot, or raise if the queue is full or too slow."""
+        if not self._queue and self._can_start(key):
+            self._start(key)
+            return
+
+        if len(self._queue) >= self.max_queue:
+            self._stats["rejected"] += 1
+            raise SchedulerBusyError(
+                "queue_full", len(self._queue) + 1, self._retry_after()
+            )
+
+        ticket = _Ticket(
+            key=key,
+            priority=priority,
+            sequence=next(self._sequence),
+            enqueued_at=time.monotonic(),
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._queue.append(ticket)
+        position = self.queue_position(ticket)
+        logger.info(f"Queued Claude run for {key[:12]} at position {position}")
+        self._dispatch()
+
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await asyncio.shield(ticket.future)
+        except (asyncio.CancelledError, TimeoutError) as e:
+            if ticket.future.done():
+                # Slot was granted as we gave up; hand it back
+                self._release(key)
+            else:
+                self._queue.remove(ticket)
+                ticket.future.cancel()
+            if isinstance(e, TimeoutError):
+                self._stats["timed_out"] += 1
+                raise SchedulerBusyError(
+                    "queue_timeout", position, self._retry_after()
+                ) from None
+            raise
+
+    def _release(self, key: str) -> None:
+        """Free a slot and start the next eligible run."""
+        self._active -= 1
+        self._active_by_key[key] -= 1
+        if not self._active_by_key[key]:
+            del self._active_by_key[key]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant free slots to the best eligible queued tickets."""
+        while self._active < self.max_concurrent:
+            eligible = [t for t in self._queue if self._can_start(t.key)]
+            if not eligible:
+                return
+            ticket = min(
+                eligible,
+                key=lambda t: (
+                    t.priority,
+                    self._active_by_key.get(t.key, 0),
+                    t.sequence,
+                ),
+            )
+            self._queue.remove(ticket)
+            self._start(ticket.key)
+            ticket.future.set_result(None)
+
+    def queue_position(self, ticket: _Ticket) -> int:
+        """Get a ticket's 1-based position in scheduling order."""
+        ordered = sorted(self._queue, key=lambda t: (t.priority, t.sequence))
+        return ordered.index(ticket) + 1
+
+    def _retry_after(self) -> int:
+        """Estimate seconds until a slot frees up, from average run time."""
+        completed = self._stats["completed"]
+        average = self._stats["run_seconds_total"] / completed if completed else 60
+        return max(1, int(average * (len(self._queue) + 1) / self.max_concurrent))
+
+    def _record_wait(self, seconds: float) -> None:
+        """Record time spent waiting for a slot."""
+        self._stats["wait_seconds_total"] += seconds
+        self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depth, wait time and run time counters."""
+        admitted = self._stats["admitted"]
+        completed = self._stats["completed"]
+        return {
+            "active": self._active,
+            "queue_depth": len(self._queue),
+            "max_concurrent": self.max_concurrent,
+            "admitted": int(admitted),
+            "completed": int(completed),
+            "rejected": int(self._stats["rejected"]),
+            "timed_out": int(self._stats["timed_out"]),
+            "avg_wait_seconds": (
+                self._stats["wait_seconds_total"] / admitted if admitted else 0.0
+            ),
+            "max_wait_seconds": self._stats["wait_seconds_max"],
+            "avg_run_seconds": (
+                self._stats["run_seconds_total"] / completed if completed else 0.0
+            ),
+        }
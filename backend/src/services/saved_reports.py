@@ -0,0 +1,386 @@
+"""Saved reports, precomputed on a schedule or after table refreshes."""
+
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import random
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+import redis.asyncio as redis
+
+from src.config import settings
+from src.services.cron import CronSchedule
+from src.services.redis_client import get_redis
+from src.services.report_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+DEFINITIONS_KEY = "saved_reports:definitions"
+SCHEDULE_KEY = "saved_reports:schedule"
+# Why a report was moved forward ("table_refresh" or "manual"), until it runs
+TRIGGERS_KEY = "saved_reports:triggers"
+
+SavedReportHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def report_fingerprint(query_text: str, context: Optional[Dict[str, Any]]) -> str:
+    """Fingerprint a query and context the way ``/generate`` would see them."""
+    material = json.dumps(
+        {
+            "query": normalize_query(query_text),
+            "context": context or {},
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class SavedReportStore:
+    """Saved report definitions and their latest precomputed results.
+
+    A definition is a query and context with a cron ``schedule`` (wall clock
+    in ``saved_report_timezone``, e.g. ``"0 6 * * 1-5"`` for weekday
+    mornings) and the ``tables`` it reads. Definitions live in a Redis hash
+    and their next run times in a sorted set. ``run_scheduler`` loops in the
+    worker processes: a report runs when its time is due, or soon after one
+    of its tables is refreshed, and a claim key makes each run happen once
+    across workers. Run times get up to ``saved_report_jitter`` seconds of
+    random delay, so reports scheduled alike do not all start together.
+
+    Served results carry staleness metadata; a result is stale once one of
+    its tables changed after it was computed, or it is older than
+    ``saved_report_max_age``. ``/generate`` only serves fresh results.
+    """
+
+    def __init__(
+        self,
+        watermark_loader: Optional[Callable[[], Awaitable[Dict[str, int]]]] = None,
+    ):
+        """Initialize saved report store."""
+        self.redis_client = None
+        self.watermark_loader = watermark_loader
+        self.timezone = ZoneInfo(settings.saved_report_timezone)
+        self._last_modified: Dict[str, int] = {}
+        self._last_modified_checked_at = 0.0
+        self._slots = asyncio.Semaphore(settings.saved_report_max_concurrency)
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stats: Dict[str, int] = defaultdict(int)
+
+    async def _get_redis(self) -> redis.Redis:
+        """Get Redis client."""
+        if not self.redis_client:
+            self.redis_client = get_redis()
+        return self.redis_client
+
+    @staticmethod
+    def _result_key(report_id: str) -> str:
+        """Get the Redis key of a report's latest result."""
+        return f"saved_reports:result:{report_id}"
+
+    @staticmethod
+    def _query_key(fingerprint: str) -> str:
+        """Get the Redis key mapping a query fingerprint to a report."""
+        return f"saved_reports:query:{fingerprint}"
+
+    @staticmethod
+    def _claim_key(report_id: str, marker: Any) -> str:
+        """Get the Redis key claiming one run of a report."""
+        return f"saved_reports:claim:{report_id}:{marker}"
+
+    def _next_run(self, definition: Dict[str, Any], after: float) -> float:
+        """Next scheduled run time (epoch), with jitter."""
+        moment = datetime.datetime.fromtimestamp(after, self.timezone)
+        fire = CronSchedule(definition["schedule"]).next_after(moment)
+        return fire.timestamp() + random.uniform(0, settings.saved_report_jitter)
+
+    async def _get_last_modified(self) -> Dict[str, int]:
+        """Get each table's last-modified time, refreshed periodically."""
+        if self.watermark_loader is None:
+            return {}
+        now = time.monotonic()
+        if now - self._last_modified_checked_at >= settings.report_cache_watermark_ttl:
+            try:
+                self._last_modified = await self.watermark_loader()
+            except Exception as e:
+                logger.error(f"Error loading table last-modified times: {str(e)}")
+            self._last_modified_checked_at = now
+        return self._last_modified
+
+    async def _watermark(self, definition: Dict[str, Any]) -> Optional[int]:
+        """Latest modification time of the tables a report reads."""
+        last_modified = await self._get_last_modified()
+        tables = definition.get("tables") or list(last_modified)
+        return max(
+            (last_modified[table] for table in tables if table in last_modified),
+            default=None,
+        )
+
+    async def save(self, definition: Dict[str, Any]) -> Dict[str, Any]:
+        """Create or replace a definition and schedule its next run.
+
+        Raises ``ValueError`` if the schedule is not a valid cron expression.
+        """
+        CronSchedule(definition["schedule"])
+        report_id = definition.get("report_id") or str(uuid.uuid4())
+        definition = {**definition, "report_id": report_id}
+        client = await self._get_redis()
+        previous = await self.get(report_id)
+
+        async with client.pipeline(transaction=True) as pipe:
+            if previous is not None:
+                pipe.delete(
+                    self._query_key(
+                        report_fingerprint(previous["query"], previous.get("context"))
+                    )
+                )
+            pipe.hset(
+                DEFINITIONS_KEY,
+                report_id,
+                json.dumps(definition, ensure_ascii=False, default=str),
+            )
+            pipe.set(
+                self._query_key(
+                    report_fingerprint(definition["query"], definition.get("context"))
+                ),
+                report_id,
+            )
+            pipe.zadd(
+                SCHEDULE_KEY, {report_id: self._next_run(definition, time.time())}
+            )
+            await pipe.execute()
+        return definition
+
+    async def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        """Get a definition."""
+        client = await self._get_redis()
+        data = await client.hget(DEFINITIONS_KEY, report_id)
+        return json.loads(data) if data else None
+
+    async def list(self) -> List[Dict[str, Any]]:
+        """Get every definition with its next run time."""
+        client = await self._get_redis()
+        definitions = await client.hgetall(DEFINITIONS_KEY)
+        schedule = dict(await client.zrange(SCHEDULE_KEY, 0, -1, withscores=True))
+        return [
+            {**json.loads(data), "next_run_at": schedule.get(report_id)}
+            for report_id, data in sorted(definitions.items())
+        ]
+
+    async def delete(self, report_id: str) -> bool:
+        """Delete a definition and its stored result."""
+        definition = await self.get(report_id)
+        if definition is None:
+            return False
+        client = await self._get_redis()
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.hdel(DEFINITIONS_KEY, report_id)
+            pipe.hdel(TRIGGERS_KEY, report_id)
+            pipe.zrem(SCHEDULE_KEY, report_id)
+            pipe.delete(
+                self._result_key(report_id),
+                self._query_key(
+                    report_fingerprint(definition["query"], definition.get("context"))
+                ),
+            )
+            await pipe.execute()
+        return True
+
+    async def request_run(self, report_id: str) -> bool:
+        """Run a report on the next scheduler pass."""
+        if await self.get(report_id) is None:
+            return False
+        client = await self._get_redis()
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.hset(TRIGGERS_KEY, report_id, "manual")
+            pipe.zadd(SCHEDULE_KEY, {report_id: time.time()})
+            await pipe.execute()
+        return True
+
+    async def get_result(self, report_id: str) -> Optional[Dict[str, Any]]:
+        """Get a report's latest result, with staleness metadata."""
+        definition = await self.get(report_id)
+        if definition is None:
+            return None
+        client = await self._get_redis()
+        data = await client.get(self._result_key(report_id))
+        if data is None:
+            return None
+
+        stored = json.loads(data)
+        watermark = await self._watermark(definition)
+        computed_at = stored["computed_at"]
+        stale_reason = None
+        if (
+            watermark is not None
+            and stored["watermark"] is not None
+            and watermark > stored["watermark"]
+        ):
+            stale_reason = "tables_refreshed"
+        elif time.time() - computed_at > settings.saved_report_max_age:
+            stale_reason = "max_age"
+
+        result = stored["result"]
+        result.setdefault("metadata", {})["saved_report"] = {
+            "report_id": report_id,
+            "name": definition.get("name"),
+            "computed_at": computed_at,
+            "age_seconds": round(time.time() - computed_at, 3),
+            "trigger": stored["trigger"],
+            "tables_modified_at": stored["watermark"],
+            "stale": stale_reason is not None,
+            "stale_reason": stale_reason,
+            "next_run_at": await client.zscore(SCHEDULE_KEY, report_id),
+        }
+        return result
+
+    async def find_result(
+        self, query_text: str, context: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """Get the fresh precomputed result of a saved query, if any."""
+        try:
+            client = await self._get_redis()
+            report_id = await client.get(
+                self._query_key(report_fingerprint(query_text, context))
+            )
+            if report_id is None:
+                return None
+            result = await self.get_result(report_id)
+        except Exception as e:
+            logger.error(f"Error reading saved report: {str(e)}")
+            return None
+        if result is None or result["metadata"]["saved_report"]["stale"]:
+            return None
+        self._stats["served"] += 1
+        return result
+
+    async def _store_result(
+        self,
+        definition: Dict[str, Any],
+        result: Dict[str, Any],
+        watermark: Optional[int],
+        trigger: str,
+    ) -> None:
+        """Store a run's result."""
+        client = await self._get_redis()
+        await client.set(
+            self._result_key(definition["report_id"]),
+            json.dumps(
+                {
+                    "result": result,
+                    "computed_at": time.time(),
+                    "watermark": watermark,
+                    "trigger": trigger,
+                },
+                ensure_ascii=False,
+                default=str,
+            ),
+            ex=settings.saved_report_ttl,
+        )
+
+    async def _claim(self, report_id: str, marker: Any) -> bool:
+        """Claim one run across workers."""
+        client = await self._get_redis()
+        return bool(
+            await client.set(
+                self._claim_key(report_id, marker),
+                "1",
+                nx=True,
+                ex=settings.saved_report_claim_ttl,
+            )
+        )
+
+    async def _run(
+        self, definition: Dict[str, Any], handler: SavedReportHandler, trigger: str
+    ) -> None:
+        """Run one report within the concurrency limit and store the result."""
+        report_id = definition["report_id"]
+        client = await self._get_redis()
+        async with self._slots:
+            # Read before running, so a refresh during the run marks it stale
+            watermark = await self._watermark(definition)
+            started = time.time()
+            try:
+                result = await handler(definition)
+                if result.get("metadata", {}).get("error"):
+                    raise RuntimeError(result["metadata"].get("message", "error"))
+            except Exception as e:
+                self._stats["failed"] += 1
+                logger.error(f"Saved report {report_id} failed: {str(e)}")
+                retry_at = started + settings.saved_report_retry_delay
+                await client.zadd(SCHEDULE_KEY, {report_id: retry_at})
+                return
+
+            await self._store_result(definition, result, watermark, trigger)
+            self._stats["completed"] += 1
+            logger.info(
+                f"Saved report {report_id} computed in {time.time() - started:.1f}s"
+            )
+            await client.zadd(
+                SCHEDULE_KEY, {report_id: self._next_run(definition, time.time())}
+            )
+
+    async def _start(
+        self, definition: Dict[str, Any], handler: SavedReportHandler, trigger: str
+    ) -> None:
+        """Run a report in the background unless it is already running here."""
+        report_id = definition["report_id"]
+        if report_id in self._running:
+            return
+        task = asyncio.create_task(self._run(definition, handler, trigger))
+        self._running[report_id] = task
+        task.add_done_callback(lambda _: self._running.pop(report_id, None))
+
+    async def tick(self, handler: SavedReportHandler) -> None:
+        """Start due reports and schedule those whose tables were refreshed."""
+        client = await self._get_redis()
+        now = time.time()
+        definitions = {
+            definition["report_id"]: definition for definition in await self.list()
+        }
+
+        for report_id, score in await client.zrangebyscore(
+            SCHEDULE_KEY, "-inf", now, withscores=True
+        ):
+            definition = definitions.get(report_id)
+            if definition is None or not await self._claim(report_id, int(score)):
+                continue
+            trigger = await client.hget(TRIGGERS_KEY, report_id)
+            await client.hdel(TRIGGERS_KEY, report_id)
+            await self._start(definition, handler, trigger or "schedule")
+
+        for report_id, definition in definitions.items():
+            if report_id in self._running or not definition.get("refresh_on_update"):
+                continue
+            watermark = await self._watermark(definition)
+            data = await client.get(self._result_key(report_id))
+            computed = json.loads(data)["watermark"] if data else None
+            if watermark is None or (computed is not None and watermark <= computed):
+                continue
+            # One worker reschedules per refresh, jittered and never later
+            if await self._claim(report_id, f"tables:{watermark}"):
+                run_at = now + random.uniform(0, settings.saved_report_jitter)
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.hset(TRIGGERS_KEY, report_id, "table_refresh")
+                    pipe.zadd(SCHEDULE_KEY, {report_id: run_at}, lt=True)
+                    await pipe.execute()
+
+    async def run_scheduler(self, handler: SavedReportHandler) -> None:
+        """Run saved reports with ``handler`` forever."""
+        while True:
+            try:
+                await self.tick(handler)
+            except Exception as e:
+                logger.error(f"Saved report scheduler failed: {str(e)}")
+            await asyncio.sleep(settings.saved_report_poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get run counters for this worker."""
+        return {"running": len(self._running), **self._stats}
@@ -0,0 +1,236 @@
+"""Schema catalog of the semantic dataset for prompt injection."""
+
+import asyncio
+import logging
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from src.config import settings
+from src.services.bigquery_service import BigQueryService
+from src.services.rollups import GRAINS, PERIOD_COLUMN, SOURCE_ROWS_COLUMN
+
+logger = logging.getLogger(__name__)
+
+# Business terms analysts use, mapped to identifier fragments in the dataset
+KEYWORD_SYNONYMS = {
+    "meta": ["meta", "facebook", "fb", "instagram", "インスタ", "フェイスブック"],
+    "google": ["google", "グーグル", "gdn", "youtube"],
+    "ads": ["広告", "ads", "ad"],
+    "campaign": ["キャンペーン", "campaign"],
+    "client": ["クライアント", "顧客", "アカウント", "client", "account"],
+    "cost": ["費用", "コスト", "消化", "cost", "spend", "予算", "cpa", "cpc"],
+    "click": ["クリック", "click", "ctr", "cpc"],
+    "impression": ["表示", "インプレッション", "imp", "impression", "ctr", "cpm"],
+    "conversion": ["cv", "コンバージョン", "conversion", "成果", "cvr", "cpa"],
+    "revenue": ["売上", "revenue", "roas", "収益"],
+    "date": ["日", "週", "月", "推移", "トレンド", "date", "daily", "期間"],
+}
+
+_IDENTIFIER_PARTS = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate tokens: ~4 ASCII chars or ~1 Japanese char per token."""
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+class SchemaCatalog:
+    """In-memory catalog of table schemas, refreshed from last-modified times.
+
+    Lets the prompt carry the relevant schemas up front so the agent does not
+    spend turns and subprocesses on ``bq ls`` / ``bq show``. With a
+    ``rollup_loader``, ready rollup tables of the relevant fact tables are
+    listed first, so the agent reads those instead of scanning daily rows.
+    """
+
+    def __init__(
+        self,
+        bigquery_service: BigQueryService,
+        rollup_loader: Optional[Callable[[], Awaitable[List[Dict[str, Any]]]]] = None,
+    ):
+        """Initialize schema catalog."""
+        self.bigquery_service = bigquery_service
+        self.rollup_loader = rollup_loader
+        self.tables: Dict[str, Dict[str, Any]] = {}
+        self.rollups: List[Dict[str, Any]] = []
+        self.loaded_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loaded = asyncio.Event()
+
+    async def refresh(self) -> None:
+        """Load new or changed tables and drop removed ones."""
+        last_modified = await self.bigquery_service.get_table_last_modified()
+        changed = [
+            name
+            for name, modified in last_modified.items()
+            if self.tables.get(name, {}).get("last_modified") != modified
+        ]
+
+        schemas = await asyncio.gather(
+            *(self.bigquery_service.get_table_schema(name) for name in changed)
+        )
+        for name, columns in zip(changed, schemas):
+            self.tables[name] = {
+                "columns": columns,
+                "last_modified": last_modified[name],
+            }
+        for name in set(self.tables) - set(last_modified):
+            del self.tables[name]
+
+        if self.rollup_loader is not None:
+            try:
+                self.rollups = await self.rollup_loader()
+            except Exception as e:
+                logger.error(f"Failed to load rollup tables: {str(e)}")
+
+        self.loaded_at = time.time()
+        self._loaded.set()
+        if changed:
+            logger.info(f"Schema catalog refreshed {len(changed)} tables")
+
+    async def _refresh_periodically(self) -> None:
+        """Refresh the catalog every ``schema_refresh_interval`` seconds."""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to refresh schema catalog: {str(e)}")
+            await asyncio.sleep(settings.schema_refresh_interval)
+
+    async def wait_loaded(self) -> None:
+        """Wait for the first successful refresh."""
+        await self._loaded.wait()
+
+    def start(self) -> None:
+        """Start background loading and refresh."""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        """Stop background refresh."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def _query_terms(self, query_text: str) -> Set[str]:
+        """Expand a query into identifier fragments via keyword synonyms."""
+        text = unicodedata.normalize("NFKC", query_text).lower()
+        terms = set(_IDENTIFIER_PARTS.findall(text))
+        for canonical, synonyms in KEYWORD_SYNONYMS.items():
+            if any(synonym in text for synonym in synonyms):
+                terms.add(canonical)
+                terms.update(s for s in synonyms if s.isascii())
+        return terms
+
+    def _score(self, name: str, table: Dict[str, Any], terms: Set[str]) -> int:
+        """Score a table's relevance: table-name hits weigh more than columns."""
+        name_parts = set(_IDENTIFIER_PARTS.findall(name.lower()))
+        column_parts: Set[str] = set()
+        for column in table["columns"]:
+            column_parts.update(_IDENTIFIER_PARTS.findall(column["name"].lower()))
+        return 3 * len(name_parts & terms) + len(column_parts & terms)
+
+    def _render_table(self, name: str, table: Dict[str, Any]) -> str:
+        """Render one table as a compact schema line."""
+        columns = []
+        for column in table["columns"]:
+            entry = f"{column['name']} {column['type']}"
+            if column.get("description"):
+                entry += f" ({column['description']})"
+            columns.append(entry)
+        return f"- {name}: " + ", ".join(columns)
+
+    def _render_rollups(self, sources: Set[str], used: int, budget: int) -> List[str]:
+        """Render the rollups of ``sources`` that fit, one line per dimension set."""
+        groups: Dict[Tuple[str, Tuple[str, ...]], List[Dict[str, Any]]] = defaultdict(
+            list
+        )
+        for rollup in self.rollups:
+            if rollup["source"] in sources and rollup.get("last_date"):
+                groups[(rollup["source"], tuple(rollup["dimensions"]))].append(rollup)
+        if not groups:
+            return []
+
+        lines = [
+            "集計済みテーブル（元テーブルより低コスト。"
+            f"{PERIOD_COLUMN} は日・週（月曜始まり）・月の初日、指標は合計値、"
+            f"{SOURCE_ROWS_COLUMN} は元テーブルの行数。"
+            "CTR・CPA などの比率は合計値から計算すること）:"
+        ]
+        used += estimate_tokens(lines[0])
+        grain_order = list(GRAINS)
+        for (source, dimensions), rollups in sorted(groups.items()):
+            rollups.sort(key=lambda rollup: grain_order.index(rollup["grain"]))
+            first = rollups[0]
+            columns = [
+                f"{PERIOD_COLUMN} DATE",
+                *dimensions,
+                *first["measures"],
+                SOURCE_ROWS_COLUMN,
+            ]
+            line = (
+                f"- {source} の {', '.join(dimensions)} 別集計 "
+                f"({first['first_date']}〜{first['last_date']}): "
+                + ", ".join(
+                    f"{GRAINS[rollup['grain']]} `{rollup['table']}`"
+                    for rollup in rollups
+                )
+                + f" / 列: {', '.join(columns)}"
+            )
+            cost = estimate_tokens(line)
+            if used + cost > budget:
+                continue
+            lines.append(line)
+            used += cost
+        return lines if len(lines) > 1 else []
+
+    def render_digest(self, query_text: str, token_budget: Optional[int] = None) -> str:
+        """Render the schemas most relevant to a query within a token budget.
+
+        All table names are always listed; rollups of the matching tables
+        come next, then column lists for the best-matching tables until the
+        budget runs out.
+        """
+        if not self.tables:
+            return ""
+
+        budget = token_budget or settings.schema_digest_token_budget
+        terms = self._query_terms(query_text)
+        scored = [
+            (self._score(name, table, terms), name, table)
+            for name, table in self.tables.items()
+        ]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        # Only matching tables, unless nothing matched at all
+        ranked = [item for item in scored if item[0] > 0] or scored
+
+        dataset = f"{settings.bq_project_id}.{settings.bq_dataset_id}"
+        lines: List[str] = [
+            f"データセット {dataset} のテーブル: " + ", ".join(sorted(self.tables)),
+        ]
+        used = estimate_tokens(lines[0])
+        if self.rollups:
+            rollup_lines = self._render_rollups(
+                {name for _, name, _ in ranked}, used, budget
+            )
+            lines.extend(rollup_lines)
+            used += estimate_tokens("\n".join(rollup_lines))
+        lines.append("関連テーブルのスキーマ:")
+        used += estimate_tokens(lines[-1])
+        for _, name, table in ranked:
+            line = self._render_table(name, table)
+            cost = estimate_tokens(line)
+            if used + cost > budget:
+                continue
+            lines.append(line)
+            used += cost
+
+        return "\n".join(lines)
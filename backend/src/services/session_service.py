@@ -2,61 +2,122 @@
 
 import json
 import logging
-from typing import Any, Dict, Optional
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
 
+import msgpack
 import redis.asyncio as redis
 
 from src.config import settings
+from src.services import metrics
+from src.services.redis_client import get_redis
 
 logger = logging.getLogger(__name__)
 
+# First byte of a stored session; legacy JSON sessions start with "{"
+_PACKED = b"\x01"
+_PACKED_ZLIB = b"\x02"
+
+
+def encode_session(data: Dict[str, Any]) -> bytes:
+    """Encode a session as msgpack, zlib-compressed when large."""
+    packed = msgpack.packb(data, default=str)
+    if len(packed) > settings.session_compress_threshold:
+        return _PACKED_ZLIB + zlib.compress(packed)
+    return _PACKED + packed
+
+
+def decode_session(payload: bytes) -> Dict[str, Any]:
+    """Decode a session written by ``encode_session`` or as plain JSON."""
+    marker = payload[:1]
+    if marker == _PACKED:
+        return msgpack.unpackb(payload[1:])
+    if marker == _PACKED_ZLIB:
+        return msgpack.unpackb(zlib.decompress(payload[1:]))
+    return json.loads(payload)
+
 
 class SessionService:
-    """Service for managing user sessions."""
+    """Service for managing user sessions.
+
+    Sessions are stored compactly in Redis through the shared connection pool.
+    Reads go through a small in-process TTL + LRU cache that is updated on
+    every write from this worker; the short TTL bounds how stale a session
+    written by another worker can be.
+    """
 
     def __init__(self):
         """Initialize session service."""
         self.redis_client = None
-        self.session_ttl = 3600  # 1 hour
+        self.session_ttl = settings.session_ttl
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
 
     async def _get_redis(self) -> redis.Redis:
         """Get Redis client."""
         if not self.redis_client:
-            self.redis_client = await redis.from_url(
-                settings.redis_url, decode_responses=True
-            )
+            self.redis_client = get_redis(decode_responses=False)
         return self.redis_client
 
+    def _cache_get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session from the local cache."""
+        entry = self._local.get(session_id)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del self._local[session_id]
+            return None
+        self._local.move_to_end(session_id)
+        return dict(data)
+
+    def _cache_set(self, session_id: str, data: Dict[str, Any]) -> None:
+        """Put a session in the local cache, evicting the least recently used."""
+        expires_at = time.monotonic() + settings.session_local_cache_ttl
+        self._local[session_id] = (expires_at, dict(data))
+        self._local.move_to_end(session_id)
+        while len(self._local) > settings.session_local_cache_size:
+            self._local.popitem(last=False)
+
     async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
         """Get session data."""
+        cached = self._cache_get(session_id)
+        if cached is not None:
+            return cached
         try:
             client = await self._get_redis()
-            data = await client.get(f"session:{session_id}")
-            if data:
-                return json.loads(data)
+            with metrics.timed("session.get"):
+                payload = await client.get(f"session:{session_id}")
+            if payload:
+                data = decode_session(payload)
+                self._cache_set(session_id, data)
+                return dict(data)
             return None
         except Exception as e:
             logger.error(f"Error getting session: {str(e)}")
             return None
 
-    async def save_session(
-        self, session_id: str, data: Dict[str, Any]
-    ) -> None:
+    async def save_session(self, session_id: str, data: Dict[str, Any]) -> None:
         """Save session data."""
+        self._cache_set(session_id, data)
         try:
             client = await self._get_redis()
-            await client.setex(
-                f"session:{session_id}",
-                self.session_ttl,
-                json.dumps(data, ensure_ascii=False),
-            )
+            with metrics.timed("session.save"):
+                await client.setex(
+                    f"session:{session_id}",
+                    self.session_ttl,
+                    encode_session(data),
+                )
         except Exception as e:
+            self._local.pop(session_id, None)
             logger.error(f"Error saving session: {str(e)}")
 
     async def delete_session(self, session_id: str) -> None:
         """Delete session data."""
+        self._local.pop(session_id, None)
         try:
             client = await self._get_redis()
             await client.delete(f"session:{session_id}")
         except Exception as e:
-            logger.error(f"Error deleting session: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error deleting session: {str(e)}")
@@ -0,0 +1,319 @@
+"""Single-flight coalescing of identical concurrent calls."""
+
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+import redis.asyncio as redis
+
+from src.config import settings
+from src.services.query_cache import decode_entry, encode_entry
+from src.services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Seconds a shared result stays readable after the leader finishes
+RESULT_TTL = 60
+
+# Delete the lock only if we still own it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Extend the lock, and the follower count with it, while we still own it
+_EXTEND_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    redis.call("pexpire", KEYS[2], ARGV[2])
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Count a follower, as long as the leader it waits for still holds the lock
+_JOIN_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    redis.call("incr", KEYS[2])
+    redis.call("pexpire", KEYS[2], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# Release the lock unless someone follows: 0 released, 1 followed, -1 lost
+_FINISH_SCRIPT = """
+if redis.call("get", KEYS[1]) ~= ARGV[1] then
+    return -1
+end
+if redis.call("exists", KEYS[2]) == 1 then
+    return 1
+end
+redis.call("del", KEYS[1])
+return 0
+"""
+
+
+@dataclass
+class _Call:
+    """An in-flight call shared by local waiters."""
+
+    task: "asyncio.Task[Any]"
+    waiters: int = field(default=0)
+
+
+class SingleFlight:
+    """Share one execution between identical concurrent calls.
+
+    Within a worker, callers with the same key await the same task. Across
+    workers, a Redis lock elects a leader, extended while the leader runs;
+    other workers register as followers and wait for the leader's result.
+    The leader only writes its result when someone follows, encoded like
+    query cache entries and under the same size cap. Followers are woken
+    through one pub/sub subscription per worker, with polling as backup.
+
+    Waiters are cancel-safe: a cancelled waiter never cancels the shared
+    execution unless it was the last one waiting. If the leader fails, or
+    its result is too large to share, its local waiters get its outcome and
+    remote followers retry, so one of them takes over.
+    """
+
+    def __init__(self, namespace: str, timeout: float, max_attempts: int = 3):
+        """Initialize single-flight group.
+
+        ``timeout`` is the lease of the leader lock, renewed while the leader
+        runs, so a leader that dies stops blocking followers after it.
+        """
+        self.namespace = namespace
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.redis_client = None
+        self._calls: Dict[str, _Call] = {}
+        # Leader tokens followed in this worker -> events set when they finish
+        self._watchers: Dict[str, Set[asyncio.Event]] = {}
+        self._listen_task: Optional[asyncio.Task] = None
+
+    async def _get_redis(self) -> redis.Redis:
+        """Get Redis client."""
+        if not self.redis_client:
+            self.redis_client = get_redis(decode_responses=False)
+        return self.redis_client
+
+    def _lock_key(self, key: str) -> str:
+        """Get the Redis key of the leader lock."""
+        return f"singleflight:{self.namespace}:{key}:lock"
+
+    def _followers_key(self, token: str) -> str:
+        """Get the Redis key counting a leader's followers."""
+        return f"singleflight:{self.namespace}:followers:{token}"
+
+    def _result_key(self, token: str) -> str:
+        """Get the Redis key of a leader's result."""
+        return f"singleflight:{self.namespace}:result:{token}"
+
+    @property
+    def _channel(self) -> str:
+        """Get the channel announcing finished leaders by token."""
+        return f"singleflight:{self.namespace}:done"
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``func`` once for all concurrent callers with the same key."""
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.create_task(self._execute(key, func))
+            call = _Call(task=task)
+            self._calls[key] = call
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            logger.info(f"Joining in-flight {self.namespace} call {key[:12]}")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    async def _execute(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Lead the call across workers, or follow another worker's leader."""
+        for _ in range(self.max_attempts):
+            token = uuid.uuid4().hex
+            outcome = None
+            try:
+                client = await self._get_redis()
+                acquired = await client.set(
+                    self._lock_key(key),
+                    token,
+                    nx=True,
+                    px=int(self.timeout * 1000),
+                )
+                if not acquired:
+                    outcome = await self._follow(client, key)
+            except redis.RedisError as e:
+                logger.error(
+                    f"Single-flight Redis unavailable, running locally: {str(e)}"
+                )
+                return await func()
+
+            if acquired:
+                return await self._lead(client, key, token, func)
+            if outcome is not None and outcome["status"] == "ok":
+                return outcome["result"]
+            # The leader failed, vanished or could not share; try to take over
+
+        return await func()
+
+    async def _lead(
+        self,
+        client: redis.Redis,
+        key: str,
+        token: str,
+        func: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Run the call, holding the lock, and share its outcome if followed."""
+        keeper = asyncio.create_task(self._keep_lock(client, key, token))
+        try:
+            result = await func()
+            outcome = {"status": "ok", "result": result}
+            return result
+        except BaseException as e:
+            outcome = {"status": "error", "message": str(e)}
+            raise
+        finally:
+            keeper.cancel()
+            try:
+                await self._finish(client, key, token, outcome)
+            except Exception as e:
+                logger.error(f"Failed to publish single-flight result: {str(e)}")
+
+    async def _keep_lock(self, client: redis.Redis, key: str, token: str) -> None:
+        """Renew the lock lease until cancelled, or until it is lost."""
+        lease_ms = int(self.timeout * 1000)
+        try:
+            while True:
+                await asyncio.sleep(self.timeout / 3)
+                extended = await client.eval(
+                    _EXTEND_LOCK_SCRIPT,
+                    2,
+                    self._lock_key(key),
+                    self._followers_key(token),
+                    token,
+                    lease_ms,
+                )
+                if not extended:
+                    logger.warning(f"Lost {self.namespace} leader lock {key[:12]}")
+                    return
+        except redis.RedisError as e:
+            logger.error(f"Failed to extend single-flight lock: {str(e)}")
+
+    async def _finish(
+        self, client: redis.Redis, key: str, token: str, outcome: Dict[str, Any]
+    ) -> None:
+        """Release the lock, writing the outcome first if anyone follows."""
+        followed = await client.eval(
+            _FINISH_SCRIPT, 2, self._lock_key(key), self._followers_key(token), token
+        )
+        if followed == 0:
+            return
+
+        try:
+            payload = encode_entry(outcome)
+        except TypeError as e:
+            logger.error(f"Cannot share {self.namespace} result: {str(e)}")
+            payload = encode_entry({"status": "unshared"})
+        if len(payload) > settings.query_cache_max_entry_bytes:
+            # Followers run the call themselves rather than pull it through Redis
+            payload = encode_entry({"status": "unshared"})
+
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.set(self._result_key(token), payload, ex=RESULT_TTL)
+            pipe.publish(self._channel, token)
+            pipe.eval(_RELEASE_LOCK_SCRIPT, 1, self._lock_key(key), token)
+            pipe.delete(self._followers_key(token))
+            await pipe.execute()
+
+    async def _follow(self, client: redis.Redis, key: str) -> Optional[Dict[str, Any]]:
+        """Wait for another worker's leader; None if it went away."""
+        lock = await client.get(self._lock_key(key))
+        if lock is None:
+            return None
+        token = lock.decode()
+        joined = await client.eval(
+            _JOIN_SCRIPT,
+            2,
+            self._lock_key(key),
+            self._followers_key(token),
+            token,
+            int(self.timeout * 1000),
+        )
+        if not joined:
+            return None
+
+        logger.info(f"Waiting for {self.namespace} leader {token[:12]}")
+        finished = self._watch(token)
+        try:
+            # The leader's lock lease bounds the wait
+            while True:
+                data = await client.get(self._result_key(token))
+                if data is not None:
+                    return decode_entry(data)
+                if await client.get(self._lock_key(key)) != lock:
+                    # Lock expired or released; the result may just have landed
+                    data = await client.get(self._result_key(token))
+                    return decode_entry(data) if data is not None else None
+                try:
+                    await asyncio.wait_for(finished.wait(), timeout=1.0)
+                except TimeoutError:
+                    pass
+        finally:
+            self._unwatch(token, finished)
+
+    def _watch(self, token: str) -> asyncio.Event:
+        """Get an event set when the leader with ``token`` finishes."""
+        if self._listen_task is None or self._listen_task.done():
+            self._listen_task = asyncio.create_task(self._listen())
+        event = asyncio.Event()
+        self._watchers.setdefault(token, set()).add(event)
+        return event
+
+    def _unwatch(self, token: str, event: asyncio.Event) -> None:
+        """Stop watching a leader."""
+        events = self._watchers.get(token)
+        if events is not None:
+            events.discard(event)
+            if not events:
+                del self._watchers[token]
+
+    async def _listen(self) -> None:
+        """Wake local followers as leaders announce their results."""
+        while True:
+            pubsub = None
+            try:
+                client = await self._get_redis()
+                pubsub = client.pubsub()
+                await pubsub.subscribe(self._channel)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    for event in self._watchers.get(message["data"].decode(), ()):
+                        event.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Single-flight listener failed: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    await pubsub.aclose()
+
+    def close(self) -> None:
+        """Stop listening for other workers' results."""
+        if self._listen_task is not None:
+            self._listen_task.cancel()
+            self._listen_task = None
@@ -0,0 +1,500 @@
+"""Streaming export of query results to CSV, XLSX and Parquet.
+
+Writers turn pages of row tuples into chunks of the output file as they
+arrive, so an export holds one page (plus, for Parquet, one row group) in
+memory regardless of its size.
+"""
+
+import asyncio
+import csv
+import datetime
+import io
+import json
+import math
+import re
+import zipfile
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from google.cloud import bigquery
+
+from src.config import settings
+from src.services.bigquery_service import RowPages
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional: pip install growth-force-backend[columnar]
+    pyarrow = None
+
+EXPORT_FORMATS = ("csv", "xlsx", "parquet")
+
+Row = Tuple[Any, ...]
+
+# BigQuery types by legacy and standard SQL name
+_INTEGER_TYPES = {"INTEGER", "INT64"}
+_FLOAT_TYPES = {"FLOAT", "FLOAT64"}
+_NUMERIC_TYPES = _INTEGER_TYPES | _FLOAT_TYPES | {"NUMERIC", "BIGNUMERIC"}
+_BOOLEAN_TYPES = {"BOOLEAN", "BOOL"}
+_NESTED_TYPES = {"RECORD", "STRUCT", "JSON"}
+
+
+def _is_nested(field: bigquery.SchemaField) -> bool:
+    """Whether a column holds lists or records, exported as JSON text."""
+    return field.mode == "REPEATED" or field.field_type in _NESTED_TYPES
+
+
+def _to_json(value: Any) -> Optional[str]:
+    """Serialize a nested value as JSON text."""
+    if value is None:
+        return None
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def check_format(export_format: str) -> None:
+    """Raise ValueError if the format is unknown or needs a missing library."""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    if export_format == "parquet" and pyarrow is None:
+        raise ValueError("Parquet export requires pyarrow (the columnar extra)")
+
+
+class _Sink(io.RawIOBase):
+    """Write-only, non-seekable file collecting bytes until drained."""
+
+    def __init__(self):
+        """Initialize sink."""
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        """The sink is writable."""
+        return True
+
+    def write(self, data: Any) -> int:
+        """Collect bytes."""
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        """Bytes written so far."""
+        return self._position
+
+    def drain(self) -> bytes:
+        """Take the bytes written since the last drain."""
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ExportWriter:
+    """Encode pages of rows into an export file, chunk by chunk."""
+
+    media_type = "application/octet-stream"
+    extension = "bin"
+
+    def __init__(self, schema: List[bigquery.SchemaField]):
+        """Initialize writer."""
+        self.schema = schema
+
+    def write(self, rows: List[Row]) -> bytes:
+        """Encode a page of rows, returning the bytes ready to send."""
+        raise NotImplementedError
+
+    def finish(self) -> bytes:
+        """Return the remaining bytes that end the file."""
+        raise NotImplementedError
+
+
+class CsvWriter(ExportWriter):
+    """UTF-8 CSV with a BOM, so Excel detects the encoding of Japanese text."""
+
+    media_type = "text/csv; charset=utf-8"
+    extension = "csv"
+
+    def __init__(self, schema: List[bigquery.SchemaField]):
+        """Initialize writer and write the header."""
+        super().__init__(schema)
+        self._nested = [i for i, field in enumerate(schema) if _is_nested(field)]
+        self._buffer = io.StringIO()
+        self._buffer.write("\ufeff")
+        self._writer = csv.writer(self._buffer, lineterminator="\r\n")
+        self._writer.writerow([field.name for field in schema])
+
+    def _drain(self) -> bytes:
+        """Take the encoded text written so far."""
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def write(self, rows: List[Row]) -> bytes:
+        """Encode a page of rows."""
+        if self._nested:
+            rows = [self._flatten(row) for row in rows]
+        self._writer.writerows(rows)
+        return self._drain()
+
+    def _flatten(self, row: Row) -> List[Any]:
+        """Replace nested values with JSON text."""
+        values = list(row)
+        for i in self._nested:
+            values[i] = _to_json(values[i])
+        return values
+
+    def finish(self) -> bytes:
+        """Return the header of an empty result, if not sent yet."""
+        return self._drain()
+
+
+# Characters XML 1.0 does not allow, even escaped
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+_EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+_EXCEL_DATE_STYLE = 1
+_EXCEL_DATETIME_STYLE = 2
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" '
+    'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    "{sheets}</Types>"
+)
+_XLSX_SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" ContentType="application/'
+    'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+    'relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats'
+    '.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    "<sheets>{sheets}</sheets></workbook>"
+)
+_XLSX_WORKBOOK_SHEET = '<sheet name="{name}" sheetId="{index}" r:id="rId{index}"/>'
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+    'relationships">{sheets}<Relationship Id="rId{styles}" Type="http://schemas'
+    '.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/></Relationships>'
+)
+_XLSX_WORKBOOK_SHEET_REL = (
+    '<Relationship Id="rId{index}" Type="http://schemas.openxmlformats.org/'
+    'officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{index}.xml"/>'
+)
+# Cell styles: 0 general, 1 date (yyyy-mm-dd), 2 date and time
+_XLSX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="2"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/>'
+    '<numFmt numFmtId="165" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/>'
+    "</border></borders>"
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/>'
+    '</cellStyleXfs><cellXfs count="3">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" '
+    'applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" '
+    'applyNumberFormat="1"/>'
+    "</cellXfs>"
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/>'
+    "</cellStyles></styleSheet>"
+)
+_XLSX_SHEET_START = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    b"<sheetData>"
+)
+_XLSX_SHEET_END = b"</sheetData></worksheet>"
+
+
+def _xlsx_text(value: Any) -> str:
+    """An inline string cell."""
+    text = escape(_XML_ILLEGAL.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_number(value: Any) -> str:
+    """A number cell; NaN and infinities, which Excel lacks, become text."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return _xlsx_text(value)
+    return f"<c><v>{value}</v></c>"
+
+
+def _xlsx_boolean(value: Any) -> str:
+    """A boolean cell."""
+    return f'<c t="b"><v>{int(value)}</v></c>'
+
+
+def _xlsx_date(value: datetime.date) -> str:
+    """A date cell, as a serial day number."""
+    days = (value - _EXCEL_EPOCH.date()).days
+    return f'<c s="{_EXCEL_DATE_STYLE}"><v>{days}</v></c>'
+
+
+def _xlsx_datetime(value: datetime.datetime) -> str:
+    """A date and time cell, as a fractional serial day number."""
+    serial = (value - _EXCEL_EPOCH) / datetime.timedelta(days=1)
+    return f'<c s="{_EXCEL_DATETIME_STYLE}"><v>{serial!r}</v></c>'
+
+
+def _xlsx_json(value: Any) -> str:
+    """A nested value as JSON text."""
+    return _xlsx_text(_to_json(value))
+
+
+def _xlsx_cell_writer(field: bigquery.SchemaField) -> Callable[[Any], str]:
+    """Pick how a column's values become cells.
+
+    TIMESTAMP columns stay ISO text: Excel has no time zones.
+    """
+    if _is_nested(field):
+        return _xlsx_json
+    if field.field_type in _NUMERIC_TYPES:
+        return _xlsx_number
+    if field.field_type in _BOOLEAN_TYPES:
+        return _xlsx_boolean
+    if field.field_type == "DATE":
+        return _xlsx_date
+    if field.field_type == "DATETIME":
+        return _xlsx_datetime
+    return _xlsx_text
+
+
+class XlsxWriter(ExportWriter):
+    """Office Open XML workbook written as a stream of ZIP entries.
+
+    Cells use inline strings instead of a shared string table, which would
+    have to be held until the end. Rows past Excel's limit continue on
+    further sheets, each repeating the header.
+    """
+
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    extension = "xlsx"
+    max_rows_per_sheet = 1048576
+
+    def __init__(self, schema: List[bigquery.SchemaField]):
+        """Initialize writer and start the first sheet."""
+        super().__init__(schema)
+        self._cells = [_xlsx_cell_writer(field) for field in schema]
+        self._header = (
+            "<row>" + "".join(_xlsx_text(field.name) for field in schema) + "</row>"
+        ).encode("utf-8")
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, "w", zipfile.ZIP_DEFLATED)
+        self._sheets = 0
+        self._sheet: Any = None
+        self._sheet_rows = 0
+        self._start_sheet()
+
+    def _start_sheet(self) -> None:
+        """Close the current sheet and open the next one."""
+        if self._sheet is not None:
+            self._sheet.write(_XLSX_SHEET_END)
+            self._sheet.close()
+        self._sheets += 1
+        self._sheet = self._zip.open(
+            f"xl/worksheets/sheet{self._sheets}.xml", "w", force_zip64=True
+        )
+        self._sheet.write(_XLSX_SHEET_START + self._header)
+        self._sheet_rows = 1
+
+    def _encode(self, rows: List[Row]) -> bytes:
+        """Encode rows as sheet XML."""
+        cells = self._cells
+        parts = []
+        for row in rows:
+            parts.append("<row>")
+            for cell, value in zip(cells, row):
+                parts.append("<c/>" if value is None else cell(value))
+            parts.append("</row>")
+        return "".join(parts).encode("utf-8")
+
+    def write(self, rows: List[Row]) -> bytes:
+        """Encode a page of rows, starting new sheets as they fill up."""
+        offset = 0
+        while offset < len(rows):
+            if self._sheet_rows == self.max_rows_per_sheet:
+                self._start_sheet()
+            count = min(len(rows) - offset, self.max_rows_per_sheet - self._sheet_rows)
+            self._sheet.write(self._encode(rows[offset : offset + count]))
+            self._sheet_rows += count
+            offset += count
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        """Close the last sheet and write the workbook parts."""
+        self._sheet.write(_XLSX_SHEET_END)
+        self._sheet.close()
+        indices = range(1, self._sheets + 1)
+        parts = {
+            "[Content_Types].xml": _XLSX_CONTENT_TYPES.format(
+                sheets="".join(
+                    _XLSX_SHEET_CONTENT_TYPE.format(index=i) for i in indices
+                )
+            ),
+            "_rels/.rels": _XLSX_ROOT_RELS,
+            "xl/workbook.xml": _XLSX_WORKBOOK.format(
+                sheets="".join(
+                    _XLSX_WORKBOOK_SHEET.format(name=f"Sheet{i}", index=i)
+                    for i in indices
+                )
+            ),
+            "xl/_rels/workbook.xml.rels": _XLSX_WORKBOOK_RELS.format(
+                sheets="".join(
+                    _XLSX_WORKBOOK_SHEET_REL.format(index=i) for i in indices
+                ),
+                styles=self._sheets + 1,
+            ),
+            "xl/styles.xml": _XLSX_STYLES,
+        }
+        for name, content in parts.items():
+            self._zip.writestr(name, content)
+        self._zip.close()
+        return self._sink.drain()
+
+
+def _to_text(value: Any) -> Optional[str]:
+    """Format a value Arrow has no matching type for as text."""
+    return None if value is None else str(value)
+
+
+def _arrow_column(field: bigquery.SchemaField) -> Tuple[Any, Optional[Callable]]:
+    """Arrow type of a BigQuery column and the conversion its values need.
+
+    Nested values become JSON text, and types without an Arrow match
+    (GEOGRAPHY, INTERVAL) plain text.
+    """
+    if _is_nested(field):
+        return pyarrow.string(), _to_json
+    types: Dict[str, Any] = {
+        "STRING": pyarrow.string(),
+        "INTEGER": pyarrow.int64(),
+        "INT64": pyarrow.int64(),
+        "FLOAT": pyarrow.float64(),
+        "FLOAT64": pyarrow.float64(),
+        "NUMERIC": pyarrow.decimal128(38, 9),
+        "BIGNUMERIC": pyarrow.decimal256(76, 38),
+        "BOOLEAN": pyarrow.bool_(),
+        "BOOL": pyarrow.bool_(),
+        "DATE": pyarrow.date32(),
+        "DATETIME": pyarrow.timestamp("us"),
+        "TIMESTAMP": pyarrow.timestamp("us", tz="UTC"),
+        "TIME": pyarrow.time64("us"),
+        "BYTES": pyarrow.binary(),
+    }
+    arrow_type = types.get(field.field_type)
+    if arrow_type is None:
+        return pyarrow.string(), _to_text
+    return arrow_type, None
+
+
+class ParquetWriter(ExportWriter):
+    """Parquet file with row groups of ``export_parquet_row_group_size`` rows.
+
+    Pages are converted to Arrow batches at once and buffered only until a
+    row group is full.
+    """
+
+    media_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+
+    def __init__(self, schema: List[bigquery.SchemaField]):
+        """Initialize writer."""
+        super().__init__(schema)
+        columns = [_arrow_column(field) for field in schema]
+        self._arrow_schema = pyarrow.schema(
+            [
+                pyarrow.field(field.name, arrow_type)
+                for field, (arrow_type, _) in zip(schema, columns)
+            ]
+        )
+        self._conversions = [convert for _, convert in columns]
+        self._sink = _Sink()
+        self._writer = pyarrow.parquet.ParquetWriter(
+            self._sink, self._arrow_schema, compression="snappy"
+        )
+        self._batches: List[Any] = []
+        self._buffered_rows = 0
+
+    def _to_batch(self, rows: List[Row]) -> Any:
+        """Convert rows to an Arrow record batch."""
+        columns = zip(*rows)
+        arrays = []
+        for field, convert, values in zip(
+            self._arrow_schema, self._conversions, columns
+        ):
+            if convert is not None:
+                values = [convert(value) for value in values]
+            arrays.append(pyarrow.array(values, type=field.type))
+        return pyarrow.RecordBatch.from_arrays(arrays, schema=self._arrow_schema)
+
+    def _flush(self) -> None:
+        """Write the buffered batches as one row group."""
+        if self._batches:
+            table = pyarrow.Table.from_batches(self._batches, schema=self._arrow_schema)
+            self._writer.write_table(table, row_group_size=self._buffered_rows)
+            self._batches = []
+            self._buffered_rows = 0
+
+    def write(self, rows: List[Row]) -> bytes:
+        """Buffer a page, writing a row group once enough rows are buffered."""
+        if rows:
+            self._batches.append(self._to_batch(rows))
+            self._buffered_rows += len(rows)
+        if self._buffered_rows >= settings.export_parquet_row_group_size:
+            self._flush()
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        """Write the last row group and the footer."""
+        self._flush()
+        self._writer.close()
+        return self._sink.drain()
+
+
+_WRITERS = {"csv": CsvWriter, "xlsx": XlsxWriter, "parquet": ParquetWriter}
+
+
+def create_writer(
+    export_format: str, schema: List[bigquery.SchemaField]
+) -> ExportWriter:
+    """Create the writer for a format; see ``check_format``."""
+    check_format(export_format)
+    return _WRITERS[export_format](schema)
+
+
+async def stream_export(writer: ExportWriter, pages: RowPages) -> AsyncIterator[bytes]:
+    """Yield the export file chunk by chunk as pages arrive.
+
+    Encoding runs in a thread so large pages do not block the event loop,
+    while the next page is fetched.
+    """
+    try:
+        async for rows in pages:
+            data = await asyncio.to_thread(writer.write, rows)
+            if data:
+                yield data
+        yield await asyncio.to_thread(writer.finish)
+    finally:
+        await pages.aclose()
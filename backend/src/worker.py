@@ -0,0 +1,72 @@
+"""Report job worker.
+
+Run one or more of these next to the API to process queued report jobs,
+precompute saved reports and refresh rollup tables::
+
+    uv run python -m src.worker
+
+Each process runs ``report_job_worker_concurrency`` jobs and
+``saved_report_max_concurrency`` saved reports at a time; scale out by
+starting more processes. Only one process refreshes rollups at a time.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict
+
+from src.api import reports
+from src.config import settings
+from src.container import container
+
+# Configure logging
+logging.basicConfig(level=settings.log_level)
+logger = logging.getLogger(__name__)
+
+
+async def handle_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a queued report request."""
+    request = reports.ReportJobRequest(**payload)
+    async with asyncio.timeout(settings.claude_timeout):
+        return await reports.run_report(request)
+
+
+async def handle_saved_report(definition: Dict[str, Any]) -> Dict[str, Any]:
+    """Precompute a saved report."""
+    async with asyncio.timeout(settings.claude_timeout):
+        return await reports.analyze_report(
+            definition["query"],
+            f"saved-report:{definition['report_id']}",
+            dict(definition.get("context") or {}),
+            priority="scheduled",
+            # Table pages outlive the stored result, which is written after the run
+            table_ttl=settings.saved_report_ttl + settings.claude_timeout,
+        )
+
+
+async def main() -> None:
+    """Run job workers, the reaper, saved reports and rollups until cancelled."""
+    logger.info(
+        f"Starting report worker with {settings.report_job_worker_concurrency} slots"
+    )
+    await container.start()
+
+    queue = container.report_jobs
+    loops = [
+        queue.run_reaper(),
+        *(
+            queue.run_worker(handle_job)
+            for _ in range(settings.report_job_worker_concurrency)
+        ),
+    ]
+    if settings.saved_reports_enabled:
+        loops.append(container.saved_reports.run_scheduler(handle_saved_report))
+    if settings.rollups_enabled:
+        loops.append(container.rollups.run_refresher())
+    try:
+        await asyncio.gather(*loops)
+    finally:
+        await container.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
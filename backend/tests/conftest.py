@@ -0,0 +1,30 @@
+"""Run the app's services on the local stand-ins from ``benchmarks/fakes.py``."""
+
+from typing import AsyncIterator, Tuple
+
+import pytest
+
+from benchmarks import fakes
+
+# Before anything under src reads the settings
+fakes.configure_environment()
+
+from src.container import container  # noqa: E402
+
+
+@pytest.fixture
+async def services() -> (
+    AsyncIterator[Tuple[fakes.FakeClaude, fakes.FakeBigQueryClient]]
+):
+    """Fake Claude Code, BigQuery and Redis behind a fresh service container."""
+    fake, client = fakes.install(
+        first_message_latency=0.0,
+        message_latency=0.0,
+        job_latency=0.0,
+        token_latency=0.0,
+    )
+    yield fake, client
+    await container.stop()
+    # Drop the built services so the next test starts from scratch
+    container.__dict__.clear()
+    container.__init__()
@@ -0,0 +1,152 @@
+"""BigQuery client calls run off the event loop and cancel their jobs."""
+
+import asyncio
+import time
+from typing import Any, List
+
+import httpx
+import pytest
+
+from src.config import settings
+from src.container import container
+from src.main import app
+
+SQL = (
+    "SELECT date, cost FROM "
+    "`growth-force-project.semantic.fact_meta_ad_performance_daily` LIMIT {rows}"
+)
+
+
+@pytest.fixture
+def jobs(services, monkeypatch: pytest.MonkeyPatch) -> List[Any]:
+    """Query jobs started on the fake client, without result sharing."""
+    _, client = services
+    monkeypatch.setattr(settings, "query_cache_enabled", False)
+    monkeypatch.setattr(settings, "single_flight_enabled", False)
+    monkeypatch.setattr(settings, "bigquery_poll_interval", 0.01)
+    started: List[Any] = []
+    query = client.query
+
+    def record(sql: str, job_config: Any = None) -> Any:
+        job = query(sql, job_config=job_config)
+        if not getattr(job_config, "dry_run", False):
+            started.append(job)
+        return job
+
+    monkeypatch.setattr(client, "query", record)
+    return started
+
+
+async def test_health_is_served_while_a_query_runs(services, jobs) -> None:
+    _, client = services
+    client.job_latency = 0.5
+    query = asyncio.create_task(
+        container.bigquery_service.execute_query(SQL.format(rows=10))
+    )
+    await asyncio.sleep(0.05)
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as http:
+        for _ in range(5):
+            started = time.perf_counter()
+            response = await http.get("/health")
+            assert response.status_code == 200
+            assert time.perf_counter() - started < 0.1
+    assert not query.done()
+
+    assert len(await query) == 10
+
+
+async def test_cancelled_call_cancels_the_job(services, jobs) -> None:
+    _, client = services
+    client.job_latency = 5.0
+    query = asyncio.create_task(
+        container.bigquery_service.execute_query(SQL.format(rows=10))
+    )
+    await asyncio.sleep(0.05)
+
+    query.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await query
+    assert [job.cancelled for job in jobs] == [True]
+
+
+async def test_timeout_cancels_the_job(services, jobs, monkeypatch) -> None:
+    _, client = services
+    client.job_latency = 5.0
+    monkeypatch.setattr(settings, "bigquery_timeout", 0.1)
+
+    with pytest.raises(TimeoutError):
+        await container.bigquery_service.execute_query(SQL.format(rows=10))
+    assert [job.cancelled for job in jobs] == [True]
+
+
+async def test_concurrent_queries_are_bounded(services, jobs, monkeypatch) -> None:
+    _, client = services
+    client.job_latency = 0.1
+    monkeypatch.setattr(settings, "bigquery_max_concurrent_queries", 1)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        container.bigquery_service.execute_query(SQL.format(rows=10)),
+        container.bigquery_service.execute_query(SQL.format(rows=20)),
+    )
+
+    assert time.perf_counter() - started >= 0.2
+    assert len(jobs) == 2
+
+
+async def test_partition_lookup_passes_the_table_name_as_a_parameter(
+    services, jobs
+) -> None:
+    _, client = services
+    queries: List[Any] = []
+    query = client.query
+
+    def record(sql: str, job_config: Any = None) -> Any:
+        queries.append((sql, job_config))
+        return query(sql, job_config=job_config)
+
+    client.query = record
+    service = container.bigquery_service
+
+    partitions = await service.get_partition_last_modified(
+        "fact_meta_ad_performance_daily"
+    )
+    injected = await service.get_partition_last_modified(
+        "fact_meta_ad_performance_daily' OR TRUE --"
+    )
+
+    assert len(partitions) == 366
+    assert injected == {}
+    for sql, job_config in queries:
+        assert "fact_meta" not in sql
+        assert "@table_name" in sql
+        (parameter,) = job_config.query_parameters
+        assert parameter.name == "table_name"
+
+
+async def test_single_flight_keeps_literals_apart(
+    services, jobs, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _, client = services
+    client.job_latency = 0.1
+    monkeypatch.setattr(settings, "single_flight_enabled", True)
+    query = (
+        "SELECT date, cost FROM "
+        "`growth-force-project.semantic.fact_meta_ad_performance_daily` "
+        "WHERE campaign_name = {name} LIMIT 10"
+    )
+    service = container.bigquery_service
+
+    await asyncio.gather(
+        service.execute_query_columnar(query.format(name="'a  b'")),
+        service.execute_query_columnar(query.format(name="'a b'")),
+        service.execute_query_columnar(
+            query.format(name="'a b'").replace("SELECT ", "SELECT\n  ")
+        ),
+    )
+
+    # The last query only differs from the second in layout
+    assert len(jobs) == 2
@@ -0,0 +1,133 @@
+"""Token validation and refresh over a mock HTTP transport."""
+
+import asyncio
+import time
+from typing import List
+
+import httpx
+import pytest
+
+from benchmarks import fakes
+from src.services.claude_auth_service import ClaudeAuthService
+from src.services.credential_store import ClaudeCredentials, CredentialStore
+
+
+class AnthropicStub:
+    """Answers token validation and refresh like the Anthropic API."""
+
+    def __init__(self, valid_tokens: List[str]):
+        """Initialize stub."""
+        self.valid_tokens = set(valid_tokens)
+        self.requests: List[httpx.Request] = []
+        self.refreshed = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        """Serve one request."""
+        self.requests.append(request)
+        if request.url.path == "/v1/models":
+            token = request.headers["Authorization"].removeprefix("Bearer ")
+            return httpx.Response(200 if token in self.valid_tokens else 401)
+        if request.url.path == "/auth/refresh":
+            # Slow enough for concurrent callers to overlap
+            await asyncio.sleep(0.05)
+            self.refreshed += 1
+            token = f"access-{self.refreshed}"
+            self.valid_tokens.add(token)
+            return httpx.Response(
+                200,
+                json={
+                    "access_token": token,
+                    "refresh_token": f"refresh-{self.refreshed}",
+                    "expires_at": int(time.time()) + 3600,
+                },
+            )
+        return httpx.Response(404)
+
+    def paths(self) -> List[str]:
+        """Paths requested so far."""
+        return [request.url.path for request in self.requests]
+
+
+@pytest.fixture
+def api() -> AnthropicStub:
+    fakes.install_redis()
+    return AnthropicStub(valid_tokens=["access-0"])
+
+
+def _service(api: AnthropicStub) -> ClaudeAuthService:
+    """An auth service with its own store, like one worker's."""
+    return ClaudeAuthService(
+        credential_store=CredentialStore(),
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(api.handle)),
+    )
+
+
+async def _save(service: ClaudeAuthService, expires_in: int) -> None:
+    await service.credential_store.save(
+        ClaudeCredentials("access-0", "refresh-0", int(time.time()) + expires_in)
+    )
+
+
+async def test_validation_result_is_reused(api) -> None:
+    service = _service(api)
+
+    assert await service.authenticate_with_tokens("access-0", "refresh-0", 0)
+    assert await service._validate_token("access-0")
+    assert not await service.authenticate_with_tokens("bad", "refresh-0", 0)
+
+    assert api.paths() == ["/v1/models", "/v1/models"]
+    assert service.access_token == "access-0"
+
+
+async def test_failed_validation_request_is_not_cached(api) -> None:
+    failing = True
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        if failing:
+            raise httpx.ConnectError("unreachable", request=request)
+        return await api.handle(request)
+
+    service = ClaudeAuthService(
+        credential_store=CredentialStore(),
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handle)),
+    )
+
+    assert not await service._validate_token("access-0")
+    failing = False
+    assert await service._validate_token("access-0")
+
+
+async def test_concurrent_callers_share_one_refresh(api) -> None:
+    service = _service(api)
+    await _save(service, expires_in=-10)
+
+    tokens = await asyncio.gather(*(service.get_valid_token() for _ in range(10)))
+
+    assert api.paths() == ["/auth/refresh"]
+    assert tokens == ["access-1"] * 10
+    assert service.refresh_token == "refresh-1"
+
+
+async def test_refresh_happens_before_expiry(api) -> None:
+    service = _service(api)
+    await _save(service, expires_in=3600)
+
+    assert await service.get_valid_token() == "access-0"
+    assert api.paths() == []
+
+    # Inside the refresh margin, the token is renewed before it expires
+    await _save(service, expires_in=60)
+    assert not service.is_token_expired()
+    assert await service.get_valid_token() == "access-1"
+    assert api.paths() == ["/auth/refresh"]
+
+
+async def test_workers_share_one_refresh(api) -> None:
+    workers = [_service(api), _service(api)]
+    await _save(workers[0], expires_in=-10)
+    await workers[1].credential_store.load()
+
+    tokens = await asyncio.gather(*(worker.get_valid_token() for worker in workers))
+
+    assert api.refreshed == 1
+    assert tokens == ["access-1", "access-1"]
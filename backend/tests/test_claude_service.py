@@ -0,0 +1,127 @@
+"""Report runs through the Claude Code SDK and the in-process BigQuery tools."""
+
+import asyncio
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+
+from src.config import settings
+from src.container import container
+from src.main import app
+from src.services import metrics
+
+
+async def _run(query_text: str, session_id: str) -> List[Dict[str, Any]]:
+    """Collect the events of one analysis."""
+    async with asyncio.timeout(10):
+        return [
+            event
+            async for event in container.claude_service.stream_analysis(
+                query_text, session_id, {}
+            )
+        ]
+
+
+@pytest.fixture
+def unpooled(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Start a Claude Code process per run."""
+    monkeypatch.setattr(settings, "claude_pool_enabled", False)
+
+
+async def test_spawned_run_answers_tool_calls(services, unpooled) -> None:
+    fake, client = services
+    assert container.claude_service.pool is None
+
+    events = await _run("直近の広告コストを教えて", "session-1")
+
+    assert len(fake.tool_results) == 1
+    assert not fake.tool_results[0].get("is_error")
+    assert "rows)" in fake.tool_results[0]["content"][0]["text"]
+    assert client.queries == 1
+
+    metadata = events[-1]
+    assert metadata["event"] == "metadata"
+    assert metadata["data"]["num_turns"] == 2
+    assert metadata["data"]["bigquery"]["jobs"]
+    components = [event["data"] for event in events if event["event"] == "component"]
+    assert [component["type"] for component in components] == [
+        "Summary",
+        "Metric",
+        "LineChart",
+        "Table",
+    ]
+
+
+async def test_run_gets_turns_for_tool_results(services, unpooled) -> None:
+    assert container.claude_service.options.max_turns == settings.claude_max_turns
+    assert settings.claude_max_turns >= 2
+
+
+@pytest.fixture
+async def pooled(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Run on a started process pool."""
+    monkeypatch.setattr(settings, "claude_pool_enabled", True)
+    monkeypatch.setattr(settings, "claude_pool_size", 1)
+    service = container.claude_service
+    await service.start()
+    async with asyncio.timeout(10):
+        while not service.pool.stats()["fresh"]:
+            await asyncio.sleep(0.01)
+
+
+async def test_pooled_run_records_tool_queries(services, pooled) -> None:
+    fake, client = services
+    timings = metrics.start_server_timing()
+
+    # A fresh process, then the same session's parked one
+    for query_text in ("直近の広告コストを教えて", "チャネル別にすると？"):
+        events = await _run(query_text, "session-1")
+
+        metadata = events[-1]["data"]
+        assert metadata["num_turns"] == 2
+        assert metadata["bigquery"]["jobs"]
+    assert container.claude_service.pool.stats()["hits"] == 2
+    assert len(fake.tool_results) == 2
+    stages = {stage for stage, _ in timings}
+    assert {"bigquery.job_wait", "bigquery.fetch", "claude.tool_call"} <= stages
+
+
+async def test_report_after_a_draft_object_streams_whole(
+    services, unpooled, monkeypatch
+) -> None:
+    fake, _ = services
+    report = fake._report
+    draft = '{"components": [{"type": "Summary", "props": {"text": "下書き"}}, ...]}'
+    monkeypatch.setattr(
+        fake, "_report", lambda *args: f"下書き: {draft}\n```json\n{report(*args)}\n```"
+    )
+
+    events = await _run("直近の広告コストを教えて", "session-1")
+
+    components = [event["data"] for event in events if event["event"] == "component"]
+    assert [component["type"] for component in components[-4:]] == [
+        "Summary",
+        "Metric",
+        "LineChart",
+        "Table",
+    ]
+    assert events[-1]["data"]["num_turns"] == 2
+
+
+async def test_generate_times_out_like_the_other_paths(
+    services, unpooled, monkeypatch
+) -> None:
+    fake, _ = services
+    fake.first_message_latency = 5.0
+    monkeypatch.setattr(settings, "claude_timeout", 0.2)
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as http:
+        response = await http.post(
+            "/api/reports/generate", json={"query": "直近の広告コストを教えて"}
+        )
+
+    assert response.status_code == 504
+    assert response.json()["detail"]["code"] == "TIMEOUT"
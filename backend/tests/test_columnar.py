@@ -0,0 +1,84 @@
+"""Columnar results stay Arrow until a consumer needs Python values."""
+
+import datetime
+import json
+
+import pyarrow
+import pytest
+
+from src.config import settings
+from src.container import container
+from src.services.bigquery_tools import format_rows
+from src.services import component_serializer
+from src.services.component_serializer import serialize_component, to_records
+from src.services.query_cache import decode_entry, encode_entry
+
+SQL = (
+    "SELECT * FROM "
+    "`growth-force-project.semantic.fact_meta_ad_performance_daily` LIMIT {rows}"
+)
+
+
+@pytest.fixture
+def uncached(services, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "query_cache_enabled", False)
+
+
+async def _columns(rows: int):
+    arrow = await container.bigquery_service.execute_query_columnar(
+        SQL.format(rows=rows)
+    )
+    return arrow, {name: column.to_pylist() for name, column in arrow.items()}
+
+
+async def test_fetch_keeps_arrow_columns(uncached) -> None:
+    arrow, lists = await _columns(50)
+
+    assert all(isinstance(column, pyarrow.ChunkedArray) for column in arrow.values())
+    assert isinstance(lists["date"][0], datetime.date)
+    assert to_records(arrow) == to_records(lists)
+    assert await container.bigquery_service.execute_query(
+        SQL.format(rows=50)
+    ) == to_records(lists)
+
+
+async def test_consumers_give_the_same_output_for_arrow_and_lists(
+    uncached, monkeypatch
+) -> None:
+    monkeypatch.setattr(component_serializer, "RECORD_BATCH_ROWS", 64)
+    arrow, lists = await _columns(500)
+
+    assert format_rows(arrow, 40, 100_000) == format_rows(lists, 40, 100_000)
+    assert format_rows(arrow, 40, 300) == format_rows(lists, 40, 300)
+    for component_type in ("Table", "LineChart"):
+        from_arrow = json.loads(serialize_component(component_type, arrow))
+        from_lists = json.loads(serialize_component(component_type, lists))
+        assert from_arrow == from_lists
+        assert len(from_arrow["props"]["data"]) == 500
+
+
+async def test_arrow_columns_cache_as_lists(uncached) -> None:
+    arrow, lists = await _columns(20)
+
+    assert decode_entry(encode_entry({"columns": arrow}))["columns"] == lists
+
+
+def test_arrow_values_encode_like_python_values() -> None:
+    lists = {
+        "name": ['say "hi"\n', "日本語", None],
+        "day": [datetime.date(2024, 1, 31), None, datetime.date(1999, 12, 1)],
+        "count": [1, None, -3],
+        "ratio": [0.1 + 0.2, 1e20, None],
+        "flag": [True, False, None],
+        "nan": [float("nan"), 1.5, None],
+    }
+    arrow = {name: pyarrow.chunked_array([values]) for name, values in lists.items()}
+
+    from_arrow = serialize_component("Table", arrow)
+    from_lists = serialize_component("Table", lists)
+
+    # NaN never equals itself, so compare it as a placeholder
+    assert "NaN" in from_arrow
+    assert json.loads(from_arrow.replace("NaN", "0")) == json.loads(
+        from_lists.replace("NaN", "0")
+    )
@@ -0,0 +1,41 @@
+"""Table pages live as long as the results that link to them."""
+
+import pytest
+
+from src import worker
+from src.config import settings
+from src.container import container
+
+
+async def _pages_ttl(result) -> int:
+    """Get the remaining TTL of the result's paginated table."""
+    (table,) = [
+        component for component in result["components"] if component["type"] == "Table"
+    ]
+    table_id = table["props"]["pagination"]["tableId"]
+    client = await container.component_budget._get_redis()
+    return await client.ttl(f"table_pages:{table_id}")
+
+
+@pytest.fixture
+def small_pages(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Paginate the fake report's 100-row table."""
+    monkeypatch.setattr(settings, "component_table_page_size", 10)
+
+
+async def test_interactive_table_pages_expire(services, small_pages) -> None:
+    result = await worker.reports.analyze_report(
+        "直近の広告コストを教えて", "session-1", {}, priority="interactive"
+    )
+
+    assert 0 < await _pages_ttl(result) <= settings.component_table_ttl
+
+
+async def test_saved_report_table_pages_outlive_its_result(
+    services, small_pages
+) -> None:
+    result = await worker.handle_saved_report(
+        {"report_id": "report-1", "query": "直近の広告コストを教えて"}
+    )
+
+    assert await _pages_ttl(result) >= settings.saved_report_ttl
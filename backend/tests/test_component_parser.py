@@ -0,0 +1,122 @@
+"""Incremental extraction of report components from streamed text."""
+
+import json
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from src.services.component_parser import ComponentStreamParser
+
+NESTED = {
+    "components": [
+        {
+            "type": "LineChart",
+            "props": {
+                "title": "日別コスト {推移}",
+                "data": [
+                    {"date": "2024-01-01", "values": {"cost": 1.5, "clicks": [1, 2]}},
+                    {"date": "2024-01-02", "values": {"cost": 2.5, "clicks": [3]}},
+                ],
+                "config": {"xAxis": {"key": "date"}, "series": [{"key": "cost"}]},
+            },
+        },
+        {
+            "type": "Table",
+            "props": {
+                "columns": [{"key": "name", "label": "名前"}],
+                "rows": [{"name": 'say "}" and \\ done'}, {"name": "] [ { ,"}],
+            },
+        },
+        {"type": "Metric", "props": {"value": {"current": 10, "previous": 8}}},
+    ],
+    "metadata": {"query_executed": "SELECT 1", "nested": {"a": {"b": [1, {}]}}},
+}
+
+
+def _parse(text: str, chunk_size: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    parser = ComponentStreamParser()
+    streamed = []
+    for start in range(0, len(text), chunk_size):
+        streamed.extend(parser.feed(text[start : start + chunk_size]))
+    document = parser.close()
+    assert document["components"] == streamed
+    return streamed, document
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 10_000])
+def test_nested_props_survive_any_chunking(chunk_size: int) -> None:
+    text = (
+        "レポートを作成しました {注: これはJSONではありません}。\n"
+        f"```json\n{json.dumps(NESTED, ensure_ascii=False, indent=2)}\n```\n"
+        "以上です。"
+    )
+
+    streamed, document = _parse(text, chunk_size)
+
+    assert streamed == NESTED["components"]
+    assert document["metadata"] == NESTED["metadata"]
+
+
+def test_bare_document_without_fence() -> None:
+    streamed, document = _parse(json.dumps(NESTED), 5)
+
+    assert [component["type"] for component in streamed] == [
+        "LineChart",
+        "Table",
+        "Metric",
+    ]
+    assert document["metadata"]["nested"] == {"a": {"b": [1, {}]}}
+
+
+def test_components_are_returned_as_soon_as_complete() -> None:
+    parser = ComponentStreamParser()
+    first = json.dumps(NESTED["components"][0])
+
+    assert parser.feed('{"components": [' + first[:-1]) == []
+    assert parser.feed(first[-1] + ", ") == [NESTED["components"][0]]
+
+
+def test_invalid_components_are_skipped() -> None:
+    text = json.dumps(
+        {
+            "components": [
+                {"type": "Unknown", "props": {}},
+                {"type": "Summary", "props": "not an object"},
+                {"type": "Summary", "props": {"text": "ok"}},
+            ]
+        }
+    )
+
+    streamed, _ = _parse(text, 3)
+
+    assert streamed == [{"type": "Summary", "props": {"text": "ok"}}]
+
+
+def test_objects_before_the_report_are_ignored() -> None:
+    text = 'ツール結果: {"rows": [{"a": 1}]} ```\n' + json.dumps(NESTED)
+
+    streamed, _ = _parse(text, 4)
+
+    assert streamed == NESTED["components"]
+
+
+def test_abandoned_candidate_components_are_not_kept() -> None:
+    draft = '{"components": [{"type": "Summary", "props": {"text": "例"}}, ...]}'
+    text = f"下書き: {draft}\n```json\n{json.dumps(NESTED)}\n```"
+    parser = ComponentStreamParser()
+    streamed = []
+    for start in range(0, len(text), 6):
+        streamed.extend(parser.feed(text[start : start + 6]))
+
+    document = parser.close()
+
+    assert document["components"] == NESTED["components"]
+    assert streamed[-3:] == NESTED["components"]
+
+
+def test_missing_document_raises() -> None:
+    parser = ComponentStreamParser()
+    parser.feed("JSONはありません")
+
+    with pytest.raises(json.JSONDecodeError):
+        parser.close()
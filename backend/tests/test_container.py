@@ -0,0 +1,50 @@
+"""Service container startup, readiness and shutdown."""
+
+import subprocess
+import sys
+
+import httpx
+import pytest
+
+from src import container as container_module
+from src.container import container
+from src.main import app
+
+
+def test_importing_the_app_reads_no_settings() -> None:
+    probe = (
+        "import src.main\n"
+        "from src.config import get_settings\n"
+        "assert get_settings.cache_info().currsize == 0\n"
+    )
+    subprocess.run([sys.executable, "-c", probe], check=True)
+
+
+async def test_missing_credentials_fail_readiness_not_startup(
+    services, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def missing_credentials(**kwargs):
+        raise ValueError("BQ_PRIVATE_KEY is not set")
+
+    monkeypatch.setattr(container_module, "BigQueryService", missing_credentials)
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as http:
+            assert (await http.get("/health")).status_code == 200
+            response = await http.get("/ready")
+
+    assert response.status_code == 503
+    assert response.json()["checks"]["services"] == "failed: ValueError"
+
+
+async def test_stop_closes_every_built_service(services) -> None:
+    await container.start(warm_up=False)
+    bigquery_service = container.bigquery_service
+    assert container.ready
+
+    await container.stop()
+
+    assert bigquery_service._executor._shutdown
+    assert container.claude_service.auth_service._scheduled_refresh is None
@@ -0,0 +1,38 @@
+"""HTTP request metrics are labelled with full route templates."""
+
+from typing import List
+
+import httpx
+import pytest
+
+from src.main import app
+from src.services import metrics
+
+
+@pytest.fixture
+def routes(monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    """Record the route label of every observed request."""
+    labels: List[str] = []
+    monkeypatch.setattr(
+        metrics,
+        "observe_http_request",
+        lambda method, route, status, seconds: labels.append(route),
+    )
+    return labels
+
+
+async def test_routes_include_their_router_prefix(services, routes) -> None:
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as http:
+        await http.get("/api/reports/jobs/job-1")
+        await http.get("/api/reports/tables/table-1?cursor=1")
+        await http.get("/health")
+        await http.get("/missing")
+
+    assert routes == [
+        "/api/reports/jobs/{job_id}",
+        "/api/reports/tables/{table_id}",
+        "/health",
+        "unmatched",
+    ]
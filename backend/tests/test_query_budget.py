@@ -0,0 +1,95 @@
+"""Every query is dry-run against the bytes-processed budget first."""
+
+from typing import Any, List
+
+import pytest
+
+from benchmarks import fakes
+from src.config import settings
+from src.container import container
+from src.services.bigquery_service import (
+    BigQueryService,
+    QueryBudgetExceededError,
+    start_query_stats,
+    summarize_query_stats,
+)
+
+SQL = (
+    "SELECT date, cost FROM "
+    "`growth-force-project.semantic.fact_meta_ad_performance_daily` LIMIT 10"
+)
+
+
+class DryRunStub(fakes.FakeBigQueryClient):
+    """A fake client whose dry runs report a fixed byte estimate."""
+
+    def __init__(self, estimated_bytes: int):
+        """Initialize client."""
+        super().__init__(job_latency=0.0, token_latency=0.0)
+        self.estimated_bytes = estimated_bytes
+        self.job_configs: List[Any] = []
+
+    def query(self, sql: str, job_config: Any = None) -> fakes.FakeQueryJob:
+        """Record the job config and answer dry runs with the estimate."""
+        self.job_configs.append(job_config)
+        job = super().query(sql, job_config=job_config)
+        if getattr(job_config, "dry_run", False):
+            job.total_bytes_processed = self.estimated_bytes
+        return job
+
+
+@pytest.fixture
+def stub(services, monkeypatch: pytest.MonkeyPatch):
+    """Build the BigQuery service on a dry-run stub."""
+
+    def install(estimated_bytes: int) -> DryRunStub:
+        client = DryRunStub(estimated_bytes)
+        monkeypatch.setattr(BigQueryService, "_create_client", lambda self: client)
+        return client
+
+    monkeypatch.setattr(settings, "query_cache_enabled", False)
+    monkeypatch.setattr(settings, "bigquery_max_bytes_processed", 1024**3)
+    return install
+
+
+async def test_query_over_budget_is_rejected_before_running(stub) -> None:
+    client = stub(estimated_bytes=50 * 1024**3)
+
+    with pytest.raises(QueryBudgetExceededError) as raised:
+        await container.bigquery_service.execute_query(SQL)
+
+    assert client.queries == 0
+    assert [config.dry_run for config in client.job_configs] == [True]
+    message = str(raised.value)
+    assert "50.00 GB" in message and "1.00 GB" in message
+    assert "WHERE" in message
+
+
+async def test_query_within_budget_runs_with_billing_cap(stub) -> None:
+    client = stub(estimated_bytes=512 * 1024**2)
+    stats = start_query_stats()
+
+    rows = await container.bigquery_service.execute_query(SQL)
+
+    assert len(rows) == 10
+    dry_run, job = client.job_configs
+    assert dry_run.dry_run and not dry_run.use_query_cache
+    assert not job.dry_run
+    assert job.maximum_bytes_billed == settings.bigquery_max_bytes_billed
+
+    summary = summarize_query_stats(stats)
+    assert summary["queries"] == 1
+    [recorded] = summary["jobs"]
+    assert recorded["estimated_bytes"] == 512 * 1024**2
+    assert recorded["bytes_processed"] == 10 * 7 * 8
+    assert recorded["cache_hit"] is False
+    assert "slot_ms" in recorded
+
+
+async def test_dry_run_can_be_disabled(stub, monkeypatch) -> None:
+    client = stub(estimated_bytes=50 * 1024**3)
+    monkeypatch.setattr(settings, "bigquery_dry_run_enabled", False)
+
+    await container.bigquery_service.execute_query(SQL)
+
+    assert [bool(config.dry_run) for config in client.job_configs] == [False]
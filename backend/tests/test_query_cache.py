@@ -0,0 +1,105 @@
+"""SQL fingerprints, table references and freshness of the BigQuery result cache."""
+
+from typing import Dict
+
+import pytest
+
+from src.config import settings
+from src.services.query_cache import QueryCache, normalize_sql, referenced_tables
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ("SELECT a , b FROM t", "select a,b from t"),
+        ("SELECT a FROM t\n  WHERE b = 1 ;", "SELECT a FROM t WHERE b=1"),
+        ("SELECT a -- total\nFROM t /* all */", "SELECT a FROM t"),
+        ("SELECT a FROM t WHERE b IN (3, 1, 2)", "SELECT a FROM t WHERE b IN(1,2,3)"),
+        (
+            "SELECT a FROM t WHERE b IN ('y', 'x')",
+            "SELECT a FROM t WHERE b IN('x','y')",
+        ),
+    ],
+)
+def test_layout_differences_share_a_fingerprint(first: str, second: str) -> None:
+    assert normalize_sql(first).lower() == normalize_sql(second).lower()
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ("SELECT a FROM t WHERE b = 'a , b'", "SELECT a FROM t WHERE b = 'a,b'"),
+        ("SELECT a FROM t WHERE b = 'x  y'", "SELECT a FROM t WHERE b = 'x y'"),
+        ('SELECT a FROM t WHERE b = "( x )"', 'SELECT a FROM t WHERE b = "(x)"'),
+        ("SELECT a FROM t WHERE b = '-- x'", "SELECT a FROM t WHERE b = ''"),
+        ("SELECT `a  b` FROM t", "SELECT `a b` FROM t"),
+        ("SELECT a FROM t WHERE b IN ('x , y')", "SELECT a FROM t WHERE b IN ('x,y')"),
+    ],
+)
+def test_literals_are_kept_as_written(first: str, second: str) -> None:
+    assert normalize_sql(first) != normalize_sql(second)
+
+
+def _tables(query: str):
+    return referenced_tables(normalize_sql(query))
+
+
+def test_every_comma_join_item_is_read() -> None:
+    assert _tables("SELECT * FROM a x, b y") == {"a", "b"}
+    assert _tables("SELECT * FROM a AS x, b JOIN c ON b.i = c.i, d") == {
+        "a",
+        "b",
+        "c",
+        "d",
+    }
+    assert _tables(f"SELECT * FROM `{settings.bq_dataset_id}.a`, b") == {"a", "b"}
+
+
+def test_subqueries_ctes_and_unnest() -> None:
+    query = """
+        WITH recent AS (SELECT * FROM a WHERE EXTRACT(YEAR FROM d) = 2024)
+        SELECT * FROM recent, UNNEST(recent.items) item
+        LEFT JOIN (SELECT i FROM b) s USING (i)
+        WHERE i IN (SELECT i FROM c) AND x IS DISTINCT FROM y
+    """
+    assert _tables(query) == {"a", "b", "c"}
+
+
+def test_keywords_inside_literals_are_not_tables() -> None:
+    assert _tables("SELECT * FROM t WHERE note = 'from other, x'") == {"t"}
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT * FROM a, other_dataset.b",
+        "SELECT * FROM a x, x.items",
+        "SELECT * FROM (a JOIN b ON a.i = b.i)",
+        "SELECT * FROM ML.PREDICT(MODEL m, TABLE a)",
+        f"SELECT * FROM {settings.bq_dataset_id}.INFORMATION_SCHEMA.TABLES",
+        "SELECT 1",
+    ],
+)
+def test_uncertain_tables_are_not_cached(query: str) -> None:
+    assert _tables(query) is None
+
+
+async def test_table_modified_during_the_query_leaves_entry_stale(
+    monkeypatch: pytest.MonkeyPatch, tmp_path
+) -> None:
+    monkeypatch.setattr(settings, "query_cache_backend", "disk")
+    monkeypatch.setattr(settings, "query_cache_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "query_cache_watermark_ttl", 0)
+    watermarks: Dict[str, int] = {"t": 1}
+
+    async def load() -> Dict[str, int]:
+        return dict(watermarks)
+
+    cache = QueryCache(watermark_loader=load)
+    before = await cache.lookup("SELECT a FROM t")
+    # The table is loaded while the query runs
+    watermarks["t"] = 2
+    await cache.set(before, {"a": [1]})
+
+    assert await cache.get(await cache.lookup("SELECT a FROM t")) is None
+    assert cache.invalidations == 1
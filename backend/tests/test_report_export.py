@@ -0,0 +1,51 @@
+"""Report exports only run SQL recorded server-side."""
+
+import httpx
+
+from src.container import container
+from src.main import app
+
+
+def _client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    )
+
+
+async def test_export_does_not_take_sql_from_the_client(services) -> None:
+    _, client = services
+    async with _client() as http:
+        response = await http.post(
+            "/api/reports/export",
+            json={"query_executed": "SELECT * FROM secrets", "format": "csv"},
+        )
+
+    assert response.status_code in (404, 405)
+    assert client.queries == 0
+
+
+async def test_job_export_streams_the_recorded_query(services) -> None:
+    await container.report_jobs._update(
+        "job-1",
+        status="completed",
+        result={
+            "metadata": {
+                "query_executed": "SELECT date, cost FROM "
+                "`growth-force-project.semantic.fact_meta_ad_performance_daily` "
+                "LIMIT 3"
+            }
+        },
+    )
+    async with _client() as http:
+        response = await http.get("/api/reports/jobs/job-1/export?format=csv")
+
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].endswith('report-job-1.csv"')
+    assert len(response.text.strip().splitlines()) == 4
+
+
+async def test_export_of_unknown_job_is_not_found(services) -> None:
+    async with _client() as http:
+        response = await http.get("/api/reports/jobs/missing/export")
+
+    assert response.status_code == 404
@@ -0,0 +1,106 @@
+"""Report job webhooks, and retries of jobs whose worker died."""
+
+from typing import List
+
+import httpx
+import pytest
+
+from src.config import settings
+from src.container import container
+from src.main import app
+from src.services import report_jobs
+from src.services.report_jobs import (
+    DELAYED_KEY,
+    PROCESSING_KEY,
+    QUEUE_KEY,
+    callback_allowed,
+)
+
+
+@pytest.fixture
+def hooks(monkeypatch: pytest.MonkeyPatch) -> List[httpx.Request]:
+    """Allow one webhook origin and record what is POSTed to it."""
+    monkeypatch.setattr(
+        settings, "report_job_callback_origins", ["https://hooks.example.com"]
+    )
+    requests: List[httpx.Request] = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(204)
+
+    http = httpx.AsyncClient(transport=httpx.MockTransport(handle))
+    monkeypatch.setattr(report_jobs, "get_http_client", lambda: http)
+    return requests
+
+
+@pytest.mark.parametrize(
+    "url, allowed",
+    [
+        ("https://hooks.example.com/report", True),
+        ("https://hooks.example.com:443/report?id=1", True),
+        ("http://hooks.example.com/report", False),
+        ("https://hooks.example.com:8443/report", False),
+        ("https://hooks.example.com.evil.test/report", False),
+        ("http://169.254.169.254/latest/meta-data", False),
+        ("file:///etc/passwd", False),
+        ("not a url", False),
+    ],
+)
+def test_callback_origins(hooks, url: str, allowed: bool) -> None:
+    assert callback_allowed(url) is allowed
+
+
+async def test_job_with_unlisted_callback_is_rejected(services, hooks) -> None:
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as http:
+        response = await http.post(
+            "/api/reports/jobs",
+            json={
+                "query": "直近の広告コストを教えて",
+                "callback_url": "http://localhost:6379/",
+            },
+        )
+
+    assert response.status_code == 400
+
+
+async def test_webhook_posts_through_the_shared_client(services, hooks) -> None:
+    jobs = container.report_jobs
+    await jobs._update("job-1", status="succeeded")
+
+    await jobs._notify("job-1", "https://hooks.example.com/report")
+    await jobs._notify("job-1", "http://10.0.0.1/report")
+
+    assert [str(request.url) for request in hooks] == [
+        "https://hooks.example.com/report"
+    ]
+
+
+async def test_job_that_keeps_killing_workers_fails(services, hooks, monkeypatch):
+    monkeypatch.setattr(settings, "report_job_max_attempts", 2)
+    jobs = container.report_jobs
+    client = await jobs._get_redis()
+    job_id = await jobs.enqueue({"query": "直近の広告コストを教えて"})
+
+    async def crash() -> None:
+        # A worker claims the job and dies without releasing its lease
+        await client.lmove(QUEUE_KEY, PROCESSING_KEY, "RIGHT", "LEFT")
+        job = await jobs.get(job_id)
+        await jobs._update(job_id, status="running", attempts=job["attempts"] + 1)
+        await jobs.reap()
+        await jobs.reap()
+
+    await crash()
+    assert (await jobs.get(job_id))["status"] == "retrying"
+    assert await client.zscore(DELAYED_KEY, job_id) is not None
+
+    await client.zadd(DELAYED_KEY, {job_id: 0})
+    await jobs.reap()
+    await crash()
+
+    job = await jobs.get(job_id)
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert not await client.lrange(QUEUE_KEY, 0, -1)
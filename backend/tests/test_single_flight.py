@@ -0,0 +1,124 @@
+"""Sharing one execution between identical calls across workers."""
+
+import asyncio
+import datetime
+import decimal
+
+import pytest
+
+from benchmarks import fakes
+from src.config import settings
+from src.services.redis_client import get_redis
+from src.services.single_flight import SingleFlight
+
+RESULT = {
+    "date": [datetime.date(2024, 1, 1), datetime.date(2024, 1, 2)],
+    "cost": [decimal.Decimal("1.50"), decimal.Decimal("2.25")],
+}
+
+
+@pytest.fixture
+def workers():
+    """Two single-flight groups on one Redis, as in two worker processes."""
+    fakes.install_redis()
+    groups = [SingleFlight("test", timeout=0.3), SingleFlight("test", timeout=0.3)]
+    yield groups
+    for group in groups:
+        group.close()
+
+
+class Call:
+    """A call that runs until released, counting its runs."""
+
+    def __init__(self, result=RESULT):
+        """Initialize call."""
+        self.result = result
+        self.runs = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        """Run once."""
+        self.runs += 1
+        self.started.set()
+        await self.release.wait()
+        return self.result
+
+
+async def _keys():
+    return await get_redis(decode_responses=False).keys("singleflight:*")
+
+
+async def test_unfollowed_result_is_not_written(workers) -> None:
+    call = Call()
+    call.release.set()
+
+    assert await workers[0].do("key", call) == RESULT
+    assert await _keys() == []
+
+
+async def test_follower_gets_the_leader_result_with_its_types(workers) -> None:
+    call = Call()
+    leader = asyncio.create_task(workers[0].do("key", call))
+    await call.started.wait()
+    follower = asyncio.create_task(workers[1].do("key", call))
+    await asyncio.sleep(0.05)
+    call.release.set()
+
+    assert await leader == RESULT
+    assert await follower == RESULT
+    assert call.runs == 1
+
+
+async def test_lock_is_held_while_the_leader_runs(workers) -> None:
+    call = Call()
+    leader = asyncio.create_task(workers[0].do("key", call))
+    await call.started.wait()
+    # Well past the lock lease, which the leader keeps renewing
+    await asyncio.sleep(0.6)
+    follower = asyncio.create_task(workers[1].do("key", call))
+    await asyncio.sleep(0.05)
+    call.release.set()
+
+    await asyncio.gather(leader, follower)
+    assert call.runs == 1
+
+
+async def test_result_over_size_cap_is_not_shared(workers, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "query_cache_max_entry_bytes", 16)
+    call = Call()
+    leader = asyncio.create_task(workers[0].do("key", call))
+    await call.started.wait()
+    follower = asyncio.create_task(workers[1].do("key", call))
+    await asyncio.sleep(0.05)
+    call.release.set()
+
+    assert await leader == RESULT
+    assert await follower == RESULT
+    # The follower ran the call itself instead
+    assert call.runs == 2
+
+
+async def test_failed_leader_hands_over_to_follower(workers) -> None:
+    runs = []
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def flaky():
+        runs.append(None)
+        started.set()
+        await release.wait()
+        if len(runs) == 1:
+            raise RuntimeError("boom")
+        return RESULT
+
+    leader = asyncio.create_task(workers[0].do("key", flaky))
+    await started.wait()
+    follower = asyncio.create_task(workers[1].do("key", flaky))
+    await asyncio.sleep(0.05)
+    release.set()
+
+    with pytest.raises(RuntimeError):
+        await leader
+    assert await follower == RESULT
+    assert len(runs) == 2
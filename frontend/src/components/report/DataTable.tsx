@@ -1,12 +1,52 @@
+"use client"
+
+import { useState } from "react"
+import { Button } from "@/components/ui/button"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
 
+interface Pagination {
+  tableId: string
+  pageSize: number
+  totalRows: number
+  nextCursor: string | null
+}
+
 interface DataTableProps {
   data: any[]
   columns: string[]
   title?: string
+  pagination?: Pagination
 }
 
-export function DataTable({ data, columns, title = "データテーブル" }: DataTableProps) {
+export function DataTable({
+  data,
+  columns,
+  title = "データテーブル",
+  pagination,
+}: DataTableProps) {
+  const [rows, setRows] = useState(data)
+  const [nextCursor, setNextCursor] = useState(pagination?.nextCursor ?? null)
+  const [loading, setLoading] = useState(false)
+
+  const loadMore = async () => {
+    if (!pagination || !nextCursor) return
+    setLoading(true)
+    try {
+      const response = await fetch(
+        `${process.env.NEXT_PUBLIC_API_URL}/api/reports/tables/${pagination.tableId}?cursor=${nextCursor}`
+      )
+      if (!response.ok) {
+        setNextCursor(null)
+        return
+      }
+      const page = await response.json()
+      setRows((prev) => [...prev, ...page.data])
+      setNextCursor(page.nextCursor)
+    } finally {
+      setLoading(false)
+    }
+  }
+
   if (!data || data.length === 0) {
     return (
       <Card>
@@ -44,7 +84,7 @@ export function DataTable({ data, columns, title = "データテーブル" }: Da
               </tr>
             </thead>
             <tbody className="divide-y divide-border">
-              {data.map((row, idx) => (
+              {rows.map((row, idx) => (
                 <tr key={idx}>
                   {tableColumns.map((column) => (
                     <td key={column} className="px-4 py-2 text-sm">
@@ -56,6 +96,18 @@ export function DataTable({ data, columns, title = "データテーブル" }: Da
             </tbody>
           </table>
         </div>
+        {pagination && (
+          <div className="mt-4 flex items-center justify-between text-sm text-muted-foreground">
+            <span>
+              {rows.length} / {pagination.totalRows} 行
+            </span>
+            {nextCursor && (
+              <Button variant="outline" size="sm" onClick={loadMore} disabled={loading}>
+                {loading ? "読み込み中..." : "さらに表示"}
+              </Button>
+            )}
+          </div>
+        )}
       </CardContent>
     </Card>
   )